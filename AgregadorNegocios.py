@@ -0,0 +1,271 @@
+"""
+Agrega os negócios da API Vista por etapa, status e dia (America/Sao_Paulo) e grava os totais
+diários localmente (`agregados_negocios.py`) e na tabela `negocio_dia` do Supabase.
+
+Substitui as 7 consultas dia a dia (e a do mês) que o endpoint Next.js de negócios fazia a
+cada chamada: as janelas `semana` e `mes` passam a ser somas dos baldes diários. Cada execução
+busca os negócios uma única vez, dos dias ainda abertos e dos últimos `NEGOCIOS_REABRIR_DIAS`
+(negócios antigos mudam de status). `--verificar` compara os baldes com uma consulta na hora.
+
+Requisitos mínimos:
+    pip install requests python-dotenv supabase
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from supabase import Client, create_client
+
+from agregados_negocios import REABRIR_DIAS, AgregadosNegocios, agregar, hoje_sp
+from decodificacao_json import LeitorPagina
+from destinos_gravacao import criar_destino, tipo_destino
+from instrumentacao import METRICAS, RetryInstrumentado, instrumentar_sessao
+from paginacao_adaptativa import PaginacaoAdaptativa, ler_janela, ler_primeira
+
+# =========================
+# Configuração e Constantes
+# =========================
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+API_NEGOCIOS_KEY = os.getenv("API_NEGOCIOS_KEY") or os.getenv("API_IMOVEIS_KEY")
+API_NEGOCIOS_URL = os.getenv("API_NEGOCIOS_URL")  # ex.: https://seudominio.vistahost.com.br/negocios/listar
+NEGOCIOS_CODIGO_PIPE = os.getenv("NEGOCIOS_CODIGO_PIPE", "1")
+CAMPO_VALOR_NEGOCIO = os.getenv("CAMPO_VALOR_NEGOCIO", "ValorNegocio")
+
+HEADERS = {"Accept": "application/json"}
+PERFIL_PAGINACAO = "negocios"
+TIMEOUT = 30  # segundos
+
+ARQUIVO_NEGOCIOS = os.getenv("ARQUIVO_NEGOCIOS", ".vista_negocios.sqlite")
+TABELA_NEGOCIOS = os.getenv("TABELA_NEGOCIOS", "negocio_dia")
+NEGOCIOS_DIAS_INICIAIS = int(os.getenv("NEGOCIOS_DIAS_INICIAIS", "31"))  # histórico da 1ª execução
+# Dias já fechados refeitos a cada execução (status alterados); o padrão cobre a janela `mes`
+NEGOCIOS_REABRIR_DIAS = int(os.getenv("NEGOCIOS_REABRIR_DIAS", str(REABRIR_DIAS)))
+LOTE_MAX_LINHAS = int(os.getenv("LOTE_MAX_LINHAS", "500"))
+
+
+def validar_ambiente(local: bool = False) -> None:
+    faltando = []
+    if not local and tipo_destino() == "supabase":
+        if not SUPABASE_URL:
+            faltando.append("SUPABASE_URL")
+        if not SUPABASE_KEY:
+            faltando.append("SUPABASE_KEY")
+    if not API_NEGOCIOS_KEY:
+        faltando.append("API_NEGOCIOS_KEY (ou API_IMOVEIS_KEY)")
+    if not API_NEGOCIOS_URL:
+        faltando.append("API_NEGOCIOS_URL")
+    if faltando:
+        raise EnvironmentError(
+            f"As seguintes variáveis de ambiente estão ausentes: {', '.join(faltando)}"
+        )
+
+
+def sessao_http() -> requests.Session:
+    """Sessão com retries exponenciais (instrumentada: latência, status e retries)."""
+    session = requests.Session()
+    retries = RetryInstrumentado(
+        total=5,
+        backoff_factor=0.8,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return instrumentar_sessao(session)
+
+
+def conectar_supabase() -> Client:
+    """Cliente Supabase."""
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+
+def montar_pesquisa(pagina: int, quantidade: int, inicio: date, fim: date) -> Dict[str, Any]:
+    """Negócios com `DataInicial` em [inicio, fim + 1 dia), de todas as etapas e status."""
+    return {
+        "fields": ["Codigo", "DataInicial", "NomeEtapa", "Status", CAMPO_VALOR_NEGOCIO],
+        "filter": {"DataInicial": [inicio.isoformat(), (fim + timedelta(days=1)).isoformat()]},
+        # Ordem de criação: negócios novos entram no fim, sem deslocar as páginas já lidas;
+        # `Codigo` desempata negócios criados no mesmo instante
+        "order": {"DataInicial": "asc", "Codigo": "asc"},
+        "paginacao": {"pagina": pagina, "quantidade": quantidade},
+    }
+
+
+def buscar_pagina(
+    session: requests.Session, pagina: int, quantidade: int, inicio: date, fim: date
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any], int]:
+    """Consulta uma página de negócios; devolve os itens, os metadados e o tamanho da resposta."""
+    params = {
+        "key": API_NEGOCIOS_KEY,
+        "codigo_pipe": NEGOCIOS_CODIGO_PIPE,
+        "showtotal": 1,
+        "pesquisa": json.dumps(montar_pesquisa(pagina, quantidade, inicio, fim)),
+    }
+    with METRICAS.cronometrar("listar_negocios"):
+        with session.get(API_NEGOCIOS_URL, headers=HEADERS, params=params, timeout=TIMEOUT, stream=True) as resp:
+            leitor = LeitorPagina.da_resposta(resp)
+            try:
+                itens = [item for _, item in leitor]
+            except ValueError as e:
+                raise ValueError(
+                    f"Erro ao decodificar JSON. Status={resp.status_code}. Corpo (parcial): {leitor.inicio}"
+                ) from e
+    meta = leitor.metadados
+    if "status" in meta and "message" in meta:
+        raise RuntimeError(f"Erro API (página {pagina}): {meta.get('message')} (status {meta.get('status')})")
+    return itens, meta, leitor.bytes_lidos
+
+
+def coletar_negocios(session: requests.Session, inicio: date, fim: date) -> List[Dict[str, Any]]:
+    """Todos os negócios iniciados entre `inicio` e `fim`, com tamanho de página adaptativo."""
+    paginacao = PaginacaoAdaptativa(PERFIL_PAGINACAO)
+
+    def buscar(pagina: int, quantidade: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any], int]:
+        return buscar_pagina(session, pagina, quantidade, inicio, fim)
+
+    negocios, total = ler_primeira(buscar, paginacao)
+    for janela in paginacao.janelas(len(negocios), total):
+        negocios.extend(ler_janela(buscar, paginacao, janela))
+    paginacao.salvar()
+    return negocios
+
+
+def gravar_destino(linhas: List[Dict[str, Any]]) -> int:
+    """Upsert dos baldes em `TABELA_NEGOCIOS` (chave etapa, status, dia); erros levantam exceção."""
+    destino = criar_destino(conectar_supabase)
+    gravadas = 0
+    try:
+        for i in range(0, len(linhas), LOTE_MAX_LINHAS):
+            with METRICAS.cronometrar(destino.estagio, tabela=TABELA_NEGOCIOS):
+                gravadas += destino.gravar(TABELA_NEGOCIOS, linhas[i : i + LOTE_MAX_LINHAS], ["etapa", "status", "dia"])
+    finally:
+        destino.fechar()
+    METRICAS.contar("linhas_gravadas_total", gravadas, tabela=TABELA_NEGOCIOS)
+    return gravadas
+
+
+def atualizar(local: bool = False, reabrir_dias: int = NEGOCIOS_REABRIR_DIAS, hoje: Optional[date] = None) -> None:
+    """
+    Refaz os baldes dos dias abertos e dos últimos `reabrir_dias` (até hoje) e fecha os anteriores a hoje.
+
+    O destino remoto é gravado antes do arquivo local: se o upsert falhar, os dias continuam
+    abertos e são refeitos na próxima execução.
+    """
+    hoje = hoje or hoje_sp()
+    agregados = AgregadosNegocios(ARQUIVO_NEGOCIOS)
+    try:
+        inicio = agregados.primeiro_dia_aberto(hoje, NEGOCIOS_DIAS_INICIAIS, reabrir_dias)
+        print(f"Agregando negócios de {inicio} a {hoje} (America/Sao_Paulo).")
+        negocios = coletar_negocios(sessao_http(), inicio, hoje)
+        baldes = agregar(negocios, inicio, hoje, CAMPO_VALOR_NEGOCIO)
+        linhas = agregados.linhas(inicio, hoje, baldes)
+        print(f"{len(negocios)} negócios em {len(baldes)} baldes (etapa, status, dia).")
+        METRICAS.definir("negocios_coletados", len(negocios))
+        if not local and linhas:
+            print(f"{gravar_destino(linhas)} baldes gravados em {TABELA_NEGOCIOS}.")
+        agregados.substituir(inicio, hoje, linhas, fechado_ate=hoje - timedelta(days=1))
+        print(f"Dias fechados até {hoje - timedelta(days=1)}; o de hoje é refeito na próxima execução.")
+    finally:
+        agregados.fechar()
+
+
+def verificar(dias: int = NEGOCIOS_REABRIR_DIAS, hoje: Optional[date] = None) -> int:
+    """
+    Compara os baldes locais dos últimos `dias` com os negócios consultados agora na API.
+
+    Imprime as divergências e retorna quantas são. Com `dias` maior que a janela de reabertura,
+    mostra se os status ainda mudam em dias que já não são refeitos. Negócios criados ou
+    alterados depois da última atualização também aparecem.
+    """
+    hoje = hoje or hoje_sp()
+    agregados = AgregadosNegocios(ARQUIVO_NEGOCIOS)
+    try:
+        # Dias anteriores à primeira execução nunca foram agregados
+        inicio = max(hoje - timedelta(days=dias), agregados.primeiro_dia() or hoje)
+        print(f"Conferindo os agregados de {inicio} a {hoje} com a API.")
+        negocios = coletar_negocios(sessao_http(), inicio, hoje)
+        diferencas = agregados.divergencias(inicio, hoje, agregar(negocios, inicio, hoje, CAMPO_VALOR_NEGOCIO))
+    finally:
+        agregados.fechar()
+    for (etapa, status, dia), guardado, ao_vivo in diferencas[:50]:
+        print(f"[DIVERGÊNCIA] {dia} {etapa}/{status}: guardado {guardado[0]} ({guardado[1]:.2f}), API {ao_vivo[0]} ({ao_vivo[1]:.2f})")
+    if len(diferencas) > 50:
+        print(f"... e mais {len(diferencas) - 50} divergências.")
+    print(f"{len(negocios)} negócios conferidos, {len(diferencas)} baldes divergentes.")
+    METRICAS.definir("negocios_baldes_divergentes", len(diferencas))
+    return len(diferencas)
+
+
+def consultar(etapa: str, status: str, periodo: str, hoje: Optional[date] = None) -> Dict[str, Any]:
+    """Resposta do endpoint de negócios (`semana` ou `mes`) a partir dos agregados locais."""
+    hoje = hoje or hoje_sp()
+    agregados = AgregadosNegocios(ARQUIVO_NEGOCIOS)
+    try:
+        if periodo.lower() == "semana":
+            return agregados.semana(etapa, status, hoje)
+        if periodo.lower() == "mes":
+            return agregados.mes(etapa, status, hoje)
+        raise ValueError('Período inválido. Use "semana" ou "mes".')
+    finally:
+        agregados.fechar()
+
+
+def main(local: bool = False, reabrir_dias: int = NEGOCIOS_REABRIR_DIAS) -> None:
+    validar_ambiente(local)
+    METRICAS.iniciar("agrega_negocios")
+    try:
+        atualizar(local, reabrir_dias)
+    finally:
+        METRICAS.exportar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agrega os negócios da API Vista por etapa, status e dia.")
+    parser.add_argument("--local", action="store_true", help="só atualiza o arquivo local, sem gravar no Supabase")
+    parser.add_argument(
+        "--reabrir-dias",
+        type=int,
+        default=NEGOCIOS_REABRIR_DIAS,
+        help=f"refaz também os últimos N dias já fechados, cujos negócios mudam de status (padrão: {NEGOCIOS_REABRIR_DIAS})",
+    )
+    parser.add_argument(
+        "--verificar",
+        nargs="?",
+        type=int,
+        const=NEGOCIOS_REABRIR_DIAS,
+        metavar="DIAS",
+        help="compara os agregados locais dos últimos DIAS com uma consulta à API; sai com erro se divergirem",
+    )
+    parser.add_argument(
+        "--consultar",
+        nargs=3,
+        metavar=("ETAPA", "STATUS", "PERIODO"),
+        help="imprime a janela semana/mes a partir dos agregados locais, sem consultar a API",
+    )
+    args = parser.parse_args()
+    try:
+        if args.consultar:
+            print(json.dumps(consultar(*args.consultar), ensure_ascii=False, indent=2))
+        elif args.verificar is not None:
+            validar_ambiente(local=True)
+            if verificar(args.verificar):
+                raise SystemExit(1)
+        else:
+            main(local=args.local, reabrir_dias=args.reabrir_dias)
+    except Exception as e:
+        print(f"[ERRO] {e}")
+        raise
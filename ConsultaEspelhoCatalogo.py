@@ -0,0 +1,122 @@
+"""
+Serviço HTTP que responde a action `buscarImoveis` do GPT (`gpt/schema.json`) a partir do
+espelho local do catálogo (`espelho_catalogo.py`), sem consultar a API Vista.
+
+Atende `GET /imoveis/listar?key=...&showtotal=1&pesquisa={...}` com a mesma resposta da API
+(dict de imóveis por código + `total`/`paginas`/`pagina`/`quantidade`). Imóveis internos
+(não exibidos no site) só aparecem com `showInternal=1`, como na API. O espelho é
+preenchido pelo `ImportVistaSupabase.py`; o serviço só lê o arquivo, então pode rodar enquanto
+o importador grava (WAL).
+
+    python ConsultaEspelhoCatalogo.py --porta 8080
+"""
+
+from __future__ import annotations
+
+import argparse
+import hmac
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+
+from decodificacao_json import carregar
+from espelho_catalogo import EspelhoCatalogo, ErroPesquisa
+
+# =========================
+# Configuração e Constantes
+# =========================
+
+load_dotenv()
+
+ARQUIVO_ESPELHO = os.getenv("ARQUIVO_ESPELHO", ".vista_espelho.sqlite")
+ESPELHO_API_KEY = os.getenv("ESPELHO_API_KEY")  # se definida, exigida no parâmetro `key`
+ESPELHO_HOST = os.getenv("ESPELHO_HOST", "127.0.0.1")
+ESPELHO_PORTA = int(os.getenv("ESPELHO_PORTA", "8080"))
+ROTA_LISTAR = "/imoveis/listar"
+
+
+class HandlerEspelho(BaseHTTPRequestHandler):
+    espelho: EspelhoCatalogo  # definido em `criar_servidor`
+    chave: Optional[str] = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        return  # uma linha por consulta já é impressa em `do_GET`
+
+    def _responder(self, status: int, corpo: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _erro(self, status: int, mensagem: str) -> None:
+        # Mesmo formato de erro da API Vista
+        self._responder(status, {"status": status, "message": mensagem})
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != ROTA_LISTAR:
+            self._erro(404, f"Rota não encontrada: {url.path}")
+            return
+        query = parse_qs(url.query)
+        if self.chave and not hmac.compare_digest(query.get("key", [""])[0], self.chave):
+            self._erro(401, "Chave de API inválida.")
+            return
+        inicio = time.perf_counter()
+        try:
+            resposta = consultar(self.espelho, query)
+        except ErroPesquisa as e:
+            self._erro(400, str(e))
+            return
+        ms = (time.perf_counter() - inicio) * 1000
+        itens = sum(1 for v in resposta.values() if isinstance(v, dict))
+        print(f"[espelho] {ms:.1f} ms, {itens} imóvel(is): {query.get('pesquisa', [''])[0][:200]}")
+        self._responder(200, resposta, {"Server-Timing": f"espelho;dur={ms:.2f}"})
+
+
+def consultar(espelho: EspelhoCatalogo, query: Dict[str, Any]) -> Dict[str, Any]:
+    """Resposta da listagem para a query string já decodificada (`parse_qs`)."""
+    bruto = query.get("pesquisa", ["{}"])[0]
+    try:
+        pesquisa = carregar(bruto) if bruto else {}
+    except ValueError:
+        raise ErroPesquisa("O parâmetro `pesquisa` não é um JSON válido.") from None
+    mostrar_total = query.get("showtotal", ["0"])[0] == "1"
+    mostrar_internos = query.get("showInternal", ["0"])[0] == "1"
+    return espelho.pesquisar(pesquisa, mostrar_total, mostrar_internos)
+
+
+def criar_servidor(
+    arquivo: str = ARQUIVO_ESPELHO, host: str = ESPELHO_HOST, porta: int = ESPELHO_PORTA
+) -> ThreadingHTTPServer:
+    """Servidor da consulta ao espelho (porta 0 = escolhida pelo SO). Use `serve_forever`."""
+    if not os.path.exists(arquivo):
+        raise FileNotFoundError(
+            f"Espelho {arquivo} não encontrado: rode o ImportVistaSupabase.py antes (ARQUIVO_ESPELHO)."
+        )
+    espelho = EspelhoCatalogo(arquivo, somente_leitura=True)
+    handler = type("HandlerConfigurado", (HandlerEspelho,), {"espelho": espelho, "chave": ESPELHO_API_KEY})
+    servidor = ThreadingHTTPServer((host, porta), handler)
+    servidor.daemon_threads = True
+    return servidor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consulta de imóveis no espelho local do catálogo.")
+    parser.add_argument("--arquivo", default=ARQUIVO_ESPELHO)
+    parser.add_argument("--host", default=ESPELHO_HOST)
+    parser.add_argument("--porta", type=int, default=ESPELHO_PORTA)
+    args = parser.parse_args()
+    srv = criar_servidor(args.arquivo, args.host, args.porta)
+    total = srv.RequestHandlerClass.espelho.contar()
+    print(f"Servindo {total} imóveis em http://{args.host}:{srv.server_address[1]}{ROTA_LISTAR} (Ctrl-C para sair)")
+    srv.serve_forever()
@@ -1,111 +1,213 @@
+import argparse
+import csv
 import requests
 import json
 import os
-import pandas as pd
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
+from cache_http import instalar_cache
+from decodificacao_json import CHAVES_PAGINACAO, LeitorPagina
+from mapeamento_campos import MAPA_EXPORTACAO, MAPA_EXPORTACAO_TIPADA
+from paginacao_adaptativa import PaginacaoAdaptativa, ler_janela, ler_primeira
+
 # Carrega variáveis do .env
 load_dotenv()
 
 API_IMOVEIS_KEY = os.getenv("API_IMOVEIS_KEY")
-API_URL = "https://seu-endereco.vistahost.com.br/imoveis/listar"
+API_URL = os.getenv("API_LISTAR_URL", "https://seu-endereco.vistahost.com.br/imoveis/listar")
 HEADERS = {"Accept": "application/json"}
+TIMEOUT = 30  # segundos
+PERFIL_PAGINACAO = "exportacao"
+SESSAO = instalar_cache(requests.Session())  # cache em disco opcional (CACHE_HTTP, ver `cache_http.py`)
 
-def trata_data(valor):
-    if not valor or not isinstance(valor, str):
-        return None
-    valor_limpo = valor.strip()
-    if (
-        valor_limpo in ("", "0000-00-00", "0000-00-00 00:00:00")
-        or valor_limpo.replace("0", "").replace("-", "").replace(":", "").replace(" ", "") == ""
-    ):
-        return None
-    return valor
+COLUNAS = MAPA_EXPORTACAO.nomes
+LINHAS_POR_GRUPO = int(os.getenv("PARQUET_LINHAS_POR_GRUPO", "50000"))
 
-def listar_imoveis():
-    todos_imoveis = []
-    pagina = 1
-    quantidade = 50
-    while True:
-        pesquisa = {
-            "fields": [
-                "Codigo", "Categoria", "Bairro", "Status", "Orulo",
-                "DataHoraAtualizacao", "PendenteProntuario",
-                "DataDeAtivacao", "DataAtualizacao"
-            ],
-            "paginacao": {
-                "pagina": pagina,
-                "quantidade": quantidade
-            }
-        }
-        params = {
-            "key": API_IMOVEIS_KEY,
-            "showtotal": 1,
-            "showInternal: 1,
-            "pesquisa": json.dumps(pesquisa)
+class ErroAPI(RuntimeError):
+    """Resposta de erro da API (`status`/`message`)."""
+
+def buscar_pagina(pagina, quantidade):
+    """Consulta uma página da listagem; devolve os imóveis, os metadados e o tamanho da resposta."""
+    pesquisa = {
+        "fields": [
+            "Codigo", "Categoria", "Bairro", "Status", "Orulo",
+            "DataHoraAtualizacao", "PendenteProntuario",
+            "DataDeAtivacao", "DataAtualizacao"
+        ],
+        # Ordem estável: as janelas da paginação adaptativa são por posição no resultado
+        "order": {"Codigo": "asc"},
+        "paginacao": {
+            "pagina": pagina,
+            "quantidade": quantidade
         }
-        print(f"Consultando página {pagina}...")
-        response = requests.get(API_URL, headers=HEADERS, params=params)
+    }
+    params = {
+        "key": API_IMOVEIS_KEY,
+        "showtotal": 1,
+        "showInternal": 1,
+        "pesquisa": json.dumps(pesquisa)
+    }
+    # Itens e paginação são lidos direto da resposta, sem montar o dict da página inteira
+    with SESSAO.get(API_URL, headers=HEADERS, params=params, stream=True, timeout=TIMEOUT) as response:
+        leitor = LeitorPagina.da_resposta(response)
         try:
-            data = response.json()
-        except Exception as e:
+            imoveis_pagina = [item for _, item in leitor]
+        except Exception:
             print("Erro ao decodificar JSON da resposta:")
-            print(response.text)
+            print(leitor.inicio)
             raise
+    meta = leitor.metadados
 
-        print(f"Resposta da API (chaves): {list(data.keys())}")
-
-        # Se a resposta vier com status/message, é erro da API
-        if "status" in data and "message" in data:
-            print(f"ERRO da API: {data.get('message')} (status {data.get('status')})")
-            print("RESPOSTA COMPLETA DA API:", data)
-            break
-
-        imoveis_coletados = 0
-        for key, item in data.items():
-            if key in ["total", "paginas", "pagina", "quantidade"]:
-                continue
-            if isinstance(item, dict):
-                todos_imoveis.append(item)
-                imoveis_coletados += 1
-            else:
-                print(f"Ignorando item inesperado na chave {key}: {item}")
-        print(f"Imóveis coletados nesta página: {imoveis_coletados}")
+    print(f"Resposta da API (metadados): {meta}")
+
+    # Se a resposta vier com status/message, é erro da API
+    if "status" in meta and "message" in meta:
+        raise ErroAPI(f"{meta.get('message')} (status {meta.get('status')})")
 
-        paginas = data.get("paginas", 1)
-        if pagina >= paginas:
-            break
-        pagina += 1
+    for key, item in meta.items():
+        if key not in CHAVES_PAGINACAO:
+            print(f"Ignorando item inesperado na chave {key}: {item}")
+    return imoveis_pagina, meta, leitor.bytes_lidos
+
+def iterar_paginas(quantidade=None):
+    """
+    Gera a lista de imóveis de cada página, sem acumular o catálogo em memória.
+
+    O tamanho da página se ajusta à latência da API (`paginacao_adaptativa.py`), partindo de
+    `quantidade` ou do melhor tamanho da última exportação. Erros da API (`ErroAPI`) e de rede
+    são propagados: uma exportação incompleta não pode parecer completa.
+    """
+    paginacao = PaginacaoAdaptativa(PERFIL_PAGINACAO, inicial=quantidade)
+    print(f"Consultando página 1 ({paginacao.quantidade} por página)...")
+    imoveis_pagina, total = ler_primeira(buscar_pagina, paginacao)
+    print(f"Imóveis coletados nesta página: {len(imoveis_pagina)}")
+    yield imoveis_pagina
+
+    for janela in paginacao.janelas(len(imoveis_pagina), total):
+        print(f"Consultando {janela}...")
+        imoveis_pagina = ler_janela(buscar_pagina, paginacao, janela)
+        print(f"Imóveis coletados nesta página: {len(imoveis_pagina)}")
+        yield imoveis_pagina
+    paginacao.salvar()
+
+def listar_imoveis():
+    todos_imoveis = []
+    for imoveis_pagina in iterar_paginas():
+        todos_imoveis.extend(imoveis_pagina)
     print(f"Total geral coletado: {len(todos_imoveis)}")
     return todos_imoveis
 
+@contextmanager
+def gravacao_atomica(nome_arquivo):
+    """
+    Caminho temporário ao lado de `nome_arquivo`, renomeado sobre ele só se o bloco terminar
+    sem erro; em caso de erro o temporário é apagado e o arquivo anterior fica intacto.
+    """
+    tmp = f"{nome_arquivo}.tmp"
+    try:
+        yield tmp
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, nome_arquivo)
+
+def mapear_imovel(im):
+    return MAPA_EXPORTACAO.linha(im)
+
 def salvar_imoveis_csv(imoveis, nome_arquivo="imoveis.csv"):
     if not imoveis:
         print("Nenhum imóvel para salvar!")
         return
-    lista_final = []
-    for im in imoveis:
-        item = {
-            "codigoimovel": im.get("Codigo"),
-            "categoria": im.get("Categoria"),
-            "bairro": im.get("Bairro"),
-            "status": im.get("Status"),
-            "orulo": im.get("Orulo"),
-            "datahoraatualizacao": trata_data(im.get("DataHoraAtualizacao")),
-            "pendenteprontuario": im.get("PendenteProntuario"),
-            "datadeativacao": trata_data(im.get("DataDeAtivacao")),
-            "dataatualizacao": trata_data(im.get("DataAtualizacao")),
-        }
-        lista_final.append(item)
+    import pandas as pd  # só o modo legado depende do pandas
+
+    lista_final = MAPA_EXPORTACAO.linhas(imoveis)
     df = pd.DataFrame(lista_final)
-    df.to_csv(nome_arquivo, index=False, encoding="utf-8-sig")
+    with gravacao_atomica(nome_arquivo) as tmp:
+        df.to_csv(tmp, index=False, encoding="utf-8-sig")
     print(f"{len(df)} imóveis salvos em {nome_arquivo}")
 
+def exportar_csv_streaming(nome_arquivo="imoveis.csv", paginas=None):
+    """
+    Escreve cada página no CSV assim que chega (memória constante, sem pandas).
+
+    O CSV é escrito em `<nome_arquivo>.tmp` e só substitui `nome_arquivo` se todas as páginas
+    chegarem; erros são propagados.
+    """
+    total = 0
+    with gravacao_atomica(nome_arquivo) as tmp, open(tmp, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUNAS)
+        writer.writeheader()
+        for imoveis_pagina in paginas if paginas is not None else iterar_paginas():
+            writer.writerows(MAPA_EXPORTACAO.linhas(imoveis_pagina))
+            total += len(imoveis_pagina)
+    print(f"{total} imóveis salvos em {nome_arquivo}")
+    return total
+
+def exportar_parquet(nome_arquivo="imoveis.parquet", paginas=None, linhas_por_grupo=LINHAS_POR_GRUPO):
+    """
+    Exporta para Parquet com colunas de data tipadas (date32/timestamp), gravando um row group
+    a cada `linhas_por_grupo` linhas. Requer `pip install pyarrow`. Como no CSV, o arquivo só
+    é substituído se a exportação terminar.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Exportação Parquet requer o pacote pyarrow (pip install pyarrow).") from e
+
+    schema = pa.schema([
+        ("codigoimovel", pa.string()),
+        ("categoria", pa.string()),
+        ("bairro", pa.string()),
+        ("status", pa.string()),
+        ("orulo", pa.string()),
+        ("datahoraatualizacao", pa.timestamp("s")),
+        ("pendenteprontuario", pa.string()),
+        ("datadeativacao", pa.date32()),
+        ("dataatualizacao", pa.date32()),
+    ])
+    colunas = {nome: [] for nome in COLUNAS}
+    total = 0
+
+    def gravar_grupo(writer):
+        writer.write_table(pa.Table.from_pydict(colunas, schema=schema))
+        for valores in colunas.values():
+            valores.clear()
+
+    with gravacao_atomica(nome_arquivo) as tmp, pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        for imoveis_pagina in paginas if paginas is not None else iterar_paginas():
+            for nome, valores in MAPA_EXPORTACAO_TIPADA.colunas(imoveis_pagina).items():
+                colunas[nome].extend(valores)
+            total += len(imoveis_pagina)
+            if len(colunas["codigoimovel"]) >= linhas_por_grupo:
+                gravar_grupo(writer)
+        if colunas["codigoimovel"]:
+            gravar_grupo(writer)
+    print(f"{total} imóveis salvos em {nome_arquivo}")
+    return total
+
 if __name__ == "__main__":
-    imoveis = listar_imoveis()
-    if imoveis:
-        print("Exemplo do primeiro imóvel coletado:")
-        print(json.dumps(imoveis[0], indent=2, ensure_ascii=False))
-        salvar_imoveis_csv(imoveis)
-    else:
-        print("Nenhum imóvel coletado para salvar.")
+    parser = argparse.ArgumentParser(description="Exporta imóveis da API Vista para CSV ou Parquet.")
+    parser.add_argument("--formato", choices=["csv", "parquet", "csv-legado"], default="csv",
+                        help="csv (streaming), parquet (colunar, datas tipadas) ou csv-legado (pandas)")
+    parser.add_argument("--saida", help="arquivo de saída (padrão: imoveis.csv / imoveis.parquet)")
+    args = parser.parse_args()
+
+    try:
+        if args.formato == "parquet":
+            exportar_parquet(args.saida or "imoveis.parquet")
+        elif args.formato == "csv":
+            exportar_csv_streaming(args.saida or "imoveis.csv")
+        else:
+            imoveis = listar_imoveis()
+            if imoveis:
+                print("Exemplo do primeiro imóvel coletado:")
+                print(json.dumps(imoveis[0], indent=2, ensure_ascii=False))
+                salvar_imoveis_csv(imoveis, args.saida or "imoveis.csv")
+            else:
+                print("Nenhum imóvel coletado para salvar.")
+    except ErroAPI as e:
+        print(f"ERRO da API: {e}. Exportação interrompida; o arquivo de saída não foi alterado.")
+        raise SystemExit(1)
@@ -1,15 +1,40 @@
 from __future__ import annotations
 
+import argparse
+import itertools
 import json
 import os
-from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import requests
 from dotenv import load_dotenv
-from requests.adapters import HTTPAdapter, Retry
+from requests.adapters import HTTPAdapter
 from supabase import Client, create_client
 from tqdm import tqdm
 
+from cache_http import em_cache, instalar_cache
+from decodificacao_json import LeitorPagina
+from destinos_gravacao import DestinoGravacao, DestinoSupabase, criar_destino, tipo_destino
+from espelho_catalogo import EspelhoCatalogo
+from hashes_linhas import HashesLinhas
+from instrumentacao import METRICAS, RetryInstrumentado, instrumentar_sessao
+from limitador_taxa import LimitadorAdaptativo, parse_retry_after
+from mapeamento_campos import MAPA_IMOVEL_LOCAL, para_data
+from paginacao_adaptativa import Janela, PaginacaoAdaptativa, ler_janela, ler_primeira
+from reconciliacao_exclusoes import (
+    Exclusoes,
+    codigos_vista,
+    iterar_por_chave,
+    reconciliar_tabela,
+    tabelas_configuradas,
+)
+from pipeline_estagios import Estagio, executar_pipeline
+from politica_requisicoes import PoliticaRequisicoes, PrazoEsgotado, politica_do_ambiente
+
 # =========================
 # Configuração e Constantes
 # =========================
@@ -19,19 +44,57 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 API_IMOVEIS_KEY = os.getenv("API_IMOVEIS_KEY")
-API_IMOVEIS_URL = os.getenv("API_IMOVEIS_URL")  x
+API_IMOVEIS_URL = os.getenv("API_IMOVEIS_URL")
 
 HEADERS = {"Accept": "application/json"}
-PAGINACAO_QTD = 50
+PERFIL_PAGINACAO = "imovel_local"  # tamanho de página adaptativo (ver `paginacao_adaptativa.py`)
+PERFIL_PAGINACAO_CODIGOS = "imovel_codigos"  # listagem só com `Codigo` (reconciliação)
 TIMEOUT = 30  # segundos
-
-
-def validar_ambiente() -> None:
+POOL_CONEXOES = 20
+PAGINACAO_WORKERS = int(os.getenv("PAGINACAO_WORKERS", "8"))  # 1 = coleta sequencial
+
+# Limitador de taxa da listagem (ver `limitador_taxa.py`), como no importador de prontuários
+TAXA_MAX_REQ_S = float(os.getenv("TAXA_MAX_REQ_S", "10"))          # teto de requisições/s na API externa
+TAXA_INICIAL_REQ_S = float(os.getenv("TAXA_INICIAL_REQ_S", "2.5"))  # taxa inicial (sobe enquanto a API responde bem)
+MAX_EM_VOO = int(os.getenv("MAX_EM_VOO", str(PAGINACAO_WORKERS)))  # requisições simultâneas (cópias inclusive)
+MAX_TENTATIVAS_LIMITE = 5  # 429 seguidos na mesma página antes de desistir dela
+
+# Sincronização incremental: marca d'água da última execução bem-sucedida
+ARQUIVO_WATERMARK = os.getenv("ARQUIVO_WATERMARK", ".vista_imoveis_watermark.json")
+CAMPO_WATERMARK = os.getenv("CAMPO_WATERMARK", "DataHoraAtualizacao")  # ou "DataAtualizacao"
+SOBREPOSICAO_MINUTOS = int(os.getenv("SOBREPOSICAO_MINUTOS", "60"))  # janela de segurança
+FORMATOS_DATA = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+# Gravação no Supabase em lotes limitados
+LOTE_MAX_LINHAS = int(os.getenv("LOTE_MAX_LINHAS", "500"))
+LOTE_MAX_BYTES = int(os.getenv("LOTE_MAX_BYTES", str(1024 * 1024)))  # ~1 MiB de JSON por lote
+LOTE_CONCORRENCIA = int(os.getenv("LOTE_CONCORRENCIA", "3"))  # lotes em voo simultaneamente
+NORMALIZACAO_WORKERS = int(os.getenv("NORMALIZACAO_WORKERS", "1"))
+PIPELINE_FILA = int(os.getenv("PIPELINE_FILA", "32"))  # páginas em espera entre estágios
+
+# Hashes das linhas já gravadas: só reenvia imóveis novos ou alterados
+ARQUIVO_HASHES = os.getenv("ARQUIVO_HASHES", ".vista_hashes.sqlite")
+
+# Espelho local do catálogo para a action `buscarImoveis` (ver `espelho_catalogo.py`); vazio desativa
+ARQUIVO_ESPELHO = os.getenv("ARQUIVO_ESPELHO", ".vista_espelho.sqlite")
+# Campos pedidos à API além dos de `imovel_local`, só para o espelho (ex.: Cidade,ValorVenda,Dormitorios)
+ESPELHO_CAMPOS = [c.strip() for c in os.getenv("ESPELHO_CAMPOS", "").split(",") if c.strip()]
+
+# Reconciliação de exclusões (ver `reconciliacao_exclusoes.py`): tabelas "tabela[:coluna_codigo]"
+RECONCILIAR_TABELAS = os.getenv("RECONCILIAR_TABELAS", "imovel_local:codigo,imoveis:codigo")
+COLUNA_EXCLUIDO = os.getenv("COLUNA_EXCLUIDO", "excluido_em")
+RECONCILIAR_MAX_FRACAO = float(os.getenv("RECONCILIAR_MAX_FRACAO", "0.2"))
+ARQUIVO_EXCLUSOES = os.getenv("ARQUIVO_EXCLUSOES", ".vista_exclusoes.sqlite")
+
+
+def validar_ambiente(reconciliar: bool = False) -> None:
     faltando = []
-    if not SUPABASE_URL:
-        faltando.append("SUPABASE_URL")
-    if not SUPABASE_KEY:
-        faltando.append("SUPABASE_KEY")
+    # A reconciliação lê os códigos das tabelas pelo Supabase, qualquer que seja o destino
+    if reconciliar or tipo_destino() == "supabase":
+        if not SUPABASE_URL:
+            faltando.append("SUPABASE_URL")
+        if not SUPABASE_KEY:
+            faltando.append("SUPABASE_KEY")
     if not API_IMOVEIS_KEY:
         faltando.append("API_IMOVEIS_KEY")
     if not API_IMOVEIS_URL:
@@ -42,121 +105,310 @@ def validar_ambiente() -> None:
         )
 
 
-def sessao_http() -> requests.Session:
-    """Sessao com retries exponenciais"""
+def sessao_http(retry_429: bool = True) -> requests.Session:
+    """
+    Sessao com retries exponenciais (instrumentada: latência, status e retries) e cache opcional (`cache_http.py`).
+
+    Com `retry_429=False` o 429 não é repetido pelo adapter e chega a `buscar_pagina`, para
+    que o limitador de taxa possa reagir a ele.
+    """
     session = requests.Session()
-    retries = Retry(
+    status_retry = (429, 500, 502, 503, 504) if retry_429 else (500, 502, 503, 504)
+    retries = RetryInstrumentado(
         total=5,
         backoff_factor=0.8,
-        status_forcelist=(429, 500, 502, 503, 504),
+        status_forcelist=status_retry,
         allowed_methods=("GET",),
         raise_on_status=False,
+        # Com Retry-After o urllib3 repete o 429 mesmo fora da lista; o limitador cuida disso
+        respect_retry_after_header=retry_429,
+    )
+    adapter = HTTPAdapter(
+        max_retries=retries, pool_connections=POOL_CONEXOES, pool_maxsize=POOL_CONEXOES
     )
-    adapter = HTTPAdapter(max_retries=retries, pool_connections=20, pool_maxsize=20)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
-    return session
+    return instalar_cache(instrumentar_sessao(session))
+
+
+def criar_limitador() -> LimitadorAdaptativo:
+    """Limitador de taxa das páginas da listagem (`TAXA_MAX_REQ_S`, `MAX_EM_VOO`)."""
+    return LimitadorAdaptativo(
+        taxa_max=TAXA_MAX_REQ_S, max_em_voo=MAX_EM_VOO, taxa_inicial=TAXA_INICIAL_REQ_S
+    )
+
 
+def resumir_limitador(limitador: LimitadorAdaptativo) -> None:
+    """Imprime e registra nas métricas o estado final do limitador da listagem."""
+    print(
+        f"Taxa final: {limitador.taxa:.2f} req/s | limites recebidos: {limitador.limites_recebidos} "
+        f"| espera no limitador: {limitador.tempo_espera:.1f}s"
+    )
+    METRICAS.registrar_espera(limitador.tempo_espera, motivo="limitador")
+    METRICAS.definir("limitador_taxa_final", limitador.taxa)
+    METRICAS.contar("limites_recebidos_total", limitador.limites_recebidos)
 
-def parse_json_resposta(resp: requests.Response) -> Dict[str, Any]:
-    """Decodifica json e trata com mensagem carinhosa o bonito"""
+
+def ler_pagina_resposta(
+    resp: requests.Response, leitor: Optional[LeitorPagina] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any], int]:
+    """Decodifica os itens, metadados e tamanho (bytes) da página e trata com mensagem carinhosa o bonito"""
+    leitor = leitor or LeitorPagina.da_resposta(resp)
     try:
-        return resp.json()
+        itens = [item for _, item in leitor]
+        return itens, leitor.metadados, leitor.bytes_lidos
     except Exception as e:
-        corpo = resp.text[:1000]
         raise ValueError(
-            f"Erro ao decodificar JSON. Status={resp.status_code}. Corpo (parcial): {corpo}"
+            f"Erro ao decodificar JSON. Status={resp.status_code}. Corpo (parcial): {leitor.inicio}"
         ) from e
 
 
-def montar_pesquisa(pagina: int, quantidade: int) -> Dict[str, Any]:
-    """Payload de pesquisa esperado pela API."""
-    return {
-        "fields": [
+def montar_pesquisa(
+    pagina: int,
+    quantidade: int,
+    filtro: Optional[Dict[str, Any]] = None,
+    campos: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Payload de pesquisa esperado pela API (`campos` substitui os campos de `imovel_local`)."""
+    if campos is None:
+        campos = [
             "Codigo", "Categoria", "Bairro", "Status", "Orulo", "DataCadastro",
-            "DataDeAtivacao", "DataAtualizacao", "ExibirNoSite",
-        ],
+            "DataDeAtivacao", "DataAtualizacao", "DataHoraAtualizacao", "ExibirNoSite",
+        ]
+        if ARQUIVO_ESPELHO:
+            campos += [c for c in ESPELHO_CAMPOS if c not in campos]
+    pesquisa: Dict[str, Any] = {
+        "fields": campos,
+        # Ordem estável: as janelas da paginação adaptativa são por posição no resultado
+        "order": {"Codigo": "asc"},
         "paginacao": {"pagina": pagina, "quantidade": quantidade},
     }
+    if filtro:
+        pesquisa["filter"] = filtro
+    return pesquisa
 
 
-def parametros_requisicao(pagina: int, quantidade: int) -> Dict[str, Any]:
+def parametros_requisicao(
+    pagina: int,
+    quantidade: int,
+    filtro: Optional[Dict[str, Any]] = None,
+    campos: Optional[List[str]] = None,
+) -> Dict[str, Any]:
     """Query string para a API."""
     return {
         "key": API_IMOVEIS_KEY,
         "showtotal": 1, 
         "showInternal": 1, # Lista os imoveis inativos
-        "pesquisa": json.dumps(montar_pesquisa(pagina, quantidade)),
+        "pesquisa": json.dumps(montar_pesquisa(pagina, quantidade, filtro, campos)),
     }
 
 
-def tratar_data(valor: Optional[str]) -> Optional[str]:
-    """Transforma datas inválidas e vazias para None."""
-    if not valor or valor == "0000-00-00":
-        return None
-    return valor
+def normalizar_pagina(itens: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Mapeia e normaliza uma página inteira para a tabela `imovel_local` (ver `MAPA_IMOVEL_LOCAL`)."""
+    return MAPA_IMOVEL_LOCAL.linhas(itens)
 
 
 def normalizar_item(im: Dict[str, Any]) -> Dict[str, Any]:
-    """Mapeia e normaliza campos para a tabela Supabase `imoveis`."""
-    return {
-        "codigo": im.get("Codigo"),
-        "categoria": im.get("Categoria"),
-        "bairro": im.get("Bairro"),
-        "status": im.get("Status"), 
-        "orulo": im.get("Orulo"), # Util para realizar queries posteriores de acordo com o objetivo do serviço final
-        "exibirnosite": im.get("ExibirNoSite"), 
-        "dataatualizacao": tratar_data(im.get("DataAtualizacao")),
-        "datadeativacao": tratar_data(im.get("DataDeAtivacao")),
-        "datacadastro": tratar_data(im.get("DataCadastro")),
-    }
+    """Mapeia e normaliza um único imóvel (ver `normalizar_pagina`)."""
+    return MAPA_IMOVEL_LOCAL.linha(im)
+
+
+def parse_data_hora(valor: Optional[str]) -> Optional[datetime]:
+    """Converte `YYYY-MM-DD[ HH:MM:SS]` da API em datetime (None se vazio/inválido)."""
+    valor = para_data(valor)
+    if not valor:
+        return None
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(valor.strip(), formato)
+        except ValueError:
+            continue
+    return None
+
+
+def ler_watermark() -> Optional[datetime]:
+    """Lê a marca d'água salva pela última sincronização bem-sucedida."""
+    if not os.path.exists(ARQUIVO_WATERMARK):
+        return None
+    with open(ARQUIVO_WATERMARK, encoding="utf-8") as f:
+        return parse_data_hora(json.load(f).get("atualizado_ate"))
 
 
-def extrair_itens(data: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], int, int]:
-    """Extrai os itens e metadados de paginação da API."""
-    itens: List[Dict[str, Any]] = [
-        item for key, item in data.items()
-        if key not in {"total", "paginas", "pagina", "quantidade"} and isinstance(item, dict)
-    ]
-    pagina_atual = int(data.get("pagina", 1))
-    total_paginas = int(data.get("paginas", 1))
-    return itens, pagina_atual, total_paginas
+def salvar_watermark(valor: datetime) -> None:
+    """Grava a marca d'água de forma atômica (arquivo temporário + rename)."""
+    tmp = f"{ARQUIVO_WATERMARK}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"atualizado_ate": valor.strftime(FORMATOS_DATA[0])}, f)
+    os.replace(tmp, ARQUIVO_WATERMARK)
 
 
-def listar_imoveis() -> List[Dict[str, Any]]:
+def calcular_watermark(imoveis: List[Dict[str, Any]]) -> Optional[datetime]:
+    """Maior `DataHoraAtualizacao`/`DataAtualizacao` entre os imóveis coletados."""
+    maior: Optional[datetime] = None
+    for im in imoveis:
+        valor = parse_data_hora(im.get("DataHoraAtualizacao")) or parse_data_hora(
+            im.get("DataAtualizacao")
+        )
+        if valor and (maior is None or valor > maior):
+            maior = valor
+    return maior
+
+
+def filtro_alterados_desde(desde: datetime) -> Dict[str, Any]:
+    """Filtro por intervalo em `CAMPO_WATERMARK`, recuando `SOBREPOSICAO_MINUTOS`."""
+    inicio = desde - timedelta(minutes=SOBREPOSICAO_MINUTOS)
+    fim = datetime.now() + timedelta(days=1)
+    formato = FORMATOS_DATA[0] if CAMPO_WATERMARK == "DataHoraAtualizacao" else FORMATOS_DATA[1]
+    return {CAMPO_WATERMARK: [inicio.strftime(formato), fim.strftime(formato)]}
+
+
+def buscar_pagina(
+    session: requests.Session,
+    pagina: int,
+    quantidade: int,
+    filtro: Optional[Dict[str, Any]] = None,
+    campos: Optional[List[str]] = None,
+    politica: Optional[PoliticaRequisicoes] = None,
+    limitador: Optional[LimitadorAdaptativo] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any], int]:
+    """
+    Consulta uma página da listagem e valida a resposta da API.
+
+    Retorna os itens, os metadados de paginação e o tamanho da resposta em bytes; a paginação
+    é lida junto com os itens, sem montar o dict da resposta inteira (ver `decodificacao_json.py`).
+    Com `limitador`, a página respeita a taxa e o limite de requisições em voo, e 429 /
+    "too many connections" reduzem a taxa para todas as threads antes de repetir a página
+    (use uma sessão com `retry_429=False`). Com `politica`, o timeout respeita o prazo da
+    execução e, havendo `limitador`, páginas lentas ganham uma cópia dentro dele (ver
+    `politica_requisicoes.py`). Páginas já no cache HTTP não passam por nenhum dos dois.
     """
-    Percorre a paginação da API e retorna todos os imóveis, comecando sempre pela primeira pagina de resultados
+    params = parametros_requisicao(pagina, quantidade, filtro, campos)
+    opcoes: Dict[str, Any] = {"headers": HEADERS, "params": params, "timeout": TIMEOUT, "stream": True}
+    tentativas = 0
+    with METRICAS.cronometrar("listar_pagina"):
+        while True:
+            if em_cache(session, API_IMOVEIS_URL, params):
+                resp = session.get(API_IMOVEIS_URL, **opcoes)
+            elif politica:
+                resp = politica.get(session, API_IMOVEIS_URL, "listar", limitador, **opcoes)
+            else:
+                with limitador.slot() if limitador else nullcontext():
+                    resp = session.get(API_IMOVEIS_URL, **opcoes)
+            with resp:
+                leitor = LeitorPagina.da_resposta(resp)
+                limite = limitador is not None and (
+                    resp.status_code == 429 or "too many connections" in leitor.inicio.lower()
+                )
+                if not limite:
+                    itens, meta, tamanho = ler_pagina_resposta(resp, leitor)
+            if not limite:
+                break
+            tentativas += 1
+            METRICAS.registrar_retry(resp.status_code, origem="listar")
+            if tentativas >= MAX_TENTATIVAS_LIMITE:
+                raise RuntimeError(f"Rate limit persistente na página {pagina} após {tentativas} tentativas")
+            limitador.registrar_limite(parse_retry_after(resp.headers.get("Retry-After")))
+        if limitador:
+            limitador.registrar_sucesso()
+        if "status" in meta and "message" in meta:
+            raise RuntimeError(
+                f"Erro API (página {pagina}): {meta.get('message')} (status {meta.get('status')})"
+            )
+    return itens, meta, tamanho
+
+
+def coletar_paginas(
+    session: requests.Session,
+    workers: int = PAGINACAO_WORKERS,
+    filtro: Optional[Dict[str, Any]] = None,
+    paginacao: Optional[PaginacaoAdaptativa] = None,
+    limitador: Optional[LimitadorAdaptativo] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[Janela, str]]:
     """
+    Coleta toda a listagem, distribuindo as janelas de imóveis entre `workers` threads.
+
+    A primeira página é consultada uma única vez (para descobrir o `total`) e reaproveitada.
+    As demais são planejadas por posição com o tamanho de página adaptativo (`paginacao`),
+    só `workers` janelas à frente, para que os ajustes de tamanho valham para as seguintes.
+    Com `limitador`, as páginas respeitam a taxa da API (ver `buscar_pagina`).
+    Retorna os itens em ordem e um dicionário {janela: erro} das janelas que falharam,
+    sem descartar as que foram coletadas com sucesso.
+    """
+    paginacao = paginacao or PaginacaoAdaptativa(PERFIL_PAGINACAO)
+
+    def buscar(pagina: int, quantidade: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any], int]:
+        return buscar_pagina(session, pagina, quantidade, filtro, limitador=limitador)
+
+    itens, total = ler_primeira(buscar, paginacao)
+    por_inicio: Dict[int, List[Dict[str, Any]]] = {0: itens}
+    falhas: Dict[Janela, str] = {}
+    planejadas = paginacao.janelas(len(itens), total)
+    workers = max(1, min(workers, POOL_CONEXOES))
+
+    with tqdm(total=total, initial=len(itens), desc="Coletando imóveis", unit="imóvel") as barra:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            em_voo: Dict[Future, Janela] = {}
+
+            def submeter() -> None:
+                for janela in itertools.islice(planejadas, workers - len(em_voo)):
+                    em_voo[pool.submit(ler_janela, buscar, paginacao, janela)] = janela
+
+            submeter()
+            while em_voo:
+                concluidos, _ = wait(em_voo, return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    janela = em_voo.pop(futuro)
+                    try:
+                        por_inicio[janela.inicio] = futuro.result()
+                    except Exception as e:
+                        falhas[janela] = str(e)
+                    barra.update(janela.fim - janela.inicio)
+                submeter()
+
     todos: List[Dict[str, Any]] = []
-    session = sessao_http()
-
-    # Requisição inicial para obter total de páginas
-    resp = session.get(
-        API_IMOVEIS_URL,
-        headers=HEADERS,
-        params=parametros_requisicao(1, PAGINACAO_QTD),
-        timeout=TIMEOUT,
-    )
-    data = parse_json_resposta(resp)
-    if "status" in data and "message" in data:
-        raise RuntimeError(f"Erro API: {data.get('message')} (status {data.get('status')})")
-
-    _, _, total_paginas = extrair_itens(data)
-
-    for pagina in tqdm(range(1, total_paginas + 1), desc="Coletando páginas", unit="pág"):
-        resp = session.get(
-            API_IMOVEIS_URL,
-            headers=HEADERS,
-            params=parametros_requisicao(pagina, PAGINACAO_QTD),
-            timeout=TIMEOUT,
-        )
-        data = parse_json_resposta(resp)
-        if "status" in data and "message" in data:
-            raise RuntimeError(f"Erro API (página {pagina}): {data.get('message')}")
+    for inicio in sorted(por_inicio):
+        todos.extend(por_inicio[inicio])
+    return todos, falhas
+
+
+def reportar_falhas(falhas: Dict[Janela, str]) -> None:
+    """Lista as janelas de páginas que falharam na coleta."""
+    if falhas:
+        print(f"[AVISO] {len(falhas)} página(s) falharam e não foram coletadas:")
+        for janela in sorted(falhas):
+            print(f"  - {janela}: {falhas[janela]}")
+
 
-        itens, _, _ = extrair_itens(data)
-        todos.extend(itens)
+def abrir_espelho() -> Optional[EspelhoCatalogo]:
+    """Espelho local do catálogo em `ARQUIVO_ESPELHO` (None se desativado)."""
+    return EspelhoCatalogo(ARQUIVO_ESPELHO) if ARQUIVO_ESPELHO else None
 
+
+def listar_imoveis(
+    workers: int = PAGINACAO_WORKERS, filtro: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Percorre a paginação da API e retorna todos os imóveis, comecando sempre pela primeira pagina de resultados.
+
+    Com `workers` > 1 as páginas são buscadas em paralelo; páginas com falha são reportadas
+    e os imóveis das demais páginas são mantidos. `filtro` é repassado como `filter` da pesquisa.
+    Sem falhas, o melhor tamanho de página medido fica salvo para a próxima execução.
+    Os imóveis coletados também são gravados no espelho local (`ARQUIVO_ESPELHO`).
+    """
+    session = sessao_http(retry_429=False)
+    paginacao = PaginacaoAdaptativa(PERFIL_PAGINACAO)
+    limitador = criar_limitador()
+    todos, falhas = coletar_paginas(session, workers, filtro, paginacao, limitador)
+    reportar_falhas(falhas)
+    resumir_limitador(limitador)
+    espelho = abrir_espelho()
+    if espelho:
+        try:
+            espelho.gravar(todos)
+        finally:
+            espelho.fechar()
+    if not falhas:
+        paginacao.salvar()
     return todos
 
 
@@ -165,38 +417,345 @@ def conectar_supabase() -> Client:
     return create_client(SUPABASE_URL, SUPABASE_KEY)
 
 
-def inserir_imoveis_supabase(imoveis: List[Dict[str, Any]], supabase: Client) -> None:
-    """Upsert em lote na tabela `imoveis`."""
-    if not imoveis:
+@dataclass
+class ResultadoLote:
+    """Resultado do upsert de um lote."""
+
+    numero: int
+    linhas: int
+    gravadas: int = 0
+    erro: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.erro is None
+
+
+def gerar_lotes(
+    registros: Iterable[Dict[str, Any]],
+    max_linhas: int = LOTE_MAX_LINHAS,
+    max_bytes: int = LOTE_MAX_BYTES,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Agrupa registros em lotes limitados por número de linhas ou tamanho aproximado em JSON."""
+    lote: List[Dict[str, Any]] = []
+    tamanho = 0
+    for registro in registros:
+        bytes_registro = len(json.dumps(registro, ensure_ascii=False, default=str))
+        if lote and (len(lote) >= max_linhas or tamanho + bytes_registro > max_bytes):
+            yield lote
+            lote, tamanho = [], 0
+        lote.append(registro)
+        tamanho += bytes_registro
+    if lote:
+        yield lote
+
+
+def upsert_lote(
+    destino: DestinoGravacao,
+    numero: int,
+    lote: List[Dict[str, Any]],
+    hashes: Optional[HashesLinhas] = None,
+) -> ResultadoLote:
+    """Envia um lote para `imovel_local`; erros viram `ResultadoLote.erro` em vez de exceção."""
+    resultado = ResultadoLote(numero=numero, linhas=len(lote))
+    try:
+        with METRICAS.cronometrar(destino.estagio, tabela="imovel_local"):
+            resultado.gravadas = destino.gravar("imovel_local", lote, ["codigo"])
+        METRICAS.contar("linhas_gravadas_total", resultado.gravadas, tabela="imovel_local")
+        if hashes:
+            hashes.confirmar(lote)
+    except Exception as e:
+        resultado.erro = str(e)[:500]
+    return resultado
+
+
+def gravar_em_lotes(
+    destino: DestinoGravacao,
+    registros: Iterable[Dict[str, Any]],
+    concorrencia: int = LOTE_CONCORRENCIA,
+    hashes: Optional[HashesLinhas] = None,
+) -> List[ResultadoLote]:
+    """
+    Consome `registros` (pode ser um gerador) e grava lote a lote, com no máximo `concorrencia`
+    lotes em voo. Novos lotes só são montados quando há vaga, então a memória fica limitada a
+    `concorrencia` lotes independentemente do tamanho do catálogo.
+
+    Com `hashes`, linhas idênticas ao último upsert confirmado não são reenviadas.
+    """
+    if hashes:
+        registros = hashes.alterados(registros)
+    resultados: List[ResultadoLote] = []
+    em_voo: Set[Future] = set()
+
+    def coletar(concluidos: Iterable[Future]) -> None:
+        for futuro in concluidos:
+            r = futuro.result()
+            resultados.append(r)
+            if r.ok:
+                print(f"Lote {r.numero}: {r.gravadas}/{r.linhas} imóveis gravados.")
+            else:
+                print(f"[ERRO] Lote {r.numero} ({r.linhas} imóveis): {r.erro}")
+
+    with ThreadPoolExecutor(max_workers=max(1, concorrencia)) as pool:
+        for numero, lote in enumerate(gerar_lotes(registros), start=1):
+            if len(em_voo) >= concorrencia:
+                concluidos, em_voo = wait(em_voo, return_when=FIRST_COMPLETED)
+                coletar(concluidos)
+            em_voo.add(pool.submit(upsert_lote, destino, numero, lote, hashes))
+        coletar(as_completed(em_voo))
+
+    resultados.sort(key=lambda r: r.numero)
+    return resultados
+
+
+def inserir_imoveis_supabase(
+    imoveis: Iterable[Dict[str, Any]], supabase: Client, hashes: Optional[HashesLinhas] = None
+) -> bool:
+    """
+    Upsert em lotes na tabela `imoveis`. Retorna True se o Supabase confirmou todos os lotes.
+
+    A normalização é feita sob demanda (gerador), lote a lote. Com `hashes`, só imóveis novos
+    ou alterados são enviados.
+    """
+    print("Inserindo/atualizando imóveis no Supabase em lotes...")
+    registros = (normalizar_item(im) for im in imoveis)
+    return resumir_lotes(gravar_em_lotes(DestinoSupabase(supabase), registros, hashes=hashes), hashes)
+
+
+def resumir_lotes(resultados: List[ResultadoLote], hashes: Optional[HashesLinhas] = None) -> bool:
+    """Imprime o resumo da gravação em lotes e retorna True se todos tiveram sucesso."""
+    if hashes:
+        print(f"{hashes.pulados} imóveis inalterados não foram reenviados.")
+        METRICAS.contar("linhas_puladas_total", hashes.pulados, tabela="imovel_local")
+    if not resultados:
         print("Nenhum imóvel para inserir.")
-        return
+        return True
 
-    registros = [normalizar_item(im) for im in imoveis]
-    print(f"Inserindo/atualizando {len(registros)} imóveis no Supabase...")
-    res = supabase.table("imovel_local").upsert(registros, on_conflict=["codigo"]).execute()
-    payload = res.model_dump()
+    falhos = [r for r in resultados if not r.ok]
+    gravadas = sum(r.gravadas for r in resultados)
+    print(f"{gravadas} imóveis inseridos/atualizados em {len(resultados)} lote(s).")
+    if falhos:
+        print(f"[AVISO] {len(falhos)} lote(s) falharam: {[r.numero for r in falhos]}")
+    return not falhos
 
-    if payload.get("data") is not None:
-        print(f"{len(payload['data'])} imóveis inseridos/atualizados com sucesso.")
+
+def reconciliar_exclusoes(
+    vista: Optional[Set[str]] = None, forcar: bool = False, politica: Optional[PoliticaRequisicoes] = None
+) -> bool:
+    """
+    Marca `COLUNA_EXCLUIDO` nas tabelas de `RECONCILIAR_TABELAS` para os imóveis que sumiram do
+    Vista e a limpa nos que voltaram (ver `reconciliacao_exclusoes.py`).
+
+    `vista` são os códigos de uma listagem completa e sem falhas; sem ele, a listagem é refeita
+    pedindo só o campo `Codigo`. Os excluídos saem também do espelho local e entram em
+    `ARQUIVO_EXCLUSOES`, que o importador de prontuários consulta. Retorna False se alguma
+    tabela passou do limite `RECONCILIAR_MAX_FRACAO` (ignorado com `forcar=True`).
+    """
+    if vista is None:
+        session = sessao_http(retry_429=False)
+        paginacao = PaginacaoAdaptativa(PERFIL_PAGINACAO_CODIGOS)
+        limitador = criar_limitador()
+
+        def buscar(pagina: int, quantidade: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any], int]:
+            return buscar_pagina(
+                session, pagina, quantidade, campos=["Codigo"], politica=politica, limitador=limitador
+            )
+
+        vista = codigos_vista(buscar, paginacao)
+        paginacao.salvar()
+    print(f"Reconciliando exclusões: {len(vista)} códigos na listagem do Vista.")
+    if not vista:
+        print("[AVISO] Listagem do Vista vazia: reconciliação ignorada.")
+        return False
+
+    supabase = conectar_supabase()
+    destino = criar_destino(lambda: supabase)
+    exclusoes = Exclusoes(ARQUIVO_EXCLUSOES)
+    espelho = abrir_espelho()
+    max_fracao = 1.0 if forcar else RECONCILIAR_MAX_FRACAO
+    completa = True
+    try:
+        for tabela, coluna in tabelas_configuradas(RECONCILIAR_TABELAS):
+            with METRICAS.cronometrar("reconciliar_tabela", tabela=tabela):
+                resultado = reconciliar_tabela(
+                    vista,
+                    iterar_por_chave(supabase, tabela, coluna, [COLUNA_EXCLUIDO]),
+                    tabela,
+                    coluna,
+                    destino.atualizar,
+                    COLUNA_EXCLUIDO,
+                    max_fracao,
+                    LOTE_MAX_LINHAS,
+                )
+            print(resultado.resumo())
+            if resultado.abortado:
+                completa = False
+                continue
+            exclusoes.marcar(resultado.excluidos)
+            exclusoes.desmarcar(resultado.restaurados)
+            if espelho:
+                espelho.remover(resultado.excluidos)
+    finally:
+        destino.fechar()
+        exclusoes.fechar()
+        if espelho:
+            espelho.fechar()
+    return completa
+
+
+def main(completo: bool = False, dedup: bool = True, reconciliar: bool = False, forcar: bool = False) -> None:
+    """
+    Sincroniza imóveis da API para o Supabase.
+
+    Por padrão é incremental: consulta apenas imóveis alterados desde a marca d'água da última
+    execução bem-sucedida. Com `completo=True` (ou sem marca d'água) baixa o catálogo inteiro.
+    Com `dedup=True` só grava imóveis cujo conteúdo normalizado mudou (`ARQUIVO_HASHES`).
+    Com `reconciliar=True` marca como excluídos os imóveis que sumiram do Vista
+    (ver `reconciliar_exclusoes`).
+    """
+    validar_ambiente(reconciliar)
+    METRICAS.iniciar("importa_imoveis")
+    try:
+        sincronizar(completo, dedup, reconciliar, forcar)
+    finally:
+        METRICAS.exportar()
+
+
+def sincronizar(completo: bool = False, dedup: bool = True, reconciliar: bool = False, forcar: bool = False) -> None:
+    """Executa a sincronização (ver `main`)."""
+    desde = None if completo else ler_watermark()
+    filtro = filtro_alterados_desde(desde) if desde else None
+    if filtro:
+        print(f"Sincronização incremental: alterados desde {desde} (filtro {filtro}).")
     else:
-        print("Erro Supabase:")
-        print(json.dumps(payload, indent=2, ensure_ascii=False))
+        print("Sincronização completa do catálogo.")
 
+    session = sessao_http(retry_429=False)
+    destino = criar_destino(conectar_supabase)
+    paginacao = PaginacaoAdaptativa(PERFIL_PAGINACAO)
+    politica = politica_do_ambiente()
+    # Vagas e fichas compartilhadas pelos `PAGINACAO_WORKERS` e pelas cópias de páginas lentas
+    limitador = criar_limitador()
 
-def main() -> None:
-    validar_ambiente()
-    imoveis = listar_imoveis()
-    print(f"Total coletado: {len(imoveis)}")
-    if imoveis:
+    def buscar_tamanho(pagina: int, quantidade: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any], int]:
+        return buscar_pagina(session, pagina, quantidade, filtro, politica=politica, limitador=limitador)
+
+    itens_primeira, total = ler_primeira(buscar_tamanho, paginacao)
+    if itens_primeira:
         print("Exemplo do primeiro imóvel:")
-        print(json.dumps(imoveis[0], indent=2, ensure_ascii=False))
-    supabase = conectar_supabase()
-    inserir_imoveis_supabase(imoveis, supabase)
+        print(json.dumps(itens_primeira[0], indent=2, ensure_ascii=False))
+
+    # Busca, normalização e gravação rodam sobrepostas: páginas fluem por filas limitadas
+    marcas: List[datetime] = []
+    coletados: List[int] = []
+    # Sincronização completa: os códigos vistos dispensam outra listagem na reconciliação
+    vistos: Optional[Set[str]] = set() if reconciliar and filtro is None else None
+
+    # Janelas planejadas por posição, sob demanda: mudanças de tamanho valem para as seguintes
+    primeira = Janela(0, len(itens_primeira), 1, len(itens_primeira))
+    janelas = itertools.chain((primeira,), paginacao.janelas(len(itens_primeira), total))
+
+    def buscar(janela: Janela) -> List[List[Dict[str, Any]]]:
+        if janela is primeira:
+            return [itens_primeira]
+        return [ler_janela(buscar_tamanho, paginacao, janela)]
+
+    def normalizar(itens: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        marca = calcular_watermark(itens)
+        if marca:
+            marcas.append(marca)
+        coletados.append(len(itens))
+        if vistos is not None:
+            vistos.update([str(im["Codigo"]) for im in itens if im.get("Codigo")])
+        if espelho:
+            espelho.gravar(itens)
+        return [normalizar_pagina(itens)]
+
+    hashes = HashesLinhas(ARQUIVO_HASHES, "imovel_local", ["codigo"]) if dedup else None
+    espelho = abrir_espelho()
+
+    def gravar(paginas: Iterable[List[Dict[str, Any]]]) -> List[ResultadoLote]:
+        return gravar_em_lotes(destino, (linha for pagina in paginas for linha in pagina), hashes=hashes)
+
+    try:
+        resultados, stats = executar_pipeline(
+            # Com `PRAZO_EXECUCAO_SEGUNDOS`, nenhuma janela nova começa depois do prazo
+            fonte=politica.ate_o_prazo(janelas),
+            estagios=[
+                Estagio("buscar", buscar, PAGINACAO_WORKERS),
+                Estagio("normalizar", normalizar, NORMALIZACAO_WORKERS),
+            ],
+            consumidor=gravar,
+            tamanho_fila=PIPELINE_FILA,
+        )
+    finally:
+        destino.fechar()
+        if hashes:
+            hashes.fechar()
+        if espelho:
+            espelho.fechar()
+    falhas = {e.item: e.erro for e in stats.erros if e.estagio == "buscar"}
+    reportar_falhas(falhas)
+    resumir_limitador(limitador)
+    print(f"Requisições à listagem: {politica.resumo()}")
+    print(
+        f"Total coletado: {sum(coletados)} imóveis em {len(coletados)} janelas "
+        f"(página final de {paginacao.quantidade}, {paginacao.ajustes} ajuste(s) de tamanho)."
+    )
+    gravou = resumir_lotes(resultados, hashes) and not stats.erros
+    print(stats.resumo())
+    for nome, ocupado in stats.tempo_ocupado.items():
+        METRICAS.definir("pipeline_ocupado_segundos", ocupado, estagio=nome)
+    METRICAS.definir("imoveis_coletados", sum(coletados))
+
+    # Só avança a marca d'água quando todas as páginas e a gravação deram certo
+    # (janelas não iniciadas por causa do prazo também deixam a listagem incompleta)
+    incompleta = bool(falhas) or politica.interrompida
+    novo = max(marcas) if marcas else None
+    if not falhas:
+        paginacao.salvar()
+    if gravou and not incompleta and novo and (desde is None or novo > desde):
+        salvar_watermark(novo)
+        print(f"Marca d'água atualizada para {novo}.")
+    elif incompleta or not gravou:
+        print("Marca d'água mantida: houve falhas nesta execução.")
+
+    if reconciliar:
+        if stats.erros or politica.interrompida:
+            print("[AVISO] Reconciliação de exclusões ignorada: a listagem pode ter ficado incompleta.")
+            return
+        try:
+            if not reconciliar_exclusoes(vistos, forcar, politica):
+                print("[AVISO] Reconciliação incompleta: confira as tabelas abortadas acima.")
+        except PrazoEsgotado:
+            print("[AVISO] Reconciliação interrompida: prazo da execução esgotado.")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa imóveis da API Vista para o Supabase.")
+    parser.add_argument(
+        "--completo",
+        action="store_true",
+        help="ignora a marca d'água e refaz a sincronização completa do catálogo",
+    )
+    parser.add_argument(
+        "--sem-dedup",
+        action="store_true",
+        help="reenvia todos os imóveis, mesmo os que não mudaram desde o último upsert",
+    )
+    parser.add_argument(
+        "--reconciliar",
+        action="store_true",
+        help="ao final, marca como excluídos (excluido_em) os imóveis que não existem mais no Vista",
+    )
+    parser.add_argument(
+        "--forcar",
+        action="store_true",
+        help="com --reconciliar, exclui mesmo acima do limite RECONCILIAR_MAX_FRACAO",
+    )
+    args = parser.parse_args()
     try:
-        main()
+        main(completo=args.completo, dedup=not args.sem_dedup, reconciliar=args.reconciliar, forcar=args.forcar)
     except Exception as e:
         print(f"[ERRO] {e}")
         raise
@@ -7,35 +7,83 @@ Melhorias e profissionalizações:
 - Tipagem, docstrings e comentários claros.
 - Sessão HTTP com retries e timeout.
 - Validação das variáveis de ambiente.
-- Conversões/normalizações centralizadas (datas e booleanos).
+- Conversões/normalizações centralizadas (`mapeamento_campos.py`).
 - Paginação do Supabase com limites configuráveis.
 - Coluna do código do imóvel configurável via .env (compatível com `codigo` ou `codigoimovel`).
+- Busca em lote pela listagem (prontuários de vários imóveis por requisição), com
+  `/imoveis/detalhes` por imóvel como alternativa.
 
 Requisitos mínimos:
     pip install requests python-dotenv supabase tqdm
 """
 
+import argparse
 import json
+import multiprocessing
 import os
 import time
-from typing import Any, Dict, List, Optional
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import requests
 from dotenv import load_dotenv
-from requests.adapters import HTTPAdapter, Retry
+from requests.adapters import HTTPAdapter
 from supabase import create_client, Client
 
+from cache_http import RespostaNaoGravada, em_cache, instalar_cache
+from checkpoint_prontuarios import FALHOU, CheckpointProntuarios
+from decodificacao_json import LeitorPagina, carregar, resumo_corpo
+from destinos_gravacao import DestinoGravacao, criar_destino
+from fragmentos import Fragmento
+from hashes_linhas import HashesLinhas
+from indice_alteracoes import Estado, IndiceAlteracoes
+from instrumentacao import METRICAS, RetryInstrumentado, instrumentar_sessao, juntar_resumos
+from limitador_taxa import LimitadorAdaptativo, parse_retry_after
+from mapeamento_campos import MAPA_PRONTUARIO, para_data
+from pipeline_estagios import Estagio, executar_pipeline
+from politica_requisicoes import PoliticaRequisicoes, PrazoEsgotado, politica_do_ambiente
+from reconciliacao_exclusoes import Exclusoes
+
 # =========================
 # Parâmetros de controle
 # =========================
 
-SLEEP_ENTRE_REQ = float(os.getenv("SLEEP_ENTRE_REQ", "0.4"))  # segundos entre requisições na API externa
+TAXA_MAX_REQ_S = float(os.getenv("TAXA_MAX_REQ_S", "10"))          # teto de requisições/s na API externa
+TAXA_INICIAL_REQ_S = float(os.getenv("TAXA_INICIAL_REQ_S", "2.5"))  # taxa inicial (sobe enquanto a API responde bem)
+MAX_EM_VOO = int(os.getenv("MAX_EM_VOO", "8"))                      # requisições simultâneas na API externa
 MAX_RETRIES_API = int(os.getenv("MAX_RETRIES_API", "4"))      # tentativas por consulta
 PAGINATION_LIMIT = int(os.getenv("PAGINATION_LIMIT", "1000"))  # lote de imóveis por consulta ao Supabase
+BUFFER_MAX_LINHAS = int(os.getenv("BUFFER_MAX_LINHAS", "500"))        # prontuários por upsert (vários imóveis)
+BUFFER_MAX_BYTES = int(os.getenv("BUFFER_MAX_BYTES", str(1024 * 1024)))  # ~1 MiB de JSON por upsert
+BUFFER_MAX_SEGUNDOS = float(os.getenv("BUFFER_MAX_SEGUNDOS", "10"))   # tempo máximo de um registro no buffer
+NORMALIZACAO_WORKERS = int(os.getenv("NORMALIZACAO_WORKERS", "1"))  # threads de normalização no pipeline
+PIPELINE_FILA = int(os.getenv("PIPELINE_FILA", "256"))              # imóveis em espera entre estágios
 
 # Nome da coluna que contém o código do imóvel na tabela `imoveis` (padrão: "codigo")
 IMOVEIS_CODIGO_COL = os.getenv("IMOVEIS_CODIGO_COL", "codigo")
 
+# Índice local de alterações (só consulta detalhes de imóveis que mudaram)
+ARQUIVO_INDICE = os.getenv("ARQUIVO_INDICE", ".vista_indice_prontuarios.sqlite")
+LISTAGEM_QTD = 50  # imóveis por página na listagem de estados
+
+# Busca de prontuários: "lote" (listagem com `prontuarios` aninhado) ou "detalhes" (uma chamada por imóvel)
+MODO_BUSCA = os.getenv("MODO_BUSCA", "lote")
+LOTE_LISTAR = int(os.getenv("LOTE_LISTAR", "50"))  # imóveis por requisição no modo lote (a API limita a 50)
+
+# Checkpoint para retomar execuções interrompidas (--resume / --reprocessar-falhas)
+ARQUIVO_CHECKPOINT = os.getenv("ARQUIVO_CHECKPOINT", ".vista_checkpoint_prontuarios.sqlite")
+
+# Hashes das linhas já gravadas: só reenvia prontuários novos ou alterados
+ARQUIVO_HASHES = os.getenv("ARQUIVO_HASHES", ".vista_hashes.sqlite")
+
+# Imóveis excluídos do Vista pela reconciliação (`ImportVistaSupabase.py --reconciliar`): não são consultados.
+# Com `COLUNA_EXCLUIDO` definida (a coluna precisa existir em `imoveis`), ela é a fonte da verdade e o filtro
+# roda no banco; vazia (padrão), só o arquivo local é usado
+COLUNA_EXCLUIDO = os.getenv("COLUNA_EXCLUIDO", "")
+ARQUIVO_EXCLUSOES = os.getenv("ARQUIVO_EXCLUSOES", ".vista_exclusoes.sqlite")
+
 # =========================
 # Ambiente (.env)
 # =========================
@@ -44,11 +92,27 @@ load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-API_IMOVEIS_KEY = os.getenv("API_IMOVEIS_KEY")
+# Várias chaves da API (separadas por vírgula) para execuções fragmentadas: uma por fragmento, em rodízio
+API_IMOVEIS_KEYS = [c.strip() for c in os.getenv("API_IMOVEIS_KEYS", "").split(",") if c.strip()]
+API_IMOVEIS_KEY = os.getenv("API_IMOVEIS_KEY") or next(iter(API_IMOVEIS_KEYS), None)
 API_IMOVEIS_URL = os.getenv("API_IMOVEIS_URL") #endpoint correto é /imoveis/detalhes  
+API_LISTAR_URL = os.getenv("API_LISTAR_URL") or (API_IMOVEIS_URL or "").replace(
+    "/imoveis/detalhes", "/imoveis/listar"
+)
 
 HEADERS = {"Accept": "application/json"}
 
+CAMPOS_PRONTUARIO = [
+    "Data", "Hora", "Assunto", "Texto", "Pendente", "Bairro", "Anunciado", "Retranca",
+    "Corretor", "PROPOSTA", "Status", "Datainicio", "VeiculoPublicado", "ValorProposta",
+    "BairroAnuncio", "StatusBatecao", "ValorBatido", "Privado", "Cliente", "Tipoanuncio",
+    "Titulado", "Statusdoimóvel", "CodigoCorretor",
+]
+CHAVES_PRONTUARIO = ["codigo_imovel", "codigo_prontuario"]
+
+# Fragmento importado por este processo (ver `aplicar_fragmento`); None = todos os imóveis
+FRAGMENTO: Optional[Fragmento] = None
+
 
 def validar_ambiente() -> None:
     """Garante a presença das variáveis obrigatórias do ambiente."""
@@ -65,45 +129,53 @@ def validar_ambiente() -> None:
         raise EnvironmentError(f"Variáveis ausentes no .env: {', '.join(faltando)}")
 
 
-def sessao_http() -> requests.Session:
-    """Cria uma sessão HTTP com retries exponenciais e pool de conexões."""
+def sessao_http(retry_429: bool = True, pool: int = 20) -> requests.Session:
+    """
+    Cria uma sessão HTTP com retries exponenciais e pool de conexões.
+
+    Com `retry_429=False` o 429 não é repetido pelo adapter e chega ao chamador,
+    para que o limitador de taxa possa reagir a ele. Com `CACHE_HTTP` configurado, as
+    respostas passam pelo cache em disco (`cache_http.py`).
+    """
     session = requests.Session()
-    retries = Retry(
+    status_retry = (429, 500, 502, 503, 504) if retry_429 else (500, 502, 503, 504)
+    retries = RetryInstrumentado(
         total=5,
         backoff_factor=0.8,
-        status_forcelist=(429, 500, 502, 503, 504),
+        status_forcelist=status_retry,
         allowed_methods=("GET",),
         raise_on_status=False,
+        # Com Retry-After o urllib3 repete o 429 mesmo fora da lista; o limitador cuida disso
+        respect_retry_after_header=retry_429,
     )
-    adapter = HTTPAdapter(max_retries=retries, pool_connections=20, pool_maxsize=20)
+    adapter = HTTPAdapter(max_retries=retries, pool_connections=pool, pool_maxsize=pool)
     session.mount("https://", adapter)
     session.mount("http://", adapter)
-    return session
-
+    return instalar_cache(instrumentar_sessao(session))
 
-def trata_boolean(valor: Any) -> Optional[bool]:
-    """Converte valores comuns (sim/não/true/false) para booleano ou None."""
-    if valor is None:
-        return None
-    s = str(valor).strip().lower()
-    if s in {"sim", "true", "1"}:
-        return True
-    if s in {"nao", "não", "false", "0"}:
-        return False
-    return None
 
+def aplicar_fragmento(fragmento: Fragmento) -> None:
+    """
+    Restringe este processo ao `fragmento` (ver `fragmentos.py`).
 
-def trata_data(valor: Any) -> Optional[str]:
-    """Normaliza datas inválidas para None (mantém strings válidas)."""
-    if not valor or not isinstance(valor, str):
-        return None
-    v = valor.strip()
-    if v in ("", "0000-00-00", "0000-00-00 00:00:00"):
-        return None
-    # Datas totalmente zeradas (edge cases)
-    if v.replace("0", "").replace("-", "").replace(":", "").replace(" ", "") == "":
-        return None
-    return valor
+    Checkpoint, índice, hashes e arquivos de métricas passam a ser os do fragmento, para que
+    execuções paralelas não disputem nem reiniciem o estado umas das outras. A chave da API é a
+    do fragmento em `API_IMOVEIS_KEYS` e as taxas do limitador são divididas entre os
+    fragmentos que compartilham a mesma chave.
+    """
+    global FRAGMENTO, API_IMOVEIS_KEY, TAXA_MAX_REQ_S, TAXA_INICIAL_REQ_S
+    global ARQUIVO_CHECKPOINT, ARQUIVO_INDICE, ARQUIVO_HASHES
+    chaves = API_IMOVEIS_KEYS or [API_IMOVEIS_KEY]
+    FRAGMENTO = fragmento
+    API_IMOVEIS_KEY = fragmento.chave(chaves)
+    TAXA_MAX_REQ_S /= fragmento.compartilhando(chaves)
+    TAXA_INICIAL_REQ_S /= fragmento.compartilhando(chaves)
+    ARQUIVO_CHECKPOINT = fragmento.arquivo(ARQUIVO_CHECKPOINT)
+    ARQUIVO_INDICE = fragmento.arquivo(ARQUIVO_INDICE)
+    ARQUIVO_HASHES = fragmento.arquivo(ARQUIVO_HASHES)
+    for variavel in ("METRICAS_PROM_ARQUIVO", "METRICAS_JSON_ARQUIVO"):
+        if os.getenv(variavel):
+            os.environ[variavel] = fragmento.arquivo(os.environ[variavel])
 
 
 def conectar_supabase() -> Client:
@@ -111,53 +183,120 @@ def conectar_supabase() -> Client:
     return create_client(SUPABASE_URL, SUPABASE_KEY)
 
 
-def get_codigos_imoveis(supabase: Client) -> List[str]:
+def iterar_codigos_imoveis(supabase: Client, limite: int = PAGINATION_LIMIT) -> Iterator[str]:
     """
-    Busca todos os códigos de imóveis na tabela `imoveis`, paginando conforme `PAGINATION_LIMIT`.
+    Gera os códigos da tabela `imoveis` em ordem, com paginação por chave (keyset).
+
+    Cada página é `ORDER BY <col> ... WHERE <col> > último_código LIMIT limite`: o custo não cresce
+    com o deslocamento e, como a ordem é estável, linhas inseridas/removidas durante a leitura não
+    fazem códigos serem pulados ou repetidos. A próxima página é buscada em segundo plano enquanto
+    a atual é consumida, então a consulta de prontuários começa já no primeiro lote.
 
     A coluna utilizada é configurável via .env (`IMOVEIS_CODIGO_COL`), por padrão "codigo".
+    Com `COLUNA_EXCLUIDO` configurada, imóveis com a coluna preenchida (excluídos do Vista) ficam
+    de fora já na consulta.
     """
-    print("Buscando todos os códigos de imóveis no Supabase com paginação...")
-    todos_codigos: List[str] = []
-    pagina = 0
-    limit = PAGINATION_LIMIT
-
-    while True:
-        # Range é inclusivo no Supabase: (from, to)
-        inicio = pagina * limit
-        fim = (pagina + 1) * limit - 1
 
-        sel = f"{IMOVEIS_CODIGO_COL}"
-        response = supabase.table("imoveis").select(sel).range(inicio, fim).execute()
-        data = response.model_dump().get("data", [])
+    def pagina_apos(cursor: Optional[str]) -> List[Dict[str, Any]]:
+        consulta = (
+            supabase.table("imoveis")
+            .select(IMOVEIS_CODIGO_COL)
+            .order(IMOVEIS_CODIGO_COL)
+            .limit(limite)
+        )
+        if COLUNA_EXCLUIDO:
+            consulta = consulta.is_(COLUNA_EXCLUIDO, "null")
+        if cursor is not None:
+            consulta = consulta.gt(IMOVEIS_CODIGO_COL, cursor)
+        with METRICAS.cronometrar("supabase_select", tabela="imoveis"):
+            return consulta.execute().model_dump().get("data", [])
+
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        futuro: Optional[Future] = prefetch.submit(pagina_apos, None)
+        while futuro is not None:
+            data = futuro.result()
+            futuro = None
+            if len(data) == limite:  # pode haver próxima página: já dispara a busca
+                futuro = prefetch.submit(pagina_apos, data[-1].get(IMOVEIS_CODIGO_COL))
+            for row in data:
+                codigo = row.get(IMOVEIS_CODIGO_COL)
+                if codigo:
+                    yield codigo
+
+
+def filtrar_ativos(supabase: Client, codigos: Iterable[str], lote: int = 500) -> List[str]:
+    """
+    Só os `codigos` que continuam em `imoveis` sem `COLUNA_EXCLUIDO` (consulta `in.(...)` em lotes).
 
-        codigos = [row.get(IMOVEIS_CODIGO_COL) for row in data if row.get(IMOVEIS_CODIGO_COL)]
-        todos_codigos.extend(codigos)
+    Para listas que não vêm de `iterar_codigos_imoveis`, como as falhas do checkpoint.
+    """
+    codigos = list(codigos)
+    if not COLUNA_EXCLUIDO:
+        return codigos
+    ativos: Set[str] = set()
+    for i in range(0, len(codigos), lote):
+        consulta = (
+            supabase.table("imoveis")
+            .select(IMOVEIS_CODIGO_COL)
+            .in_(IMOVEIS_CODIGO_COL, codigos[i : i + lote])
+            .is_(COLUNA_EXCLUIDO, "null")
+        )
+        with METRICAS.cronometrar("supabase_select", tabela="imoveis"):
+            data = consulta.execute().model_dump().get("data", [])
+        ativos.update(str(row.get(IMOVEIS_CODIGO_COL)) for row in data)
+    return [codigo for codigo in codigos if codigo in ativos]
 
-        print(f"Página {pagina + 1} - códigos coletados: {len(codigos)}")
-        if len(data) < limit:  # fim da paginação
-            break
-        pagina += 1
 
+def get_codigos_imoveis(supabase: Client) -> List[str]:
+    """Lista todos os códigos de `imoveis` (ver `iterar_codigos_imoveis`)."""
+    print("Buscando todos os códigos de imóveis no Supabase com paginação por chave...")
+    todos_codigos = list(iterar_codigos_imoveis(supabase))
     print(f"Total de códigos encontrados: {len(todos_codigos)}")
     return todos_codigos
 
 
-def busca_prontuarios_do_imovel(session: requests.Session, codigo_imovel: str) -> Optional[Dict[str, Any]]:
-    """Consulta a API de detalhes com o campo `prontuarios` para um imóvel específico."""
-    pesquisa = {
-        "fields": [
-            "Codigo",
-            {
-                "prontuarios": [
-                    "Data", "Hora", "Assunto", "Texto", "Pendente", "Bairro", "Anunciado", "Retranca",
-                    "Corretor", "PROPOSTA", "Status", "Datainicio", "VeiculoPublicado", "ValorProposta",
-                    "BairroAnuncio", "StatusBatecao", "ValorBatido", "Privado", "Cliente", "Tipoanuncio",
-                    "Titulado", "Statusdoimóvel", "CodigoCorretor",
-                ]
-            },
-        ]
-    }
+def consultar_api(
+    session: requests.Session,
+    url: str,
+    params: Dict[str, Any],
+    endpoint: str,
+    limitador: Optional[LimitadorAdaptativo] = None,
+    politica: Optional[PoliticaRequisicoes] = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    GET na API Vista dentro de uma vaga do `limitador`.
+
+    Com `politica`, o timeout respeita o prazo da execução e uma requisição mais lenta que o
+    p95 do `endpoint` ganha uma cópia, também dentro do limitador; a política reserva as vagas,
+    para que cada uma só volte quando a sua requisição terminar (ver `politica_requisicoes.py`).
+    """
+    if em_cache(session, url, params):
+        # Respostas do cache não vão à API: não consomem fichas nem entram na latência do endpoint
+        return session.get(url, headers=HEADERS, params=params, timeout=25, **kwargs)
+    if politica:
+        return politica.get(session, url, endpoint, limitador, headers=HEADERS, params=params, timeout=25, **kwargs)
+    with limitador.slot() if limitador else nullcontext():
+        return session.get(url, headers=HEADERS, params=params, timeout=25, **kwargs)
+
+
+def busca_prontuarios_do_imovel(
+    session: requests.Session,
+    codigo_imovel: str,
+    limitador: Optional[LimitadorAdaptativo] = None,
+    politica: Optional[PoliticaRequisicoes] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Consulta a API de detalhes com o campo `prontuarios` para um imóvel específico.
+
+    Com `limitador`, cada tentativa aguarda uma ficha do token bucket e informa ao limitador
+    se a resposta foi saudável ou limitada (429 / "too many connections"). Com `politica`,
+    tentativas lentas ganham uma cópia e o prazo da execução é respeitado (`PrazoEsgotado`).
+
+    Retorna `{"prontuarios": {}}` para imóveis sem prontuários e None somente quando a
+    consulta falhou após `MAX_RETRIES_API` tentativas.
+    """
+    pesquisa = {"fields": ["Codigo", {"prontuarios": CAMPOS_PRONTUARIO}]}
     params = {
         "key": API_IMOVEIS_KEY,
         "pesquisa": json.dumps(pesquisa, ensure_ascii=False),
@@ -167,124 +306,702 @@ def busca_prontuarios_do_imovel(session: requests.Session, codigo_imovel: str) -
     tentativas = 0
     while tentativas < MAX_RETRIES_API:
         try:
-            resp = session.get(API_IMOVEIS_URL, headers=HEADERS, params=params, timeout=25)
+            resp = consultar_api(session, API_IMOVEIS_URL, params, "detalhes", limitador, politica)
 
             # 400 específico: imóveis sem prontuários
             if resp.status_code == 400 and "prontuarios" in (resp.text or "").lower():
+                if limitador:
+                    limitador.registrar_sucesso()
                 print(f"Imóvel {codigo_imovel} sem prontuários (API 400). Pulando.")
-                return None
+                return {"Codigo": codigo_imovel, "prontuarios": {}}
 
-            # Rate limit
-            if resp.status_code == 429 or "too many connections" in (resp.text or "").lower():
-                espera = 5 * (tentativas + 1)
-                print(f"Rate limit para {codigo_imovel}. Aguardando {espera}s e tentando novamente...")
-                time.sleep(espera)
+            # Rate limit: o limitador pausa/reduz a taxa para todas as threads.
+            # Só o começo do corpo é examinado: prontuários longos não são copiados/convertidos.
+            if resp.status_code == 429 or "too many connections" in resumo_corpo(resp.content).lower():
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
                 tentativas += 1
+                METRICAS.registrar_retry(resp.status_code, origem="detalhes")
+                if limitador:
+                    limitador.registrar_limite(retry_after)
+                    print(f"Rate limit para {codigo_imovel}. Taxa reduzida para {limitador.taxa:.2f} req/s.")
+                else:
+                    espera = retry_after if retry_after is not None else 5 * tentativas
+                    print(f"Rate limit para {codigo_imovel}. Aguardando {espera}s e tentando novamente...")
+                    time.sleep(espera)
+                    METRICAS.registrar_espera(espera, motivo="rate_limit")
                 continue
 
             if not resp.ok:
                 print(f"HTTP {resp.status_code} ao consultar {codigo_imovel}: {resp.text[:200]}")
                 tentativas += 1
+                METRICAS.registrar_retry(resp.status_code, origem="detalhes")
                 time.sleep(1 + 2 * tentativas)
+                METRICAS.registrar_espera(1 + 2 * tentativas, motivo="backoff")
                 continue
 
-            return resp.json()
+            if limitador:
+                limitador.registrar_sucesso()
+            return carregar(resp.content)
 
+        except (RespostaNaoGravada, PrazoEsgotado):
+            raise  # modo reproduzir ou prazo esgotado: repetir não adianta
         except Exception as e:
             print(f"Erro ao consultar {codigo_imovel}: {e}. Tentando novamente...")
             tentativas += 1
+            METRICAS.registrar_retry(type(e).__name__, origem="detalhes")
             time.sleep(1 + 2 * tentativas)
+            METRICAS.registrar_espera(1 + 2 * tentativas, motivo="backoff")
 
+    METRICAS.contar("falhas_consulta_total", endpoint="detalhes")
     print(f"Falha ao consultar {codigo_imovel} após {MAX_RETRIES_API} tentativas.")
     return None
 
 
-def inserir_prontuarios_supabase(supabase: Client, prontuarios: Dict[str, Any], codigo_imovel: str) -> None:
-    """Insere/atualiza prontuários no Supabase (tabela `imovel_prontuario`)."""
+def consultar_listagem(
+    session: requests.Session,
+    pesquisa: Dict[str, Any],
+    limitador: Optional[LimitadorAdaptativo] = None,
+    max_tentativas: Optional[int] = None,
+    politica: Optional[PoliticaRequisicoes] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Consulta uma página de `/imoveis/listar` respeitando o limitador.
+
+    Retorna os itens (com `Codigo` preenchido) e os metadados de paginação, lidos sem montar o
+    dict da resposta inteira (ver `decodificacao_json.py`).
+    Em 429/"too many connections" a consulta é repetida (indefinidamente com `max_tentativas=None`).
+    Erros HTTP e respostas de erro da API levantam exceção.
+    """
+    params = {
+        "key": API_IMOVEIS_KEY,
+        "showtotal": 1,
+        "showInternal": 1,
+        "pesquisa": json.dumps(pesquisa, ensure_ascii=False),
+    }
+    tentativas = 0
+    while True:
+        resp = consultar_api(session, API_LISTAR_URL, params, "listar", limitador, politica, stream=True)
+        with resp:
+            leitor = LeitorPagina.da_resposta(resp)
+            limite = resp.status_code == 429 or "too many connections" in leitor.inicio.lower()
+            if not limite:
+                resp.raise_for_status()
+                itens: List[Dict[str, Any]] = []
+                for key, item in leitor:
+                    item.setdefault("Codigo", key)
+                    itens.append(item)
+        if limite:
+            tentativas += 1
+            METRICAS.registrar_retry(resp.status_code, origem="listar")
+            if max_tentativas is not None and tentativas >= max_tentativas:
+                raise RuntimeError(f"Rate limit persistente na listagem após {tentativas} tentativas")
+            if limitador:
+                limitador.registrar_limite(parse_retry_after(resp.headers.get("Retry-After")))
+            else:
+                time.sleep(5)
+                METRICAS.registrar_espera(5, motivo="rate_limit")
+            continue
+        if limitador:
+            limitador.registrar_sucesso()
+
+        meta = leitor.metadados
+        if "status" in meta and "message" in meta:
+            raise RuntimeError(f"Erro API (listagem): {meta.get('message')}")
+        return itens, meta
+
+
+def iterar_listagem(
+    session: requests.Session,
+    campos: List[Any],
+    filtro: Optional[Dict[str, Any]] = None,
+    limitador: Optional[LimitadorAdaptativo] = None,
+    quantidade: int = LISTAGEM_QTD,
+    max_tentativas: Optional[int] = None,
+    politica: Optional[PoliticaRequisicoes] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Percorre todas as páginas da listagem (com `filtro` opcional) gerando os itens."""
+    pagina, total_paginas = 1, 1
+    while pagina <= total_paginas:
+        pesquisa: Dict[str, Any] = {
+            "fields": campos,
+            "order": {"Codigo": "asc"},  # páginas por posição: a ordem precisa ser estável
+            "paginacao": {"pagina": pagina, "quantidade": quantidade},
+        }
+        if filtro:
+            pesquisa["filter"] = filtro
+        itens, meta = consultar_listagem(session, pesquisa, limitador, max_tentativas, politica)
+        yield from itens
+        total_paginas = int(meta.get("paginas", 1))
+        pagina += 1
+
+
+def estado_do_item(item: Dict[str, Any]) -> Estado:
+    return (para_data(item.get("DataHoraAtualizacao")), item.get("PendenteProntuario"))
+
+
+def listar_estados_vista(
+    session: requests.Session,
+    limitador: Optional[LimitadorAdaptativo] = None,
+    politica: Optional[PoliticaRequisicoes] = None,
+) -> Dict[str, Estado]:
+    """
+    Percorre a listagem da API trazendo só `Codigo`, `DataHoraAtualizacao` e `PendenteProntuario`.
+
+    São poucas centenas de páginas mesmo em contas grandes, contra uma chamada de detalhes por imóvel.
+    """
+    estados: Dict[str, Estado] = {}
+    campos = ["Codigo", "DataHoraAtualizacao", "PendenteProntuario"]
+    for item in iterar_listagem(session, campos, limitador=limitador, politica=politica):
+        estados[str(item["Codigo"])] = estado_do_item(item)
+
+    print(f"Estados de {len(estados)} imóveis lidos da listagem.")
+    return estados
+
+
+def buscar_prontuarios_em_lote(
+    session: requests.Session,
+    codigos: List[str],
+    limitador: Optional[LimitadorAdaptativo] = None,
+    politica: Optional[PoliticaRequisicoes] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Busca os prontuários de vários imóveis de uma vez pela listagem (`filter` por `Codigo`).
+
+    Retorna `{codigo: {"Codigo": ..., "prontuarios": {...}}}` no mesmo formato de
+    `busca_prontuarios_do_imovel`. Imóveis que a listagem não devolveu (ou devolveu sem o campo
+    `prontuarios`) ficam de fora e devem ser consultados em `/imoveis/detalhes`; se a consulta
+    em lote falhar, o resultado é vazio.
+    """
+    campos = ["Codigo", {"prontuarios": CAMPOS_PRONTUARIO}]
+    encontrados: Dict[str, Dict[str, Any]] = {}
+    try:
+        for item in iterar_listagem(
+            session, campos, {"Codigo": list(codigos)}, limitador, LOTE_LISTAR, MAX_RETRIES_API, politica
+        ):
+            if "prontuarios" in item:
+                encontrados[str(item["Codigo"])] = item
+    except PrazoEsgotado:
+        raise
+    except Exception as e:
+        METRICAS.contar("falhas_consulta_total", endpoint="listar")
+        print(f"Falha na busca em lote de {len(codigos)} imóveis ({e}). Usando /imoveis/detalhes.")
+        return {}
+    return encontrados
+
+
+def iterar_prontuarios_alterados_desde(
+    session: requests.Session,
+    desde: datetime,
+    estados: Dict[str, Estado],
+    limitador: Optional[LimitadorAdaptativo] = None,
+    politica: Optional[PoliticaRequisicoes] = None,
+) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Gera `(codigo, dados)` dos imóveis com `DataHoraAtualizacao` a partir de `desde`, em lote.
+
+    Os estados lidos vão para `estados` (para o índice de alterações). `dados` é None quando a
+    listagem não trouxe o campo `prontuarios`, para que o imóvel seja consultado em detalhes.
+    """
+    fim = datetime.now() + timedelta(days=1)
+    filtro = {"DataHoraAtualizacao": [desde.strftime("%Y-%m-%d %H:%M:%S"), fim.strftime("%Y-%m-%d %H:%M:%S")]}
+    campos = ["Codigo", "DataHoraAtualizacao", "PendenteProntuario", {"prontuarios": CAMPOS_PRONTUARIO}]
+    for item in iterar_listagem(session, campos, filtro, limitador, LOTE_LISTAR, MAX_RETRIES_API, politica):
+        codigo = str(item["Codigo"])
+        estados[codigo] = estado_do_item(item)
+        yield codigo, (item if "prontuarios" in item else None)
+
+
+def agrupar(codigos: Iterable[str], tamanho: int) -> Iterator[List[str]]:
+    """Agrupa o fluxo de códigos em listas de até `tamanho`."""
+    grupo: List[str] = []
+    for codigo in codigos:
+        grupo.append(codigo)
+        if len(grupo) >= tamanho:
+            yield grupo
+            grupo = []
+    if grupo:
+        yield grupo
+
+
+def normalizar_prontuarios(prontuarios: Dict[str, Any], codigo_imovel: str) -> List[Dict[str, Any]]:
+    """Mapeia os prontuários da API para linhas da tabela `imovel_prontuario` (ver `MAPA_PRONTUARIO`)."""
+    # Código do prontuário pode estar na chave ou no campo "Codigo" do objeto
+    itens = [
+        p if isinstance(p, dict) and "Codigo" in p else {**(p if isinstance(p, dict) else {}), "Codigo": cod}
+        for cod, p in prontuarios.items()
+    ]
+    return MAPA_PRONTUARIO.linhas(itens, {"codigo_imovel": codigo_imovel})
+
+
+def inserir_prontuarios_supabase(
+    supabase: Client,
+    prontuarios: Dict[str, Any],
+    codigo_imovel: str,
+    hashes: Optional[HashesLinhas] = None,
+) -> None:
+    """
+    Insere/atualiza prontuários no Supabase (tabela `imovel_prontuario`).
+
+    Com `hashes`, só os prontuários novos ou alterados desde o último upsert são enviados.
+    """
     if not prontuarios:
         print(f"Nenhum prontuário para inserir ({codigo_imovel}).")
         return
 
-    registros: List[Dict[str, Any]] = []
-    for cod, p in prontuarios.items():
-        # Código do prontuário pode estar na chave ou no campo "Codigo" do objeto
-        codigo_prontuario_raw = p.get("Codigo", cod) if isinstance(p, dict) else cod
-
-        # Valores monetários: converte strings para float quando possível
-        def to_float(v: Any) -> Optional[float]:
-            if v in (None, ""):
-                return None
-            try:
-                return float(v)
-            except Exception:
-                return None
-
-        item = {
-            "codigo_imovel": codigo_imovel,
-            "codigo_prontuario": int(codigo_prontuario_raw) if str(codigo_prontuario_raw).isdigit() else None,
-            "data": trata_data(p.get("Data")) if isinstance(p, dict) else None,
-            "hora": p.get("Hora") if isinstance(p, dict) else None,
-            "assunto": p.get("Assunto") if isinstance(p, dict) else None,
-            "texto": p.get("Texto") if isinstance(p, dict) else None,
-            "pendente": trata_boolean(p.get("Pendente")) if isinstance(p, dict) else None,
-            "bairro": p.get("Bairro") if isinstance(p, dict) else None,
-            "anunciado": trata_boolean(p.get("Anunciado")) if isinstance(p, dict) else None,
-            "retranca": p.get("Retranca") if isinstance(p, dict) else None,
-            "corretor": p.get("Corretor") if isinstance(p, dict) else None,
-            "proposta": trata_boolean(p.get("PROPOSTA")) if isinstance(p, dict) else None,
-            "status": p.get("Status") if isinstance(p, dict) else None,
-            "datainicio": trata_data(p.get("Datainicio")) if isinstance(p, dict) else None,
-            "veiculopublicado": p.get("VeiculoPublicado") if isinstance(p, dict) else None,
-            "valorproposta": to_float(p.get("ValorProposta")) if isinstance(p, dict) else None,
-            "bairroanuncio": p.get("BairroAnuncio") if isinstance(p, dict) else None,
-            "statusbatecao": p.get("StatusBatecao") if isinstance(p, dict) else None,
-            "valorbatido": to_float(p.get("ValorBatido")) if isinstance(p, dict) else None,
-            "privado": trata_boolean(p.get("Privado")) if isinstance(p, dict) else None,
-            "cliente": p.get("Cliente") if isinstance(p, dict) else None,
-            "tipoanuncio": p.get("Tipoanuncio") if isinstance(p, dict) else None,
-            "titulado": p.get("Titulado") if isinstance(p, dict) else None,
-            "statusdoimovel": p.get("Statusdoimóvel") if isinstance(p, dict) else None,
-            "codigocorretor": p.get("CodigoCorretor") if isinstance(p, dict) else None,
-        }
-        registros.append(item)
-
+    registros = normalizar_prontuarios(prontuarios, codigo_imovel)
+    if hashes:
+        registros = list(hashes.alterados(registros))
+        if not registros:
+            print(f"Prontuários inalterados ({codigo_imovel}).")
+            return
     try:
         print(f"Upsert de {len(registros)} prontuários (imóvel {codigo_imovel})...")
         res = supabase.table("imovel_prontuario").upsert(registros).execute()
         payload = res.model_dump()
         if payload.get("data") is not None:
             print(f"{len(payload['data'])} prontuários inseridos/atualizados ({codigo_imovel}).")
+            if hashes:
+                hashes.confirmar(registros)
         else:
             print("Resposta inesperada do Supabase:", payload)
     except Exception as e:
         print(f"Erro ao inserir prontuários ({codigo_imovel}): {e}")
 
 
-def processa_todos_os_imoveis() -> None:
-    """Fluxo principal: lê códigos de `imoveis`, consulta API e grava prontuários."""
+class BufferProntuarios:
+    """
+    Acumula prontuários normalizados de vários imóveis e grava em um único upsert no `destino`
+    (Supabase ou Postgres direto, ver `destinos_gravacao.py`).
+
+    O buffer é descarregado ao atingir `max_linhas` ou `max_bytes`, quando o registro mais
+    antigo passa de `max_segundos` e no `fechar()`. Os imóveis de cada descarga que falhar
+    ficam em `imoveis_falhos`, para que só eles sejam reprocessados.
+
+    `ao_descarregar(imoveis, erro)` é chamado após cada descarga (`erro` é None em caso de sucesso).
+    Com `hashes`, os hashes das linhas são confirmados a cada descarga bem-sucedida.
+    """
+
+    def __init__(
+        self,
+        destino: DestinoGravacao,
+        max_linhas: int = BUFFER_MAX_LINHAS,
+        max_bytes: int = BUFFER_MAX_BYTES,
+        max_segundos: float = BUFFER_MAX_SEGUNDOS,
+        ao_descarregar: Optional[Callable[[Set[str], Optional[str]], None]] = None,
+        hashes: Optional[HashesLinhas] = None,
+    ) -> None:
+        self.destino = destino
+        self.ao_descarregar = ao_descarregar
+        self.hashes = hashes
+        self.max_linhas = max_linhas
+        self.max_bytes = max_bytes
+        self.max_segundos = max_segundos
+        self.imoveis_falhos: Set[str] = set()
+        self.linhas_gravadas = 0
+        self.descargas = 0
+        self._registros: List[Dict[str, Any]] = []
+        self._imoveis: Set[str] = set()
+        self._bytes = 0
+        self._desde: Optional[float] = None
+
+    def adicionar(self, codigo_imovel: str, registros: List[Dict[str, Any]]) -> None:
+        """Adiciona as linhas de um imóvel; descarrega se algum limite foi atingido."""
+        if not registros:
+            return
+        if self._desde is None:
+            self._desde = time.monotonic()
+        self._registros.extend(registros)
+        self._imoveis.add(codigo_imovel)
+        self._bytes += sum(len(json.dumps(r, ensure_ascii=False, default=str)) for r in registros)
+        if len(self._registros) >= self.max_linhas or self._bytes >= self.max_bytes:
+            self.descarregar()
+        else:
+            self.descarregar_se_expirado()
+
+    def descarregar_se_expirado(self) -> None:
+        """Descarrega se o registro mais antigo já esperou `max_segundos`."""
+        if self._desde is not None and time.monotonic() - self._desde >= self.max_segundos:
+            self.descarregar()
+
+    def descarregar(self) -> bool:
+        """Envia o conteúdo do buffer em um upsert. Retorna True em caso de sucesso."""
+        if not self._registros:
+            return True
+        registros, imoveis = self._registros, self._imoveis
+        self._registros, self._imoveis, self._bytes, self._desde = [], set(), 0, None
+        self.descargas += 1
+
+        try:
+            with METRICAS.cronometrar(self.destino.estagio, tabela="imovel_prontuario"):
+                gravadas = self.destino.gravar("imovel_prontuario", registros, CHAVES_PRONTUARIO)
+        except Exception as e:
+            erro = str(e)[:500]
+        else:
+            self.linhas_gravadas += gravadas
+            METRICAS.contar("linhas_gravadas_total", gravadas, tabela="imovel_prontuario")
+            print(f"Upsert de {len(registros)} prontuários de {len(imoveis)} imóveis concluído.")
+            if self.hashes:
+                self.hashes.confirmar(registros)
+            if self.ao_descarregar:
+                self.ao_descarregar(imoveis, None)
+            return True
+
+        self.imoveis_falhos.update(imoveis)
+        print(f"[ERRO] Falha ao gravar {len(registros)} prontuários ({len(imoveis)} imóveis): {erro}")
+        if self.ao_descarregar:
+            self.ao_descarregar(imoveis, erro)
+        return False
+
+    def fechar(self) -> Set[str]:
+        """Descarrega o que restar e retorna os imóveis de descargas que falharam."""
+        self.descarregar()
+        return self.imoveis_falhos
+
+
+def processa_todos_os_imoveis(
+    todos: bool = False,
+    retomar: bool = False,
+    somente_falhas: bool = False,
+    modo: str = MODO_BUSCA,
+    desde: Optional[datetime] = None,
+    dedup: bool = True,
+) -> None:
+    """
+    Fluxo principal: lê códigos de `imoveis`, consulta API e grava prontuários.
+
+    No modo "lote" os prontuários de até `LOTE_LISTAR` imóveis vêm em uma única requisição à
+    listagem; só os imóveis que ela não devolver são consultados em `/imoveis/detalhes`. No modo
+    "detalhes" é feita uma chamada por imóvel. Com `desde`, a listagem é filtrada por
+    `DataHoraAtualizacao` e substitui a leitura dos códigos no Supabase e o índice de alterações.
+
+    As consultas rodam em paralelo (até `MAX_EM_VOO`) sob um limitador de taxa adaptativo,
+    que substitui o antigo `sleep` fixo entre requisições. Busca, normalização e gravação são
+    estágios de um pipeline com filas limitadas, então API e banco trabalham ao mesmo tempo.
+
+    Por padrão, consulta apenas imóveis cujo `DataHoraAtualizacao`/`PendenteProntuario` mudou
+    desde a última execução (índice em `ARQUIVO_INDICE`). Com `todos=True` consulta todos.
+
+    Com `dedup=True`, só prontuários cujo conteúdo normalizado mudou desde o último upsert são
+    enviados (hashes em `ARQUIVO_HASHES`).
+
+    O progresso de cada imóvel vai para o checkpoint (`ARQUIVO_CHECKPOINT`): `retomar=True`
+    pula os imóveis já gravados na execução anterior e `somente_falhas=True` reprocessa apenas
+    os que falharam.
+    """
     validar_ambiente()
+    METRICAS.iniciar("importa_prontuarios", **({"fragmento": str(FRAGMENTO)} if FRAGMENTO else {}))
+    try:
+        importar_prontuarios(todos, retomar, somente_falhas, modo, desde, dedup)
+    finally:
+        METRICAS.exportar()
+
+
+def executar_fragmento(fragmento: Fragmento, opcoes: Dict[str, Any]) -> Dict[str, Any]:
+    """Importa um fragmento (em um processo do pool) e devolve o resumo das métricas da execução."""
+    aplicar_fragmento(fragmento)
+    processa_todos_os_imoveis(**opcoes)
+    return METRICAS.resumo()
+
+
+def processa_em_fragmentos(total: int, processos: Optional[int] = None, **opcoes: Any) -> Dict[str, Any]:
+    """
+    Importa os `total` fragmentos em um pool local de processos (até `processos` simultâneos)
+    e junta os resumos (`juntar_resumos`), gravado em `METRICAS_JSON_ARQUIVO` se configurado.
+
+    Cada processo tem o próprio limitador e a própria chave da API (ver `aplicar_fragmento`);
+    `opcoes` são as de `processa_todos_os_imoveis`. Fragmentos com falha são listados ao final
+    e podem ser refeitos isoladamente com `--shard i/N`.
+    """
+    validar_ambiente()
+    resumos: List[Dict[str, Any]] = []
+    falhas: Dict[str, str] = {}
+    contexto = multiprocessing.get_context("spawn")  # processos limpos, sem threads herdadas
+    with ProcessPoolExecutor(max_workers=processos or total, mp_context=contexto) as pool:
+        futuros = {pool.submit(executar_fragmento, f, opcoes): f for f in Fragmento.todos(total)}
+        for futuro in as_completed(futuros):
+            try:
+                resumos.append(futuro.result())
+            except Exception as e:
+                falhas[str(futuros[futuro])] = str(e)
+
+    if falhas:
+        print(f"[AVISO] {len(falhas)} fragmento(s) falharam (refaça com --shard i/{total}):")
+        for fragmento, erro in sorted(falhas.items()):
+            print(f"  - {fragmento}: {erro}")
+    if not resumos:
+        raise RuntimeError("Nenhum fragmento concluído.")
+    resumo = juntar_resumos(resumos)
+    print(f"\n{len(resumos)} de {total} fragmentos concluídos em {resumo['duracao_segundos']:.1f}s.")
+    for nome, valor in sorted(resumo["contadores"].items()):
+        print(f"  {nome}: {valor:g}")
+    arquivo_json = os.getenv("METRICAS_JSON_ARQUIVO")
+    if arquivo_json:
+        with open(arquivo_json, "w", encoding="utf-8") as f:
+            json.dump(resumo, f, indent=2, ensure_ascii=False)
+    return resumo
+
+
+def importar_prontuarios(
+    todos: bool,
+    retomar: bool,
+    somente_falhas: bool,
+    modo: str,
+    desde: Optional[datetime],
+    dedup: bool,
+) -> None:
+    """Executa a importação (ver `processa_todos_os_imoveis`)."""
     supabase = conectar_supabase()
-    session = sessao_http()
+    session = sessao_http(retry_429=False, pool=max(20, MAX_EM_VOO))
+    limitador = LimitadorAdaptativo(
+        taxa_max=TAXA_MAX_REQ_S, max_em_voo=MAX_EM_VOO, taxa_inicial=TAXA_INICIAL_REQ_S
+    )
+    politica = politica_do_ambiente()
+    checkpoint = CheckpointProntuarios(ARQUIVO_CHECKPOINT)
+    indice = IndiceAlteracoes(ARQUIVO_INDICE)
+    exclusoes = Exclusoes(ARQUIVO_EXCLUSOES)
+    estados: Dict[str, Estado] = {} if desde else listar_estados_vista(session, limitador, politica)
+
+    # Os códigos chegam em fluxo (paginação por chave); os filtros abaixo também são preguiçosos
+    lidos = [0]
+
+    def contar_lidos(codigos: Iterable[str]) -> Iterator[str]:
+        for codigo in codigos:
+            lidos[0] += 1
+            yield codigo
+
+    codigos: Iterable[str] = []
+    if desde:
+        print(f"Buscando em lote os imóveis alterados desde {desde:%Y-%m-%d %H:%M:%S}.")
+        checkpoint.reiniciar()
+    elif somente_falhas:
+        codigos = sorted(filtrar_ativos(supabase, exclusoes.filtrar(checkpoint.codigos(FALHOU))))
+        print(f"Reprocessando {len(codigos)} imóveis que falharam na execução anterior.")
+    else:
+        codigos = exclusoes.filtrar(contar_lidos(iterar_codigos_imoveis(supabase)))
+        if FRAGMENTO:
+            print(f"Fragmento {FRAGMENTO}: só os imóveis deste fragmento serão consultados.")
+            codigos = FRAGMENTO.filtrar(codigos)
+        if not todos:
+            codigos = indice.filtrar_alterados(codigos, estados)
+        if retomar:
+            codigos = checkpoint.pendentes(codigos)
+            print("Retomando: imóveis já gravados na execução anterior serão pulados.")
+        else:
+            checkpoint.reiniciar()
 
-    codigos = get_codigos_imoveis(supabase)
-    for i, codigo_imovel in enumerate(codigos, start=1):
-        print(f"\n[{i}/{len(codigos)}] Consultando prontuários do imóvel {codigo_imovel}...")
-        dados = busca_prontuarios_do_imovel(session, codigo_imovel)
-        if not dados:
-            continue
+    def confirmar(imoveis: Iterable[str]) -> None:
+        # Gravação confirmada: checkpoint e índice de alterações avançam juntos, lote a lote
+        imoveis = list(imoveis)
+        checkpoint.marcar_gravados(imoveis)
+        indice.marcar({c: estados[c] for c in imoveis if c in estados})
 
-        prontuarios = dados.get("prontuarios") if isinstance(dados, dict) else None
-        if prontuarios:
-            inserir_prontuarios_supabase(supabase, prontuarios, codigo_imovel)
+    def registrar_descarga(imoveis: Set[str], erro: Optional[str]) -> None:
+        if erro is None:
+            confirmar(imoveis)
         else:
-            print(f"Imóvel {codigo_imovel} sem prontuários para importar.")
+            checkpoint.marcar_falhos(imoveis, erro)
+
+    consultados: Set[str] = set()
+    hashes: Optional[HashesLinhas] = None
+    if dedup:
+        hashes = HashesLinhas(ARQUIVO_HASHES, "imovel_prontuario", CHAVES_PRONTUARIO)
+    destino = criar_destino(lambda: supabase)
+    buffer = BufferProntuarios(destino, ao_descarregar=registrar_descarga, hashes=hashes)
+
+    def buscar(codigo: str) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        with METRICAS.cronometrar("detalhes_imovel"):
+            return [(codigo, busca_prontuarios_do_imovel(session, codigo, limitador, politica))]
+
+    def buscar_lote(grupo: List[str]) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        with METRICAS.cronometrar("listar_prontuarios"):
+            encontrados = buscar_prontuarios_em_lote(session, grupo, limitador, politica)
+        return [(codigo, encontrados.get(codigo)) for codigo in grupo]
+
+    def completar(
+        resultado: Tuple[str, Optional[Dict[str, Any]]]
+    ) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+        # Alternativa por imóvel para o que a busca em lote não trouxe
+        codigo, dados = resultado
+        if dados is not None:
+            return [resultado]
+        METRICAS.contar("fallback_detalhes_total")
+        return buscar(codigo)
+
+    def normalizar(
+        resultado: Tuple[str, Optional[Dict[str, Any]]]
+    ) -> List[Tuple[str, Optional[List[Dict[str, Any]]]]]:
+        codigo, dados = resultado
+        if not dados:
+            return [(codigo, None)]
+        prontuarios = dados.get("prontuarios") if isinstance(dados, dict) else None
+        with METRICAS.cronometrar("normalizar_prontuarios"):
+            return [(codigo, normalizar_prontuarios(prontuarios, codigo) if prontuarios else [])]
+
+    def gravar(itens: Iterator[Tuple[str, Optional[List[Dict[str, Any]]]]]) -> None:
+        # Roda na thread principal: buffer e checkpoint são usados por uma única thread
+        for i, (codigo_imovel, registros) in enumerate(itens, start=1):
+            print(f"\n[{i}] Prontuários do imóvel {codigo_imovel} recebidos.")
+            buffer.descarregar_se_expirado()
+            if registros is None:
+                checkpoint.marcar_falhos([codigo_imovel], f"consulta falhou após {MAX_RETRIES_API} tentativas")
+                continue
+
+            consultados.add(codigo_imovel)
+            if registros and hashes:
+                registros = list(hashes.alterados(registros))
+                if not registros:
+                    confirmar([codigo_imovel])
+                    print(f"Prontuários do imóvel {codigo_imovel} inalterados.")
+                    continue
+            if registros:
+                checkpoint.marcar_buscado(codigo_imovel)
+                buffer.adicionar(codigo_imovel, registros)
+            else:
+                confirmar([codigo_imovel])
+                print(f"Imóvel {codigo_imovel} sem prontuários para importar.")
+
+    fonte: Iterable[Any]
+    if desde:
+        fonte = iterar_prontuarios_alterados_desde(session, desde, estados, limitador, politica)
+        estagios = [Estagio("detalhes", completar, MAX_EM_VOO)]
+    elif modo == "lote":
+        fonte = agrupar(codigos, LOTE_LISTAR)
+        estagios = [Estagio("buscar_lote", buscar_lote, MAX_EM_VOO), Estagio("detalhes", completar, MAX_EM_VOO)]
+    else:
+        fonte = codigos
+        estagios = [Estagio("buscar", buscar, MAX_EM_VOO)]
+    estagios.append(Estagio("normalizar", normalizar, NORMALIZACAO_WORKERS))
 
-        time.sleep(SLEEP_ENTRE_REQ)  # educado com a API
+    try:
+        _, stats = executar_pipeline(
+            # Com `PRAZO_EXECUCAO_SEGUNDOS`, nenhum imóvel novo entra depois do prazo (ficam para --resume)
+            fonte=politica.ate_o_prazo(fonte),
+            estagios=estagios,
+            consumidor=gravar,
+            tamanho_fila=PIPELINE_FILA,
+        )
+    finally:
+        # Em Ctrl-C/erro o pipeline já parou as threads; grava o buffer e persiste o checkpoint
+        falhos = buffer.fechar()
+        destino.fechar()
+        checkpoint.fechar()
+        indice.fechar()
+        exclusoes.fechar()
+        if hashes:
+            hashes.fechar()
+
+    adiados = [e for e in stats.erros if e.erro.startswith(PrazoEsgotado.__name__)]
+    for erro in stats.erros:
+        if erro not in adiados:
+            print(f"[ERRO] Estágio {erro.estagio} ({erro.item}): {erro.erro}")
+    if adiados:
+        print(f"{len(adiados)} consulta(s) não concluída(s) no prazo da execução.")
+    print(stats.resumo())
+    if lidos[0]:
+        print(f"{lidos[0]} códigos lidos de `imoveis`; {len(consultados)} imóveis consultados com sucesso.")
+    if exclusoes.pulados:
+        print(f"{exclusoes.pulados} imóveis excluídos do Vista não foram consultados.")
+        METRICAS.contar("imoveis_excluidos_pulados_total", exclusoes.pulados)
+    print(f"{buffer.linhas_gravadas} prontuários gravados em {buffer.descargas} upsert(s).")
+    if hashes:
+        print(f"{hashes.pulados} prontuários inalterados não foram reenviados.")
+        METRICAS.contar("linhas_puladas_total", hashes.pulados, tabela="imovel_prontuario")
+    if falhos:
+        print(f"[AVISO] {len(falhos)} imóveis em lotes com falha (reprocessar): {sorted(falhos)}")
+
+    print(
+        f"Taxa final: {limitador.taxa:.2f} req/s | limites recebidos: {limitador.limites_recebidos} "
+        f"| espera no limitador: {limitador.tempo_espera:.1f}s"
+    )
+    METRICAS.registrar_espera(limitador.tempo_espera, motivo="limitador")
+    METRICAS.definir("limitador_taxa_final", limitador.taxa)
+    METRICAS.contar("limites_recebidos_total", limitador.limites_recebidos)
+    print(f"Requisições à API: {politica.resumo()}")
+    if politica.interrompida:
+        print("[AVISO] Prazo da execução esgotado: rode com --resume para continuar dos imóveis pendentes.")
+    for nome, ocupado in stats.tempo_ocupado.items():
+        METRICAS.definir("pipeline_ocupado_segundos", ocupado, estagio=nome)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa prontuários da API Vista para o Supabase.")
+    parser.add_argument(
+        "--todos",
+        action="store_true",
+        help="ignora o índice de alterações e consulta todos os imóveis",
+    )
+    parser.add_argument(
+        "--modo",
+        choices=("lote", "detalhes"),
+        default=MODO_BUSCA,
+        help="lote: prontuários de vários imóveis por requisição à listagem (padrão); "
+        "detalhes: uma chamada a /imoveis/detalhes por imóvel",
+    )
+    parser.add_argument(
+        "--sem-dedup",
+        action="store_true",
+        help="reenvia todos os prontuários, mesmo os que não mudaram desde o último upsert",
+    )
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument(
+        "--desde",
+        type=datetime.fromisoformat,
+        help="busca em lote só os imóveis com DataHoraAtualizacao a partir desta data (AAAA-MM-DD[ HH:MM])",
+    )
+    modo.add_argument(
+        "--resume",
+        action="store_true",
+        help="retoma a execução anterior, pulando imóveis já gravados no checkpoint",
+    )
+    modo.add_argument(
+        "--reprocessar-falhas",
+        action="store_true",
+        help="consulta apenas os imóveis que falharam na execução anterior",
+    )
+    fragmentacao = parser.add_mutually_exclusive_group()
+    fragmentacao.add_argument(
+        "--shard",
+        type=Fragmento.de_texto,
+        metavar="I/N",
+        help="importa só o fragmento I de N (hash estável do código); rode I=1..N em processos ou máquinas",
+    )
+    fragmentacao.add_argument(
+        "--shards",
+        type=int,
+        metavar="N",
+        help="importa os N fragmentos em um pool local de processos e junta os resumos",
+    )
+    fragmentacao.add_argument(
+        "--juntar-resumos",
+        nargs="+",
+        metavar="ARQUIVO",
+        help="junta os resumos JSON (METRICAS_JSON_ARQUIVO) de execuções --shard e imprime o total",
+    )
+    parser.add_argument("--processos", type=int, help="com --shards, processos simultâneos (padrão: N)")
+    args = parser.parse_args()
+    if (args.shard or args.shards) and args.desde:
+        parser.error("--desde não combina com --shard/--shards: a listagem filtrada não é dividida por código")
+    opcoes = dict(
+        todos=args.todos,
+        retomar=args.resume,
+        somente_falhas=args.reprocessar_falhas,
+        modo=args.modo,
+        desde=args.desde,
+        dedup=not args.sem_dedup,
+    )
     try:
-        processa_todos_os_imoveis()
+        if args.juntar_resumos:
+            resumos = []
+            for arquivo in args.juntar_resumos:
+                with open(arquivo, encoding="utf-8") as f:
+                    resumos.append(json.load(f))
+            print(json.dumps(juntar_resumos(resumos), indent=2, ensure_ascii=False))
+        elif args.shards:
+            processa_em_fragmentos(args.shards, args.processos, **opcoes)
+        else:
+            if args.shard:
+                aplicar_fragmento(args.shard)
+            processa_todos_os_imoveis(**opcoes)
     except Exception as exc:
         print(f"[ERRO] Execução interrompida: {exc}")
         raise
@@ -0,0 +1,228 @@
+"""
+Agregados diários de negócios (SQLite), para servir as janelas `semana` e `mes` do endpoint
+de negócios sem consultar a API Vista dia a dia.
+
+Cada balde é (etapa, status, dia) com a quantidade de negócios e a soma dos valores. O dia é
+o de `DataInicial` no fuso America/Sao_Paulo, em que a API já devolve as datas.
+
+A atualização é incremental: cada execução refaz os dias abertos (os seguintes a
+`fechado_ate`) e também os últimos `REABRIR_DIAS` dias já fechados. Os baldes contam o status
+atual de cada negócio, e negócios de dias passados mudam de status, então a janela de
+reabertura cobre o `mes` inteiro. Os baldes dos dias refeitos são substituídos inteiros;
+combinações que sumiram de um dia voltam zeradas em `linhas`, para que o destino remoto
+(upsert) também as zere. `divergencias` compara os baldes guardados com uma agregação feita
+na hora, para conferir se a janela de reabertura basta.
+
+    agregados = AgregadosNegocios(".vista_negocios.sqlite")
+    hoje = hoje_sp()
+    inicio = agregados.primeiro_dia_aberto(hoje)
+    linhas = agregados.linhas(inicio, hoje, agregar(negocios, inicio, hoje))
+    agregados.substituir(inicio, hoje, linhas, fechado_ate=hoje - timedelta(days=1))
+    agregados.semana("captacao", "aberto", hoje)
+"""
+
+from __future__ import annotations
+
+import calendar
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from mapeamento_campos import para_data, para_float
+
+FUSO = ZoneInfo("America/Sao_Paulo")
+REABRIR_DIAS = 31  # dias fechados refeitos a cada execução: a janela `mes` inteira
+
+Balde = Tuple[str, str, str]  # (etapa, status, dia AAAA-MM-DD)
+Linha = Dict[str, Any]
+
+
+def hoje_sp(agora: Optional[datetime] = None) -> date:
+    """Data de hoje em America/Sao_Paulo (independe do fuso do servidor)."""
+    return (agora or datetime.now(FUSO)).astimezone(FUSO).date()
+
+
+def um_mes_antes(dia: date) -> date:
+    """Mesmo dia do mês anterior (limitado ao último dia do mês), como `setMonth(-1)`."""
+    ano, mes = (dia.year, dia.month - 1) if dia.month > 1 else (dia.year - 1, 12)
+    return date(ano, mes, min(dia.day, calendar.monthrange(ano, mes)[1]))
+
+
+def normalizar_etapa(etapa: str) -> str:
+    """Etapa da rota: só capitaliza a primeira letra ("captação" -> "Captação")."""
+    minusculo = etapa.lower()
+    return minusculo[:1].upper() + minusculo[1:]
+
+
+def normalizar_status(status: str) -> str:
+    """Status da rota: "aberto" -> "Em aberto"; os demais capitalizam a primeira letra."""
+    return "Em aberto" if status.lower() == "aberto" else normalizar_etapa(status)
+
+
+def agregar(
+    negocios: Iterable[Dict[str, Any]], inicio: date, fim: date, campo_valor: str = "ValorNegocio"
+) -> Dict[Balde, Tuple[int, float]]:
+    """
+    Quantidade e soma de `campo_valor` por (etapa, status, dia) entre `inicio` e `fim`.
+
+    Negócios repetidos (mesmo `Codigo` em duas páginas) contam uma vez; os sem `DataInicial`
+    válida ou fora do intervalo são ignorados.
+    """
+    unicos = {str(n.get("Codigo")): n for n in negocios}
+    limite_inicio, limite_fim = inicio.isoformat(), fim.isoformat()
+    baldes: Dict[Balde, Tuple[int, float]] = {}
+    for negocio in unicos.values():
+        data = para_data(negocio.get("DataInicial"))
+        dia = data.strip()[:10] if data else None
+        if not dia or not limite_inicio <= dia <= limite_fim:
+            continue
+        balde = (str(negocio.get("NomeEtapa") or ""), str(negocio.get("Status") or ""), dia)
+        quantidade, valor = baldes.get(balde, (0, 0.0))
+        baldes[balde] = (quantidade + 1, valor + (para_float(negocio.get(campo_valor)) or 0.0))
+    return baldes
+
+
+class AgregadosNegocios:
+    """Baldes diários de negócios e o último dia fechado."""
+
+    def __init__(self, caminho: str) -> None:
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS negocio_dia (
+                etapa TEXT NOT NULL,
+                status TEXT NOT NULL,
+                dia TEXT NOT NULL,
+                quantidade INTEGER NOT NULL,
+                valor REAL NOT NULL,
+                atualizado_em TEXT NOT NULL,
+                PRIMARY KEY (etapa, status, dia)
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_negocio_dia_dia ON negocio_dia (dia)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS negocio_controle (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)"
+        )
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def fechado_ate(self) -> Optional[date]:
+        """Último dia cujos baldes não são mais refeitos (None antes da primeira execução)."""
+        with self._lock:
+            linha = self.conn.execute(
+                "SELECT valor FROM negocio_controle WHERE chave = 'fechado_ate'"
+            ).fetchone()
+        return date.fromisoformat(linha[0]) if linha else None
+
+    def primeiro_dia(self) -> Optional[date]:
+        """Dia mais antigo com baldes (None sem agregados)."""
+        with self._lock:
+            (dia,) = self.conn.execute("SELECT MIN(dia) FROM negocio_dia").fetchone()
+        return date.fromisoformat(dia) if dia else None
+
+    def primeiro_dia_aberto(
+        self, hoje: date, dias_iniciais: int = 31, reabrir_dias: int = REABRIR_DIAS
+    ) -> date:
+        """
+        Primeiro dia a refazer: o seguinte ao último fechado, ou `dias_iniciais` atrás na primeira
+        execução. `reabrir_dias` refaz também os últimos dias já fechados (status alterados).
+        """
+        fechado = self.fechado_ate()
+        inicio = fechado + timedelta(days=1) if fechado else hoje - timedelta(days=dias_iniciais)
+        return min(inicio, hoje - timedelta(days=reabrir_dias), hoje)
+
+    def linhas(self, inicio: date, fim: date, baldes: Dict[Balde, Tuple[int, float]]) -> List[Linha]:
+        """Linhas dos dias `inicio`..`fim`: baldes novos e, zerados, os que existiam e sumiram."""
+        with self._lock:
+            anteriores = self.conn.execute(
+                "SELECT etapa, status, dia FROM negocio_dia WHERE dia BETWEEN ? AND ?",
+                (inicio.isoformat(), fim.isoformat()),
+            ).fetchall()
+        agora = datetime.now(FUSO).isoformat(timespec="seconds")
+        todos = {**{tuple(b): (0, 0.0) for b in anteriores}, **baldes}
+        return [
+            {"etapa": e, "status": s, "dia": d, "quantidade": q, "valor": round(v, 2), "atualizado_em": agora}
+            for (e, s, d), (q, v) in sorted(todos.items(), key=lambda item: (item[0][2], item[0][0], item[0][1]))
+        ]
+
+    def substituir(self, inicio: date, fim: date, linhas: List[Linha], fechado_ate: Optional[date] = None) -> None:
+        """Troca os baldes de `inicio`..`fim` por `linhas` e fecha os dias até `fechado_ate`."""
+        with self._lock:
+            with self.conn:  # transação: ou troca tudo, ou nada
+                self.conn.execute(
+                    "DELETE FROM negocio_dia WHERE dia BETWEEN ? AND ?", (inicio.isoformat(), fim.isoformat())
+                )
+                self.conn.executemany(
+                    """
+                    INSERT INTO negocio_dia (etapa, status, dia, quantidade, valor, atualizado_em)
+                    VALUES (:etapa, :status, :dia, :quantidade, :valor, :atualizado_em)
+                    """,
+                    linhas,
+                )
+                if fechado_ate:
+                    self.conn.execute(
+                        """
+                        INSERT INTO negocio_controle (chave, valor) VALUES ('fechado_ate', ?)
+                        ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor
+                        """,
+                        (fechado_ate.isoformat(),),
+                    )
+
+    def divergencias(
+        self, inicio: date, fim: date, baldes: Dict[Balde, Tuple[int, float]]
+    ) -> List[Tuple[Balde, Tuple[int, float], Tuple[int, float]]]:
+        """
+        Baldes de `inicio`..`fim` em que o guardado difere de `baldes` (agregação feita na hora).
+
+        Retorna `(balde, guardado, ao_vivo)`; baldes ausentes de um dos lados valem (0, 0.0).
+        """
+        with self._lock:
+            guardados = {
+                (e, s, d): (q, v)
+                for e, s, d, q, v in self.conn.execute(
+                    "SELECT etapa, status, dia, quantidade, valor FROM negocio_dia WHERE dia BETWEEN ? AND ?",
+                    (inicio.isoformat(), fim.isoformat()),
+                )
+            }
+        diferencas = []
+        for balde in sorted(set(guardados) | set(baldes), key=lambda b: (b[2], b[0], b[1])):
+            guardado, ao_vivo = guardados.get(balde, (0, 0.0)), baldes.get(balde, (0, 0.0))
+            if guardado[0] != ao_vivo[0] or abs(guardado[1] - ao_vivo[1]) > 0.005:  # valor salvo com 2 casas
+                diferencas.append((balde, guardado, ao_vivo))
+        return diferencas
+
+    def janela(self, etapa: str, status: str, inicio: date, fim: date) -> Dict[str, Tuple[int, float]]:
+        """{dia: (quantidade, valor)} de uma etapa/status entre `inicio` e `fim` (inclusive)."""
+        with self._lock:
+            linhas = self.conn.execute(
+                """
+                SELECT dia, quantidade, valor FROM negocio_dia
+                WHERE etapa = ? AND status = ? AND dia BETWEEN ? AND ?
+                """,
+                (etapa, status, inicio.isoformat(), fim.isoformat()),
+            ).fetchall()
+        return {dia: (quantidade, valor) for dia, quantidade, valor in linhas}
+
+    def semana(self, etapa: str, status: str, hoje: date) -> Dict[str, Any]:
+        """Últimos 7 dias (inclui hoje): `{total, porDia}`, como o endpoint `semana`."""
+        etapa, status = normalizar_etapa(etapa), normalizar_status(status)
+        dias = [(hoje - timedelta(days=i)).isoformat() for i in range(6, -1, -1)]
+        baldes = self.janela(etapa, status, hoje - timedelta(days=6), hoje)
+        por_dia = {dia: baldes.get(dia, (0, 0.0))[0] for dia in dias}
+        return {"total": sum(por_dia.values()), "porDia": por_dia}
+
+    def mes(self, etapa: str, status: str, hoje: date) -> Dict[str, Any]:
+        """Do mesmo dia do mês anterior até hoje: `{total, valorTotal}`, como o endpoint `mes`."""
+        etapa, status = normalizar_etapa(etapa), normalizar_status(status)
+        baldes = self.janela(etapa, status, um_mes_antes(hoje), hoje).values()
+        return {"total": sum(q for q, _ in baldes), "valorTotal": round(sum(v for _, v in baldes), 2)}
+
+    def fechar(self) -> None:
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
@@ -0,0 +1 @@
+"""Benchmarks offline dos importadores com servidores locais no lugar de Vista e Supabase."""
@@ -0,0 +1,140 @@
+"""
+Executa um alvo de benchmark em um processo isolado e grava as métricas em JSON.
+
+Chamado por `executar_benchmarks.py` com as variáveis de ambiente já apontando para o
+servidor fake (os scripts leem o `.env`/ambiente na importação). Rodar cada alvo em um
+processo próprio deixa o pico de RSS (`ru_maxrss`) medido por alvo.
+
+    python -m benchmarks.alvo listar /tmp/resultado.json
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from requests.adapters import HTTPAdapter
+
+_latencias: List[float] = []
+_lock = threading.Lock()
+_send_original = HTTPAdapter.send
+
+
+def _send_cronometrado(self: HTTPAdapter, request: Any, *args: Any, **kwargs: Any) -> Any:
+    """Mede a latência de cada requisição à API Vista (o Supabase usa httpx, não passa aqui)."""
+    inicio = time.perf_counter()
+    try:
+        return _send_original(self, request, *args, **kwargs)
+    finally:
+        with _lock:
+            _latencias.append(time.perf_counter() - inicio)
+
+
+def percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = min(len(ordenados) - 1, max(0, round(p / 100.0 * (len(ordenados) - 1))))
+    return ordenados[k]
+
+
+def pico_rss_mb() -> float:
+    """
+    Pico de RSS deste processo. `VmHWM` é zerado no exec; `ru_maxrss` herda o pico do
+    processo pai no fork (e o pai guarda o catálogo do servidor fake).
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for linha in f:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def alvo_listar() -> int:
+    import ImportVistaSupabase
+
+    return len(ImportVistaSupabase.listar_imoveis())
+
+
+def alvo_prontuarios() -> int:
+    import ImportadorProntuarios
+
+    ImportadorProntuarios.processa_todos_os_imoveis(todos=True)
+    return int(os.environ["BENCH_IMOVEIS"])
+
+
+def alvo_prontuarios_detalhes() -> int:
+    import ImportadorProntuarios
+
+    ImportadorProntuarios.processa_todos_os_imoveis(todos=True, modo="detalhes")
+    return int(os.environ["BENCH_IMOVEIS"])
+
+
+def alvo_csv() -> int:
+    import Exporta_Vista_CSV
+
+    imoveis = Exporta_Vista_CSV.listar_imoveis()
+    with tempfile.TemporaryDirectory() as tmp:
+        Exporta_Vista_CSV.salvar_imoveis_csv(imoveis, os.path.join(tmp, "imoveis.csv"))
+    return len(imoveis)
+
+
+def alvo_csv_stream() -> int:
+    import Exporta_Vista_CSV
+
+    with tempfile.TemporaryDirectory() as tmp:
+        return Exporta_Vista_CSV.exportar_csv_streaming(os.path.join(tmp, "imoveis.csv"))
+
+
+def alvo_parquet() -> int:
+    import Exporta_Vista_CSV
+
+    with tempfile.TemporaryDirectory() as tmp:
+        return Exporta_Vista_CSV.exportar_parquet(os.path.join(tmp, "imoveis.parquet"))
+
+
+ALVOS: Dict[str, Callable[[], int]] = {
+    "listar": alvo_listar,
+    "prontuarios": alvo_prontuarios,
+    "prontuarios_detalhes": alvo_prontuarios_detalhes,
+    "csv": alvo_csv,
+    "csv_stream": alvo_csv_stream,
+    "parquet": alvo_parquet,
+}
+
+
+def main(nome: str, saida: str) -> None:
+    HTTPAdapter.send = _send_cronometrado
+    inicio = time.perf_counter()
+    # A saída dos scripts (prints e barras de progresso) é descartada para não distorcer a medição
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo), contextlib.redirect_stderr(nulo):
+        registros = ALVOS[nome]()
+    duracao = time.perf_counter() - inicio
+
+    resultado = {
+        "alvo": nome,
+        "registros": registros,
+        "duracao_s": round(duracao, 3),
+        "registros_por_s": round(registros / duracao, 1) if duracao else 0.0,
+        "requisicoes": len(_latencias),
+        "latencia_p50_ms": round(percentil(_latencias, 50) * 1000, 1),
+        "latencia_p95_ms": round(percentil(_latencias, 95) * 1000, 1),
+        "latencia_p99_ms": round(percentil(_latencias, 99) * 1000, 1),
+        "pico_rss_mb": round(pico_rss_mb(), 1),
+    }
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], sys.argv[2])
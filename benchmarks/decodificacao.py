@@ -0,0 +1,97 @@
+"""
+Compara as formas de decodificar uma página da listagem (`decodificacao_json.py`) em
+páginas sintéticas (o mesmo catálogo do servidor fake):
+
+- `json`: `resp.json()` + varredura das chaves, como os scripts faziam antes;
+- `orjson`: `carregar` com orjson (se instalado) + a mesma varredura;
+- `stream`: `LeitorPagina` lendo a resposta em blocos de `TAMANHO_BLOCO`.
+
+Mede o melhor tempo de N execuções e o pico de memória alocada (tracemalloc) consumindo os
+itens um a um. Antes de medir, confere que os três modos devolvem os mesmos itens.
+
+    python -m benchmarks.decodificacao --pagina 50 --prontuarios
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from benchmarks.servidor_fake import gerar_catalogo
+from decodificacao_json import CHAVES_PAGINACAO, TAMANHO_BLOCO, LeitorPagina, carregar, orjson
+
+
+def montar_corpo(pagina: int, prontuarios: bool) -> bytes:
+    """Corpo JSON de uma página da listagem, como a API devolve."""
+    imoveis, por_imovel = gerar_catalogo(pagina)
+    resposta: Dict[str, Any] = {}
+    for im in imoveis:
+        item = dict(im)
+        if prontuarios:
+            item["prontuarios"] = por_imovel.get(im["Codigo"], {})
+        resposta[im["Codigo"]] = item
+    resposta.update({"total": pagina * 100, "paginas": 100, "pagina": 1, "quantidade": pagina})
+    return json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+
+
+def _varrer(dados: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    return ((k, v) for k, v in dados.items() if k not in CHAVES_PAGINACAO and isinstance(v, dict))
+
+
+def modos(corpo: bytes) -> List[Tuple[str, Callable[[], Iterator[Tuple[str, Dict[str, Any]]]]]]:
+    blocos = [corpo[i : i + TAMANHO_BLOCO] for i in range(0, len(corpo), TAMANHO_BLOCO)]
+    lista = [
+        ("json", lambda: _varrer(json.loads(corpo))),
+        ("stream", lambda: iter(LeitorPagina(blocos))),
+    ]
+    if orjson is not None:
+        lista.insert(1, ("orjson", lambda: _varrer(carregar(corpo))))
+    return lista
+
+
+def medir(funcao: Callable[[], Iterator[Any]], repeticoes: int) -> float:
+    """Melhor tempo (s) entre `repeticoes` execuções consumindo todos os itens."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in funcao():
+            pass
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def pico_memoria(funcao: Callable[[], Iterator[Any]]) -> float:
+    """Pico de memória alocada (MiB) consumindo os itens um a um, sem guardá-los."""
+    tracemalloc.start()
+    for _ in funcao():
+        pass
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark da decodificação de páginas da listagem.")
+    parser.add_argument("--pagina", type=int, default=50, help="imóveis por página (a API devolve até 50)")
+    parser.add_argument("--prontuarios", action="store_true", help="inclui o campo aninhado `prontuarios`")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    corpo = montar_corpo(args.pagina, args.prontuarios)
+    print(f"página com {args.pagina} imóveis, {len(corpo) / 1024:.0f} KiB")
+    print(f"{'modo':>8} | {'ms':>8} | {'pico_mib':>8}")
+    referencia = None
+    for nome, funcao in modos(corpo):
+        itens = list(funcao())
+        if referencia is None:
+            referencia = itens
+        elif itens != referencia:
+            raise SystemExit(f"[ERRO] {nome}: itens diferentes do modo json")
+        print(f"{nome:>8} | {medir(funcao, args.repeticoes) * 1000:>8.2f} | {pico_memoria(funcao):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
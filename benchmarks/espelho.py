@@ -0,0 +1,78 @@
+"""
+Latência das consultas da action `buscarImoveis` no espelho local (`espelho_catalogo.py`),
+em um catálogo sintético (o mesmo do servidor fake).
+
+Para cada pesquisa mede p50/p95 de `EspelhoCatalogo.pesquisar` (sem HTTP) e confere que os
+códigos devolvidos são os mesmos que o filtro do servidor fake seleciona, sem os internos
+(`ExibirNoSite` = "Nao"), como a API sem `showInternal`.
+
+    python -m benchmarks.espelho --imoveis 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.servidor_fake import _aplica_filtro, gerar_catalogo
+from espelho_catalogo import EspelhoCatalogo
+
+CAMPOS = ["Codigo", "Categoria", "Bairro", "Status", "DataCadastro", "DataAtualizacao"]
+
+
+def pesquisas() -> List[Tuple[str, Dict[str, Any]]]:
+    return [
+        ("sem filtro", {}),
+        ("bairro", {"Bairro": ["Batel"]}),
+        ("categoria+bairro", {"Categoria": ["Apartamento"], "Bairro": ["Centro", "Batel"]}),
+        ("status", {"Status": "Venda"}),
+        ("status+categoria+bairro", {"Status": "Venda", "Categoria": ["Casa"], "Bairro": ["Juvevê"]}),
+        ("atualizados", {"DataAtualizacao": ["2025-06-01", "2025-06-30"]}),
+        ("bairro, pág. 3", {"Bairro": ["Portão"]}),
+    ]
+
+
+def medir(espelho: EspelhoCatalogo, pesquisa: Dict[str, Any], repeticoes: int) -> List[float]:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        espelho.pesquisar(pesquisa)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark das consultas ao espelho local do catálogo.")
+    parser.add_argument("--imoveis", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    imoveis, _ = gerar_catalogo(args.imoveis)
+    with tempfile.TemporaryDirectory() as tmp:
+        espelho = EspelhoCatalogo(os.path.join(tmp, "espelho.sqlite"))
+        inicio = time.perf_counter()
+        for i in range(0, len(imoveis), 50):
+            espelho.gravar(imoveis[i : i + 50])
+        print(f"{args.imoveis} imóveis gravados em {time.perf_counter() - inicio:.2f} s (páginas de 50)")
+
+        print(f"{'pesquisa':>24} | {'total':>6} | {'p50_ms':>7} | {'p95_ms':>7}")
+        for nome, filtro in pesquisas():
+            pagina = 3 if "pág." in nome else 1
+            pesquisa = {"fields": CAMPOS, "filter": filtro, "paginacao": {"pagina": pagina, "quantidade": 50}}
+            resposta = espelho.pesquisar(pesquisa)
+            esperados = [im["Codigo"] for im in _aplica_filtro(imoveis, filtro) if im.get("ExibirNoSite") != "Nao"]
+            obtidos = [k for k, v in resposta.items() if isinstance(v, dict)]
+            if obtidos != esperados[(pagina - 1) * 50 : pagina * 50] or resposta["total"] != len(esperados):
+                raise SystemExit(f"[ERRO] {nome}: resultado diferente do filtro da API fake")
+            tempos = sorted(medir(espelho, pesquisa, args.repeticoes))
+            p95 = tempos[int(len(tempos) * 0.95) - 1]
+            print(f"{nome:>24} | {resposta['total']:>6} | {statistics.median(tempos):>7.2f} | {p95:>7.2f}")
+        espelho.fechar()
+
+
+if __name__ == "__main__":
+    main()
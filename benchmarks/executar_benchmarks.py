@@ -0,0 +1,128 @@
+"""
+Executa os cenários de benchmark contra o servidor fake (Vista + Supabase) e imprime um resumo.
+
+Para cada tamanho de catálogo sobe um servidor local e roda cada alvo (`listar`,
+`prontuarios`, `csv`) em um subprocesso, medindo registros/s, latência p50/p95/p99 das
+requisições à API e pico de RSS.
+
+    python -m benchmarks.executar_benchmarks --cenarios 1000,10000 --alvos listar,csv
+    python -m benchmarks.executar_benchmarks --cenarios 100000 --prob-429 0.02 --json resultado.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, List
+
+from benchmarks.servidor_fake import ConfigFake, criar_servidor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLUNAS = (
+    "imoveis", "alvo", "registros", "duracao_s", "registros_por_s", "requisicoes",
+    "latencia_p50_ms", "latencia_p95_ms", "latencia_p99_ms", "pico_rss_mb",
+)
+
+
+def ambiente_alvo(alvo: str, base: str, imoveis: int, tmp: str, extra: Dict[str, str]) -> Dict[str, str]:
+    """Variáveis de ambiente que apontam os scripts para o servidor fake."""
+    env = dict(os.environ)
+    env.update(
+        {
+            "API_IMOVEIS_KEY": "benchmark",
+            "API_IMOVEIS_URL": f"{base}/imoveis/detalhes" if alvo.startswith("prontuarios") else f"{base}/imoveis/listar",
+            "API_LISTAR_URL": f"{base}/imoveis/listar",
+            "SUPABASE_URL": base,
+            "SUPABASE_KEY": "benchmark.benchmark.benchmark",
+            "ARQUIVO_WATERMARK": os.path.join(tmp, "watermark.json"),
+            "ARQUIVO_INDICE": os.path.join(tmp, "indice.sqlite"),
+            "ARQUIVO_CHECKPOINT": os.path.join(tmp, "checkpoint.sqlite"),
+            "ARQUIVO_HASHES": os.path.join(tmp, "hashes.sqlite"),
+            "ARQUIVO_PAGINACAO": os.path.join(tmp, "paginacao.json"),
+            "ARQUIVO_ESPELHO": os.path.join(tmp, "espelho.sqlite"),
+            "BENCH_IMOVEIS": str(imoveis),
+            "PYTHONPATH": RAIZ + os.pathsep + env.get("PYTHONPATH", ""),
+        }
+    )
+    env.update(extra)
+    return env
+
+
+def executar_cenario(
+    imoveis: int, alvos: List[str], config: ConfigFake, extra: Dict[str, str]
+) -> List[Dict[str, Any]]:
+    config.imoveis = imoveis
+    servidor, estado = criar_servidor(config)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    resultados: List[Dict[str, Any]] = []
+    try:
+        for alvo in alvos:
+            with tempfile.TemporaryDirectory() as tmp:
+                saida = os.path.join(tmp, "resultado.json")
+                proc = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.alvo", alvo, saida],
+                    cwd=RAIZ,
+                    env=ambiente_alvo(alvo, base, imoveis, tmp, extra),
+                    capture_output=True,
+                    text=True,
+                )
+                if proc.returncode != 0:
+                    print(f"[ERRO] {alvo} ({imoveis} imóveis):\n{proc.stderr[-2000:]}", file=sys.stderr)
+                    continue
+                with open(saida, encoding="utf-8") as f:
+                    resultado = json.load(f)
+            resultado["imoveis"] = imoveis
+            resultado["servidor"] = dict(estado.contadores)
+            estado.contadores.clear()
+            resultados.append(resultado)
+            print(formatar_linha(resultado), flush=True)
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+    return resultados
+
+
+def formatar_linha(resultado: Dict[str, Any]) -> str:
+    return " | ".join(f"{resultado.get(c, '')!s:>{max(len(c), 8)}}" for c in COLUNAS)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks offline dos importadores Vista.")
+    parser.add_argument("--cenarios", default="1000,10000", help="tamanhos de catálogo (ex.: 1000,10000,100000)")
+    parser.add_argument("--alvos", default="listar,prontuarios,csv")
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--variacao-ms", type=float, default=10.0)
+    parser.add_argument("--prob-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=0)
+    parser.add_argument("--taxa-max", default="1000", help="TAXA_MAX_REQ_S repassada ao importador de prontuários")
+    parser.add_argument("--json", help="grava todos os resultados neste arquivo")
+    args = parser.parse_args()
+
+    config = ConfigFake(
+        latencia_ms=args.latencia_ms,
+        variacao_ms=args.variacao_ms,
+        prob_429=args.prob_429,
+        retry_after=args.retry_after,
+    )
+    extra = {"TAXA_MAX_REQ_S": args.taxa_max, "TAXA_INICIAL_REQ_S": args.taxa_max}
+    alvos = [a.strip() for a in args.alvos.split(",") if a.strip()]
+
+    print(" | ".join(f"{c:>{max(len(c), 8)}}" for c in COLUNAS))
+    todos: List[Dict[str, Any]] = []
+    for n in (int(x) for x in args.cenarios.split(",") if x.strip()):
+        todos.extend(executar_cenario(n, alvos, config, extra))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(todos, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Compara o mapeamento declarativo (`mapeamento_campos.py`) com as funções escritas à mão
+que ele substituiu, em um catálogo sintético (o mesmo do servidor fake).
+
+As implementações de referência abaixo são cópias fiéis das versões anteriores de
+`normalizar_item`, `mapear_imovel`/`trata_data`, `normalizar_prontuarios` e da conversão
+de colunas do Parquet. Antes de medir, o benchmark confere que as saídas são idênticas.
+
+    python -m benchmarks.normalizacao --linhas 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.servidor_fake import gerar_catalogo
+from ImportadorProntuarios import normalizar_prontuarios
+from ImportVistaSupabase import normalizar_pagina
+from mapeamento_campos import MAPA_EXPORTACAO, MAPA_EXPORTACAO_TIPADA, para_date, para_datetime
+
+# =========================
+# Referência: mapeamentos escritos à mão
+# =========================
+
+
+def _ref_tratar_data(valor: Optional[str]) -> Optional[str]:
+    if not valor or valor == "0000-00-00":
+        return None
+    return valor
+
+
+def ref_normalizar_item(im: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "codigo": im.get("Codigo"),
+        "categoria": im.get("Categoria"),
+        "bairro": im.get("Bairro"),
+        "status": im.get("Status"),
+        "orulo": im.get("Orulo"),
+        "exibirnosite": im.get("ExibirNoSite"),
+        "dataatualizacao": _ref_tratar_data(im.get("DataAtualizacao")),
+        "datadeativacao": _ref_tratar_data(im.get("DataDeAtivacao")),
+        "datacadastro": _ref_tratar_data(im.get("DataCadastro")),
+    }
+
+
+def _ref_trata_data(valor: Any) -> Optional[str]:
+    if not valor or not isinstance(valor, str):
+        return None
+    v = valor.strip()
+    if v in ("", "0000-00-00", "0000-00-00 00:00:00"):
+        return None
+    if v.replace("0", "").replace("-", "").replace(":", "").replace(" ", "") == "":
+        return None
+    return valor
+
+
+def _ref_trata_boolean(valor: Any) -> Optional[bool]:
+    if valor is None:
+        return None
+    s = str(valor).strip().lower()
+    if s in {"sim", "true", "1"}:
+        return True
+    if s in {"nao", "não", "false", "0"}:
+        return False
+    return None
+
+
+def ref_mapear_imovel(im: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "codigoimovel": im.get("Codigo"),
+        "categoria": im.get("Categoria"),
+        "bairro": im.get("Bairro"),
+        "status": im.get("Status"),
+        "orulo": im.get("Orulo"),
+        "datahoraatualizacao": _ref_trata_data(im.get("DataHoraAtualizacao")),
+        "pendenteprontuario": im.get("PendenteProntuario"),
+        "datadeativacao": _ref_trata_data(im.get("DataDeAtivacao")),
+        "dataatualizacao": _ref_trata_data(im.get("DataAtualizacao")),
+    }
+
+
+def ref_normalizar_prontuarios(prontuarios: Dict[str, Any], codigo_imovel: str) -> List[Dict[str, Any]]:
+    registros: List[Dict[str, Any]] = []
+    for cod, p in prontuarios.items():
+        codigo_prontuario_raw = p.get("Codigo", cod) if isinstance(p, dict) else cod
+
+        def to_float(v: Any) -> Optional[float]:
+            if v in (None, ""):
+                return None
+            try:
+                return float(v)
+            except Exception:
+                return None
+
+        item = {
+            "codigo_imovel": codigo_imovel,
+            "codigo_prontuario": int(codigo_prontuario_raw) if str(codigo_prontuario_raw).isdigit() else None,
+            "data": _ref_trata_data(p.get("Data")) if isinstance(p, dict) else None,
+            "hora": p.get("Hora") if isinstance(p, dict) else None,
+            "assunto": p.get("Assunto") if isinstance(p, dict) else None,
+            "texto": p.get("Texto") if isinstance(p, dict) else None,
+            "pendente": _ref_trata_boolean(p.get("Pendente")) if isinstance(p, dict) else None,
+            "bairro": p.get("Bairro") if isinstance(p, dict) else None,
+            "anunciado": _ref_trata_boolean(p.get("Anunciado")) if isinstance(p, dict) else None,
+            "retranca": p.get("Retranca") if isinstance(p, dict) else None,
+            "corretor": p.get("Corretor") if isinstance(p, dict) else None,
+            "proposta": _ref_trata_boolean(p.get("PROPOSTA")) if isinstance(p, dict) else None,
+            "status": p.get("Status") if isinstance(p, dict) else None,
+            "datainicio": _ref_trata_data(p.get("Datainicio")) if isinstance(p, dict) else None,
+            "veiculopublicado": p.get("VeiculoPublicado") if isinstance(p, dict) else None,
+            "valorproposta": to_float(p.get("ValorProposta")) if isinstance(p, dict) else None,
+            "bairroanuncio": p.get("BairroAnuncio") if isinstance(p, dict) else None,
+            "statusbatecao": p.get("StatusBatecao") if isinstance(p, dict) else None,
+            "valorbatido": to_float(p.get("ValorBatido")) if isinstance(p, dict) else None,
+            "privado": _ref_trata_boolean(p.get("Privado")) if isinstance(p, dict) else None,
+            "cliente": p.get("Cliente") if isinstance(p, dict) else None,
+            "tipoanuncio": p.get("Tipoanuncio") if isinstance(p, dict) else None,
+            "titulado": p.get("Titulado") if isinstance(p, dict) else None,
+            "statusdoimovel": p.get("Statusdoimóvel") if isinstance(p, dict) else None,
+            "codigocorretor": p.get("CodigoCorretor") if isinstance(p, dict) else None,
+        }
+        registros.append(item)
+    return registros
+
+
+def ref_colunas_tipadas(pagina: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    conversores = {
+        "datahoraatualizacao": para_datetime,
+        "datadeativacao": para_date,
+        "dataatualizacao": para_date,
+    }
+    colunas: Dict[str, List[Any]] = {nome: [] for nome in MAPA_EXPORTACAO.nomes}
+    for im in pagina:
+        for nome, valor in ref_mapear_imovel(im).items():
+            conversor = conversores.get(nome)
+            colunas[nome].append(conversor(valor) if conversor else valor)
+    return colunas
+
+
+# =========================
+# Medição
+# =========================
+
+
+def medir(funcao: Callable[[], Any], repeticoes: int) -> float:
+    """Melhor tempo (s) entre `repeticoes` execuções."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def paginas(itens: List[Any], tamanho: int) -> List[List[Any]]:
+    return [itens[i : i + tamanho] for i in range(0, len(itens), tamanho)]
+
+
+def cenarios(linhas: int, pagina: int) -> List[Tuple[str, Callable[[], Any], Callable[[], Any]]]:
+    imoveis, prontuarios = gerar_catalogo(linhas)
+    paginas_imoveis = paginas(imoveis, pagina)
+
+    # Prontuários agrupados por imóvel até somar `linhas` linhas
+    por_imovel: List[Tuple[str, Dict[str, Any]]] = []
+    total = 0
+    while total < linhas:
+        for codigo, itens in prontuarios.items():
+            por_imovel.append((codigo, itens))
+            total += len(itens)
+            if total >= linhas:
+                break
+
+    # A linha de referência normaliza as datas zeradas de forma diferente em `imovel_local`
+    # ("0000-00-00 00:00:00" passava adiante); no catálogo sintético as saídas coincidem.
+    return [
+        (
+            "imovel_local",
+            lambda: [ref_normalizar_item(im) for pg in paginas_imoveis for im in pg],
+            lambda: [linha for pg in paginas_imoveis for linha in normalizar_pagina(pg)],
+        ),
+        (
+            "exportacao",
+            lambda: [ref_mapear_imovel(im) for pg in paginas_imoveis for im in pg],
+            lambda: [linha for pg in paginas_imoveis for linha in MAPA_EXPORTACAO.linhas(pg)],
+        ),
+        (
+            "prontuarios",
+            lambda: [linha for cod, itens in por_imovel for linha in ref_normalizar_prontuarios(itens, cod)],
+            lambda: [linha for cod, itens in por_imovel for linha in normalizar_prontuarios(itens, cod)],
+        ),
+        (
+            "parquet",
+            lambda: [ref_colunas_tipadas(pg) for pg in paginas_imoveis],
+            lambda: [MAPA_EXPORTACAO_TIPADA.colunas(pg) for pg in paginas_imoveis],
+        ),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark do mapeamento declarativo de campos.")
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--pagina", type=int, default=50, help="linhas por página (a API devolve 50)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.linhas} linhas, páginas de {args.pagina}")
+    print(f"{'cenario':>12} | {'referencia_s':>12} | {'mapeamento_s':>12} | {'ganho':>6}")
+    for nome, referencia, mapeamento in cenarios(args.linhas, args.pagina):
+        esperado, obtido = referencia(), mapeamento()
+        if esperado != obtido:
+            raise SystemExit(f"[ERRO] {nome}: saídas diferentes entre referência e mapeamento")
+        t_ref = medir(referencia, args.repeticoes)
+        t_map = medir(mapeamento, args.repeticoes)
+        print(f"{nome:>12} | {t_ref:>12.3f} | {t_map:>12.3f} | {t_ref / t_map:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Servidor local que imita a API Vista e o PostgREST do Supabase, para benchmarks offline.
+
+Vista:
+- `GET /imoveis/listar`: resposta paginada no formato da API (dict de imóveis por código +
+  `total`/`paginas`/`pagina`/`quantidade`). Suporta `fields` (inclusive o campo aninhado
+  `prontuarios`) e `filter` por lista de valores ou intervalo `[inicio, fim]`.
+- `GET /imoveis/detalhes?imovel=...`: prontuários do imóvel, ou 400 "sem prontuarios".
+- `GET /negocios/listar`: negócios (`DataInicial` nos últimos 60 dias), no mesmo formato da
+  listagem de imóveis.
+- Latência configurável (com variação) e injeção de 429 com `Retry-After`.
+
+Supabase (PostgREST):
+- `POST /rest/v1/<tabela>`: upsert de uma lista de linhas (responde com as linhas).
+- `GET /rest/v1/<tabela>`: `select`, `order`, filtros `eq.`/`gt.`/`in.()`/`is.null` e `limit`/`offset`.
+- `PATCH /rest/v1/<tabela>`: update das linhas que passam nos mesmos filtros.
+
+    python -m benchmarks.servidor_fake --imoveis 10000 --porta 8765
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+CATEGORIAS = ("Apartamento", "Casa", "Sala Comercial", "Terreno", "Cobertura")
+BAIRROS = ("Centro", "Batel", "Água Verde", "Bigorrilho", "Portão", "Cabral", "Juvevê")
+STATUS = ("Venda", "Aluguel", "Venda e Aluguel", "Suspenso", "Vendido")
+ASSUNTOS = ("Visita", "Proposta", "Ligação", "Atualização de preço", "Anúncio")
+ETAPAS = ("Lead", "Captação", "Visita", "Proposta", "Fechamento")
+STATUS_NEGOCIO = ("Em aberto", "Ganho", "Perdido")
+
+
+@dataclass
+class ConfigFake:
+    imoveis: int = 1000
+    latencia_ms: float = 20.0
+    variacao_ms: float = 10.0
+    prob_429: float = 0.0
+    retry_after: int = 0
+    semente: int = 42
+    negocios: int = 500
+
+
+def gerar_catalogo(n: int, semente: int = 42) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """Gera `n` imóveis determinísticos e seus prontuários (1 em cada 5 imóveis não tem nenhum)."""
+    rnd = random.Random(semente)
+    base = datetime(2024, 1, 1)
+    imoveis: List[Dict[str, Any]] = []
+    prontuarios: Dict[str, Dict[str, Any]] = {}
+    proximo_prontuario = 1
+    for i in range(1, n + 1):
+        codigo = str(i)
+        atualizado = base + timedelta(minutes=rnd.randint(0, 60 * 24 * 600))
+        imoveis.append(
+            {
+                "Codigo": codigo,
+                "Categoria": rnd.choice(CATEGORIAS),
+                "Bairro": rnd.choice(BAIRROS),
+                "Status": rnd.choice(STATUS),
+                "Orulo": rnd.choice(("Sim", "Nao")),
+                "ExibirNoSite": rnd.choice(("Sim", "Nao")),
+                "DataCadastro": (base - timedelta(days=rnd.randint(0, 2000))).strftime("%Y-%m-%d"),
+                "DataDeAtivacao": rnd.choice(("0000-00-00", atualizado.strftime("%Y-%m-%d"))),
+                "DataAtualizacao": atualizado.strftime("%Y-%m-%d"),
+                "DataHoraAtualizacao": atualizado.strftime("%Y-%m-%d %H:%M:%S"),
+                "PendenteProntuario": rnd.choice(("Sim", "Nao")),
+            }
+        )
+        if i % 5 == 0:
+            continue
+        itens: Dict[str, Any] = {}
+        for _ in range(rnd.randint(1, 6)):
+            data = atualizado - timedelta(days=rnd.randint(0, 300))
+            itens[str(proximo_prontuario)] = {
+                "Codigo": str(proximo_prontuario),
+                "Data": data.strftime("%Y-%m-%d"),
+                "Hora": f"{rnd.randint(8, 19):02d}:{rnd.randint(0, 59):02d}:00",
+                "Assunto": rnd.choice(ASSUNTOS),
+                "Texto": "Contato com cliente. " * rnd.randint(1, 20),
+                "Pendente": rnd.choice(("Sim", "Nao")),
+                "Bairro": imoveis[-1]["Bairro"],
+                "Anunciado": rnd.choice(("Sim", "Nao")),
+                "Corretor": f"Corretor {rnd.randint(1, 40)}",
+                "PROPOSTA": rnd.choice(("Sim", "Nao")),
+                "Status": imoveis[-1]["Status"],
+                "Datainicio": rnd.choice(("0000-00-00", data.strftime("%Y-%m-%d"))),
+                "ValorProposta": str(rnd.randint(100, 3000) * 1000),
+                "ValorBatido": rnd.choice(("", str(rnd.randint(100, 3000) * 1000))),
+                "Privado": rnd.choice(("Sim", "Nao")),
+                "CodigoCorretor": str(rnd.randint(1, 40)),
+            }
+            proximo_prontuario += 1
+        prontuarios[codigo] = itens
+    return imoveis, prontuarios
+
+
+def _aplica_filtro(imoveis: List[Dict[str, Any]], filtro: Dict[str, Any]) -> List[Dict[str, Any]]:
+    for campo, valor in (filtro or {}).items():
+        if isinstance(valor, list) and len(valor) == 2 and campo.startswith("Data"):
+            inicio, fim = str(valor[0]), str(valor[1])
+            imoveis = [im for im in imoveis if inicio <= str(im.get(campo, "")) <= fim]
+        elif isinstance(valor, list):
+            aceitos = {str(v) for v in valor}
+            imoveis = [im for im in imoveis if str(im.get(campo)) in aceitos]
+        else:
+            imoveis = [im for im in imoveis if str(im.get(campo)) == str(valor)]
+    return imoveis
+
+
+def gerar_negocios(n: int, semente: int = 42, hoje: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Gera `n` negócios determinísticos com `DataInicial` nos 60 dias até `hoje`, em ordem de data."""
+    rnd = random.Random(semente)
+    hoje = (hoje or datetime.now()).replace(hour=23, minute=59, second=0, microsecond=0)
+    negocios = [
+        {
+            "Codigo": str(i),
+            "DataInicial": (hoje - timedelta(minutes=rnd.randint(0, 60 * 24 * 60))).strftime("%Y-%m-%d %H:%M:%S"),
+            "NomeEtapa": rnd.choice(ETAPAS),
+            "Status": rnd.choice(STATUS_NEGOCIO),
+            "ValorNegocio": str(rnd.randint(100, 3000) * 1000),
+        }
+        for i in range(1, n + 1)
+    ]
+    return sorted(negocios, key=lambda n: n["DataInicial"])
+
+
+class EstadoFake:
+    """Catálogo, tabelas do Supabase em memória e contadores do servidor."""
+
+    def __init__(self, config: ConfigFake) -> None:
+        self.config = config
+        self.imoveis, self.prontuarios = gerar_catalogo(config.imoveis, config.semente)
+        self.negocios = gerar_negocios(config.negocios, config.semente)
+        self.rnd = random.Random(config.semente + 1)
+        self.lock = threading.Lock()
+        self.tabelas: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.contadores: Dict[str, int] = {}
+        # A tabela `imoveis` começa populada, como em produção
+        self.tabelas["imoveis"] = {
+            im["Codigo"]: {"codigo": im["Codigo"], "codigoimovel": im["Codigo"]} for im in self.imoveis
+        }
+
+    def contar(self, chave: str, n: int = 1) -> None:
+        with self.lock:
+            self.contadores[chave] = self.contadores.get(chave, 0) + n
+
+    def upsert(self, tabela: str, linhas: List[Dict[str, Any]], chaves: List[str]) -> None:
+        with self.lock:
+            destino = self.tabelas.setdefault(tabela, {})
+            for linha in linhas:
+                chave = "|".join(str(linha.get(c)) for c in chaves) if chaves else json.dumps(linha)
+                destino[chave] = {**destino.get(chave, {}), **linha}
+
+
+class HandlerFake(BaseHTTPRequestHandler):
+    estado: EstadoFake  # definido em `criar_servidor`
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        # Cabeçalho e corpo saem em escritas separadas; sem NODELAY o ACK atrasado soma ~40 ms
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format: str, *args: Any) -> None:  # silencioso
+        return
+
+    def _responder(self, status: int, corpo: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(dados)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _simula_rede(self) -> bool:
+        """Aplica latência e, com probabilidade `prob_429`, responde 429. Retorna True se limitou."""
+        cfg = self.estado.config
+        atraso = max(0.0, cfg.latencia_ms + self.estado.rnd.uniform(-cfg.variacao_ms, cfg.variacao_ms))
+        time.sleep(atraso / 1000.0)
+        if cfg.prob_429 and self.estado.rnd.random() < cfg.prob_429:
+            self.estado.contar("429")
+            self._responder(
+                429, {"status": 429, "message": "Too many connections"}, {"Retry-After": str(cfg.retry_after)}
+            )
+            return True
+        return False
+
+    # ---------------- Vista ----------------
+
+    def _listar(self, query: Dict[str, List[str]], itens: Optional[List[Dict[str, Any]]] = None) -> None:
+        pesquisa = json.loads(query.get("pesquisa", ["{}"])[0])
+        paginacao = pesquisa.get("paginacao") or {}
+        pagina = int(paginacao.get("pagina", 1))
+        quantidade = min(int(paginacao.get("quantidade", 50)), 50)
+        campos = pesquisa.get("fields") or ["Codigo"]
+        simples = [c for c in campos if isinstance(c, str)]
+        aninhados = [c for c in campos if isinstance(c, dict)]
+
+        selecionados = _aplica_filtro(
+            self.estado.imoveis if itens is None else itens, pesquisa.get("filter") or {}
+        )
+        total = len(selecionados)
+        paginas = max(1, -(-total // quantidade))
+        resposta: Dict[str, Any] = {}
+        for im in selecionados[(pagina - 1) * quantidade : pagina * quantidade]:
+            item = {c: im.get(c) for c in simples}
+            for campo in aninhados:
+                if "prontuarios" in campo:
+                    item["prontuarios"] = self.estado.prontuarios.get(im["Codigo"], {})
+            resposta[im["Codigo"]] = item
+        if query.get("showtotal", ["0"])[0] == "1":
+            resposta.update({"total": total, "paginas": paginas, "pagina": pagina, "quantidade": quantidade})
+        self.estado.contar("listar" if itens is None else "negocios")
+        self._responder(200, resposta)
+
+    def _detalhes(self, query: Dict[str, List[str]]) -> None:
+        codigo = query.get("imovel", [""])[0]
+        self.estado.contar("detalhes")
+        itens = self.estado.prontuarios.get(codigo)
+        if not itens:
+            self._responder(400, {"status": 400, "message": "Imóvel não possui prontuarios"})
+            return
+        self._responder(200, {"Codigo": codigo, "prontuarios": itens})
+
+    # ---------------- PostgREST ----------------
+
+    def _filtrar(self, tabela: str, query: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        linhas = list(self.estado.tabelas.get(tabela, {}).values())
+        for coluna, valores in query.items():
+            if coluna in ("select", "order", "limit", "offset", "on_conflict"):
+                continue
+            op, _, valor = valores[0].partition(".")
+            if op == "eq":
+                linhas = [r for r in linhas if str(r.get(coluna)) == valor]
+            elif op == "gt":
+                linhas = [r for r in linhas if str(r.get(coluna)) > valor]
+            elif op == "in":
+                aceitos = set(valor.strip("()").split(","))
+                linhas = [r for r in linhas if str(r.get(coluna)) in aceitos]
+            elif op == "is" and valor == "null":
+                linhas = [r for r in linhas if r.get(coluna) is None]
+        return linhas
+
+    def _select(self, tabela: str, query: Dict[str, List[str]]) -> None:
+        linhas = self._filtrar(tabela, query)
+        if "order" in query:
+            coluna, _, direcao = query["order"][0].partition(".")
+            linhas.sort(key=lambda r: str(r.get(coluna)), reverse=direcao.startswith("desc"))
+        inicio = int(query.get("offset", ["0"])[0])
+        limite = int(query["limit"][0]) if "limit" in query else len(linhas)
+        linhas = linhas[inicio : inicio + limite]
+        if "select" in query and query["select"][0] != "*":
+            colunas = query["select"][0].split(",")
+            linhas = [{c: r.get(c) for c in colunas} for r in linhas]
+        self.estado.contar(f"select:{tabela}")
+        self._responder(200, linhas)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.startswith("/rest/v1/"):
+            self._select(url.path.rsplit("/", 1)[-1], query)
+            return
+        if self._simula_rede():
+            return
+        if url.path.endswith("/imoveis/listar"):
+            self._listar(query)
+        elif url.path.endswith("/imoveis/detalhes"):
+            self._detalhes(query)
+        elif url.path.endswith("/negocios/listar"):
+            self._listar(query, self.estado.negocios)
+        else:
+            self._responder(404, {"status": 404, "message": "rota desconhecida"})
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        if not url.path.startswith("/rest/v1/"):
+            self._responder(404, {"message": "rota desconhecida"})
+            return
+        tamanho = int(self.headers.get("Content-Length", "0"))
+        corpo = json.loads(self.rfile.read(tamanho) or b"[]")
+        linhas = corpo if isinstance(corpo, list) else [corpo]
+        tabela = url.path.rsplit("/", 1)[-1]
+        on_conflict = parse_qs(url.query).get("on_conflict", [""])[0]
+        chaves = [c for c in on_conflict.split(",") if c] or (
+            ["codigo_imovel", "codigo_prontuario"] if tabela == "imovel_prontuario" else ["codigo"]
+        )
+        self.estado.upsert(tabela, linhas, chaves)
+        self.estado.contar(f"upsert:{tabela}")
+        self.estado.contar(f"linhas:{tabela}", len(linhas))
+        self._responder(201, linhas)
+
+    def do_PATCH(self) -> None:
+        url = urlparse(self.path)
+        if not url.path.startswith("/rest/v1/"):
+            self._responder(404, {"message": "rota desconhecida"})
+            return
+        tamanho = int(self.headers.get("Content-Length", "0"))
+        valores = json.loads(self.rfile.read(tamanho) or b"{}")
+        tabela = url.path.rsplit("/", 1)[-1]
+        with self.estado.lock:
+            linhas = self._filtrar(tabela, parse_qs(url.query))
+            for linha in linhas:  # as linhas são as da tabela: atualiza no lugar
+                linha.update(valores)
+        self.estado.contar(f"update:{tabela}")
+        self._responder(200, linhas)
+
+
+def criar_servidor(config: ConfigFake, porta: int = 0) -> Tuple[ThreadingHTTPServer, EstadoFake]:
+    """Cria o servidor (porta 0 = escolhida pelo SO). Use `serve_forever` em uma thread."""
+    estado = EstadoFake(config)
+    handler = type("HandlerConfigurado", (HandlerFake,), {"estado": estado})
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), handler)
+    servidor.daemon_threads = True
+    return servidor, estado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor fake da API Vista + PostgREST.")
+    parser.add_argument("--imoveis", type=int, default=1000)
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    parser.add_argument("--prob-429", type=float, default=0.0)
+    args = parser.parse_args()
+    srv, _ = criar_servidor(
+        ConfigFake(imoveis=args.imoveis, latencia_ms=args.latencia_ms, prob_429=args.prob_429), args.porta
+    )
+    print(f"Servindo em http://127.0.0.1:{srv.server_address[1]} (Ctrl-C para sair)")
+    srv.serve_forever()
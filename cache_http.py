@@ -0,0 +1,305 @@
+"""
+Cache em disco das respostas da API Vista, com gravação e reprodução (record/replay).
+
+`instalar_cache(session)` envolve os adapters da sessão (com os retries deles) por um que
+consulta o cache antes da rede. A chave é o método mais a URL com a `pesquisa` normalizada
+(JSON com chaves ordenadas) e um hash da `key` da API no lugar dela: a mesma consulta com os
+campos em outra ordem de serialização é o mesmo item, mas cada chave da API tem as suas
+respostas (o cache nunca entrega a uma chave o que foi respondido a outra, e a chave em si
+não vai para o disco). Os corpos ficam comprimidos
+(zlib) em SQLite, com validade (`CACHE_HTTP_TTL_SEGUNDOS`) e tamanho máximo
+(`CACHE_HTTP_MAX_BYTES`, descartando os itens usados há mais tempo).
+
+Modos (`CACHE_HTTP`):
+
+- vazio: desativado (padrão);
+- `cache`: responde do cache enquanto válido e grava as respostas novas;
+- `gravar`: sempre consulta a API e grava as respostas (ignora a validade);
+- `reproduzir`: só responde do cache, sem rede e sem validade; consultas não gravadas
+  levantam `RespostaNaoGravada`.
+
+São guardadas só as respostas 2xx cujo corpo não é um erro da API (`{"status", "message"}`,
+"too many connections") e o 400 "sem prontuários" dos detalhes, que é estável. Erros de
+autenticação, limites e falhas passageiras não são gravados: não podem ser reproduzidos depois.
+
+    session = instalar_cache(requests.Session())
+    if em_cache(session, url, params):
+        ...  # resposta local: dispensa o limitador de taxa
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from decodificacao_json import resumo_corpo
+from instrumentacao import METRICAS
+
+MODOS = ("cache", "gravar", "reproduzir")
+PARAMETROS_SECRETOS = frozenset({"key"})  # entram na chave do cache só como hash (nunca no disco)
+# O corpo é guardado já decodificado: estes cabeçalhos deixariam de valer
+CABECALHOS_IGNORADOS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"})
+NIVEL_COMPRESSAO = 6
+LIMITE_CORPO_ERRO = 64 * 1024  # respostas de erro da API são pequenas: corpos maiores não são examinados
+
+Salvo = Tuple[int, Dict[str, str], bytes]  # (status, cabeçalhos, corpo)
+
+
+class RespostaNaoGravada(requests.ConnectionError):
+    """Consulta sem resposta gravada no modo `reproduzir` (não há rede para buscá-la)."""
+
+
+# Configuração lida na chamada (depois do `load_dotenv` dos scripts)
+def modo_cache() -> str:
+    modo = os.getenv("CACHE_HTTP", "").strip().lower()
+    if modo and modo not in MODOS:
+        raise ValueError(f"CACHE_HTTP inválido: {modo!r} (use {', '.join(MODOS)} ou vazio)")
+    return modo
+
+
+def erro_api(corpo: bytes) -> bool:
+    """True se o corpo é um erro da API Vista (`{"status": ..., "message": ...}` ou "too many connections")."""
+    if "too many connections" in resumo_corpo(corpo).lower():
+        return True
+    if len(corpo) > LIMITE_CORPO_ERRO:
+        return False
+    try:
+        dados = json.loads(corpo)
+    except ValueError:
+        return False
+    return isinstance(dados, dict) and "status" in dados and "message" in dados
+
+
+def cacheavel(status: int, corpo: bytes) -> bool:
+    """2xx sem erro da API no corpo, ou o 400 "Imóvel não possui prontuarios" dos detalhes."""
+    if 200 <= status < 300:
+        return not erro_api(corpo)
+    return status == 400 and "prontuarios" in resumo_corpo(corpo).lower()
+
+
+def chave_requisicao(metodo: str, url: str) -> Tuple[str, str]:
+    """
+    (hash, url normalizada) da requisição: parâmetros ordenados, `key` trocada pelo hash dela e
+    `pesquisa` reserializada com chaves ordenadas.
+    """
+    partes = urlsplit(url)
+    parametros = []
+    for nome, valor in parse_qsl(partes.query, keep_blank_values=True):
+        if nome in PARAMETROS_SECRETOS:
+            valor = "sha256:" + hashlib.sha256(valor.encode("utf-8")).hexdigest()[:16]
+        if nome == "pesquisa":
+            try:
+                valor = json.dumps(json.loads(valor), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+            except ValueError:
+                pass
+        parametros.append((nome, valor))
+    normalizada = f"{partes.scheme}://{partes.netloc}{partes.path}?{urlencode(sorted(parametros))}"
+    return hashlib.sha256(f"{metodo.upper()} {normalizada}".encode("utf-8")).hexdigest(), normalizada
+
+
+class CacheHTTP:
+    """Respostas gravadas (SQLite), com validade e descarte LRU por tamanho."""
+
+    def __init__(self, caminho: str, ttl: float = 3600.0, max_bytes: int = 512 * 1024 * 1024) -> None:
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS resposta (
+                chave TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                cabecalhos TEXT NOT NULL,
+                corpo BLOB NOT NULL,
+                tamanho INTEGER NOT NULL,
+                gravado_em REAL NOT NULL,
+                usado_em REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_resposta_usado_em ON resposta (usado_em)")
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self._ultimo_commit = time.monotonic()
+        self.tamanho = self.conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM resposta").fetchone()[0]
+
+    def buscar(self, chave: str, validade: Optional[float] = None) -> Optional[Salvo]:
+        """Resposta gravada (None se ausente ou gravada há mais de `validade` segundos)."""
+        agora = time.time()
+        with self._lock:
+            linha = self.conn.execute(
+                "SELECT status, cabecalhos, corpo, gravado_em FROM resposta WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha is None or (validade is not None and agora - linha[3] > validade):
+                return None
+            self.conn.execute("UPDATE resposta SET usado_em = ? WHERE chave = ?", (agora, chave))
+            if time.monotonic() - self._ultimo_commit >= 1.0:  # o uso é só para o LRU: commits agrupados
+                self._commit()
+        return linha[0], json.loads(linha[1]), zlib.decompress(linha[2])
+
+    def contem(self, chave: str, validade: Optional[float] = None) -> bool:
+        with self._lock:
+            linha = self.conn.execute("SELECT gravado_em FROM resposta WHERE chave = ?", (chave,)).fetchone()
+        return linha is not None and (validade is None or time.time() - linha[0] <= validade)
+
+    def gravar(self, chave: str, url: str, status: int, cabecalhos: Mapping[str, str], corpo: bytes) -> None:
+        comprimido = zlib.compress(corpo, NIVEL_COMPRESSAO)
+        cabecalhos = {k: v for k, v in cabecalhos.items() if k.lower() not in CABECALHOS_IGNORADOS}
+        agora = time.time()
+        with self._lock:
+            anterior = self.conn.execute("SELECT tamanho FROM resposta WHERE chave = ?", (chave,)).fetchone()
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO resposta (chave, url, status, cabecalhos, corpo, tamanho, gravado_em, usado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (chave, url, status, json.dumps(cabecalhos), comprimido, len(comprimido), agora, agora),
+            )
+            self.tamanho += len(comprimido) - (anterior[0] if anterior else 0)
+            self._descartar()
+            self._commit()
+
+    def _descartar(self) -> None:
+        """Apaga os itens usados há mais tempo até o cache caber em `max_bytes` (com o lock)."""
+        while self.tamanho > self.max_bytes:
+            antigos = self.conn.execute(
+                "SELECT chave, tamanho FROM resposta ORDER BY usado_em LIMIT 256"
+            ).fetchall()
+            if not antigos:
+                self.tamanho = 0
+                return
+            for chave, tamanho in antigos:
+                if self.tamanho <= self.max_bytes:
+                    break
+                self.conn.execute("DELETE FROM resposta WHERE chave = ?", (chave,))
+                self.tamanho -= tamanho
+                METRICAS.contar("cache_http_descartes_total")
+
+    def limpar_expirados(self) -> int:
+        """Apaga os itens gravados há mais de `ttl` segundos; retorna quantos."""
+        with self._lock:
+            limite = time.time() - self.ttl
+            cursor = self.conn.execute("DELETE FROM resposta WHERE gravado_em < ?", (limite,))
+            self.tamanho = self.conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM resposta").fetchone()[0]
+            self._commit()
+            return cursor.rowcount
+
+    def _commit(self) -> None:
+        self.conn.commit()
+        self._ultimo_commit = time.monotonic()
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._commit()
+            self.conn.close()
+
+
+class AdaptadorCache(BaseAdapter):
+    """Adapter que responde GETs do cache e delega o resto (e as faltas) ao adapter original."""
+
+    def __init__(self, interno: BaseAdapter, cache: CacheHTTP, modo: str) -> None:
+        super().__init__()
+        self.interno = interno
+        self.cache = cache
+        self.modo = modo
+        # Validade aplicada às respostas gravadas (None = qualquer idade)
+        self.validade: Optional[float] = cache.ttl if modo == "cache" else None
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, **kwargs: Any) -> requests.Response:
+        if request.method != "GET":
+            return self.interno.send(request, stream=stream, **kwargs)
+        chave, url = chave_requisicao(request.method, request.url)
+        if self.modo != "gravar":
+            salvo = self.cache.buscar(chave, self.validade)
+            if salvo is not None:
+                METRICAS.contar("cache_http_total", resultado="acerto")
+                return self._resposta(request, *salvo)
+            if self.modo == "reproduzir":
+                METRICAS.contar("cache_http_total", resultado="ausente")
+                raise RespostaNaoGravada(f"Resposta não gravada no cache: {url}", request=request)
+        resp = self.interno.send(request, stream=stream, **kwargs)
+        # Lê o corpo (2xx/400) para examiná-lo e gravá-lo; quem pediu `stream=True` recebe os mesmos bytes
+        status = resp.status_code
+        if (200 <= status < 300 or status == 400) and cacheavel(status, resp.content):
+            self.cache.gravar(chave, url, resp.status_code, resp.headers, resp.content)
+            METRICAS.contar("cache_http_total", resultado="gravada")
+        else:
+            METRICAS.contar("cache_http_total", resultado="nao_cacheavel")
+        return resp
+
+    @staticmethod
+    def _resposta(request: requests.PreparedRequest, status: int, cabecalhos: Dict[str, str], corpo: bytes) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = status
+        resp.headers = CaseInsensitiveDict(cabecalhos)
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp.url = request.url
+        resp.request = request
+        resp.reason = "cache"
+        resp._content = corpo  # corpo já lido: `content`, `text` e `iter_content` usam estes bytes
+        resp._content_consumed = True
+        return resp
+
+    def close(self) -> None:
+        self.interno.close()
+
+
+_CACHES: Dict[str, CacheHTTP] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def abrir_cache(caminho: Optional[str] = None) -> CacheHTTP:
+    """Cache do processo em `caminho` (padrão `ARQUIVO_CACHE_HTTP`), compartilhado pelas sessões."""
+    caminho = caminho or os.getenv("ARQUIVO_CACHE_HTTP", ".vista_cache_http.sqlite")
+    with _CACHES_LOCK:
+        cache = _CACHES.get(caminho)
+        if cache is None:
+            cache = _CACHES[caminho] = CacheHTTP(
+                caminho,
+                ttl=float(os.getenv("CACHE_HTTP_TTL_SEGUNDOS", "3600")),
+                max_bytes=int(os.getenv("CACHE_HTTP_MAX_BYTES", str(512 * 1024 * 1024))),
+            )
+            if modo_cache() == "cache":
+                cache.limpar_expirados()
+            atexit.register(cache.fechar)
+        return cache
+
+
+def instalar_cache(session: requests.Session, modo: Optional[str] = None) -> requests.Session:
+    """Envolve os adapters de `session` pelo cache no `modo` (padrão `CACHE_HTTP`; vazio não muda nada)."""
+    modo = modo_cache() if modo is None else modo
+    if not modo:
+        return session
+    cache = abrir_cache()
+    for prefixo, adapter in list(session.adapters.items()):
+        if not isinstance(adapter, AdaptadorCache):
+            session.mount(prefixo, AdaptadorCache(adapter, cache, modo))
+    return session
+
+
+def em_cache(session: requests.Session, url: str, params: Optional[Mapping[str, Any]] = None) -> bool:
+    """
+    True se o GET de `url` com `params` será respondido pelo cache da sessão, sem rede: quem
+    chama pode dispensar o limitador de taxa.
+    """
+    adapter = session.get_adapter(url)
+    if not isinstance(adapter, AdaptadorCache) or adapter.modo == "gravar":
+        return False
+    preparada = requests.Request("GET", url, params=params).prepare()
+    return adapter.cache.contem(chave_requisicao("GET", preparada.url)[0], adapter.validade)
@@ -0,0 +1,100 @@
+"""
+Checkpoint durável (SQLite) para importações longas de prontuários.
+
+Registra, por imóvel, se os prontuários foram buscados, gravados ou se a importação falhou.
+Permite retomar uma execução interrompida (`--resume`) e reprocessar só os códigos com falha.
+
+As escritas usam WAL com `synchronous=NORMAL` e commits agrupados (a cada `commit_cada`
+operações ou `commit_segundos`), então marcar cada imóvel custa microssegundos.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Set
+
+BUSCADO = "buscado"
+GRAVADO = "gravado"
+FALHOU = "falhou"
+
+
+class CheckpointProntuarios:
+    """Estado por imóvel da última execução do importador de prontuários."""
+
+    def __init__(self, caminho: str, commit_cada: int = 200, commit_segundos: float = 2.0) -> None:
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS imovel_checkpoint (
+                codigo TEXT PRIMARY KEY,
+                estado TEXT NOT NULL,
+                erro TEXT,
+                atualizado_em TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+        self.commit_cada = commit_cada
+        self.commit_segundos = commit_segundos
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._ultimo_commit = time.monotonic()
+
+    def reiniciar(self) -> None:
+        """Descarta o checkpoint anterior (execução nova, sem `--resume`)."""
+        with self._lock:
+            self.conn.execute("DELETE FROM imovel_checkpoint")
+            self.conn.commit()
+
+    def _marcar(self, codigos: Iterable[str], estado: str, erro: Optional[str] = None) -> None:
+        agora = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            cur = self.conn.executemany(
+                """
+                INSERT INTO imovel_checkpoint (codigo, estado, erro, atualizado_em)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(codigo) DO UPDATE SET
+                    estado = excluded.estado, erro = excluded.erro, atualizado_em = excluded.atualizado_em
+                """,
+                [(codigo, estado, erro, agora) for codigo in codigos],
+            )
+            self._pendentes += cur.rowcount
+            if (
+                self._pendentes >= self.commit_cada
+                or time.monotonic() - self._ultimo_commit >= self.commit_segundos
+            ):
+                self._commit()
+
+    def _commit(self) -> None:
+        self.conn.commit()
+        self._pendentes = 0
+        self._ultimo_commit = time.monotonic()
+
+    def marcar_buscado(self, codigo: str) -> None:
+        self._marcar([codigo], BUSCADO)
+
+    def marcar_gravados(self, codigos: Iterable[str]) -> None:
+        self._marcar(codigos, GRAVADO)
+
+    def marcar_falhos(self, codigos: Iterable[str], erro: str) -> None:
+        self._marcar(codigos, FALHOU, erro[:500])
+
+    def codigos(self, estado: str) -> Set[str]:
+        with self._lock:
+            cur = self.conn.execute("SELECT codigo FROM imovel_checkpoint WHERE estado = ?", (estado,))
+            return {codigo for (codigo,) in cur}
+
+    def pendentes(self, codigos: Iterable[str]) -> Iterator[str]:
+        """Filtra, sob demanda, os códigos já gravados (modo `--resume`)."""
+        gravados = self.codigos(GRAVADO)
+        return (codigo for codigo in codigos if codigo not in gravados)
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._commit()
+            self.conn.close()
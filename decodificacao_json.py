@@ -0,0 +1,197 @@
+"""
+Decodificação das respostas JSON da API Vista.
+
+- `carregar(conteudo)`: usa `orjson` quando instalado (`pip install orjson`) e o `json` da
+  biblioteca padrão caso contrário. `JSON_BACKEND=json` força a biblioteca padrão.
+- `LeitorPagina`: itera os imóveis de uma página da listagem
+  (`{"<codigo>": {...}, ..., "total": N, "paginas": N, "pagina": N, "quantidade": N}`),
+  separando os valores escalares do topo (paginação, `status`/`message` de erro) em
+  `metadados`. Com `LISTAGEM_STREAMING=1` a resposta é lida em blocos e cada imóvel é
+  decodificado assim que termina de chegar, sem montar o dict da página inteira (memória
+  limitada e decodificação sobreposta ao download); senão o corpo é decodificado de uma vez
+  com `carregar`, que gasta menos CPU (ver `benchmarks/decodificacao.py`).
+
+    with session.get(url, params=params, stream=True, timeout=25) as resp:
+        leitor = LeitorPagina.da_resposta(resp)
+        itens = [imovel for _, imovel in leitor]
+    total_paginas = int(leitor.metadados.get("paginas", 1))
+"""
+
+from __future__ import annotations
+
+import codecs
+import itertools
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:  # dependência opcional
+    import orjson
+except ImportError:
+    orjson = None
+
+TAMANHO_BLOCO = 64 * 1024  # bytes lidos por vez da resposta em streaming
+CHAVES_PAGINACAO = frozenset({"total", "paginas", "pagina", "quantidade"})
+
+_SCANNER = json.JSONDecoder().scan_once  # scanner em C do `json` padrão
+_ESPACOS = re.compile(r"[ \t\n\r]*")
+# Chave do topo até o início do valor: `"123":` (primeira) e `, "123":` (seguintes)
+_CHAVE = r'"([^"\\]*(?:\\.[^"\\]*)*)"[ \t\n\r]*:[ \t\n\r]*'
+_PRIMEIRA_CHAVE = re.compile(r"[ \t\n\r]*" + _CHAVE)
+_PROXIMA_CHAVE = re.compile(r"[ \t\n\r]*,[ \t\n\r]*" + _CHAVE)
+
+
+# Configuração lida na chamada (depois do `load_dotenv` dos scripts)
+def backend_json() -> str:
+    return os.getenv("JSON_BACKEND", "orjson" if orjson else "json").strip().lower()
+
+
+def listagem_streaming() -> bool:
+    return os.getenv("LISTAGEM_STREAMING", "0") == "1"
+
+
+def carregar(conteudo: Union[bytes, str]) -> Any:
+    """Decodifica um corpo JSON inteiro com o backend configurado (`JSON_BACKEND`)."""
+    if orjson is not None and backend_json() == "orjson":
+        return orjson.loads(conteudo)
+    return json.loads(conteudo)
+
+
+def resumo_corpo(conteudo: Union[bytes, str], limite: int = 1000) -> str:
+    """Trecho inicial do corpo (mensagens de erro e detecção de "too many connections")."""
+    if isinstance(conteudo, bytes):
+        conteudo = conteudo[:limite].decode("utf-8", errors="replace")
+    return conteudo[:limite]
+
+
+class LeitorPagina:
+    """
+    Itera `(chave, item)` dos objetos do topo de uma página.
+
+    Criado com `blocos`, localiza as chaves do topo por expressão regular e decodifica cada
+    item pelo scanner em C do `json` padrão; só o imóvel corrente e o bloco em leitura ficam
+    em memória. Criado com
+    `corpo`, decodifica o corpo inteiro com `carregar`. `inicio` guarda o começo do corpo e
+    `bytes_lidos` o tamanho lido da resposta.
+    JSON inválido ou truncado levanta `ValueError`.
+    """
+
+    def __init__(self, blocos: Iterable[Union[bytes, str]] = (), corpo: Optional[bytes] = None) -> None:
+        self._blocos = iter(blocos)
+        self._corpo = corpo
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._fim = False
+        self.inicio = ""
+        self.bytes_lidos = len(corpo) if corpo is not None else 0
+        self.metadados: Dict[str, Any] = {}
+
+    @classmethod
+    def da_resposta(cls, resp: Any, streaming: Optional[bool] = None) -> "LeitorPagina":
+        """Leitor do corpo de `resp` (pedida com `stream=True`), em blocos ou de uma vez."""
+        if listagem_streaming() if streaming is None else streaming:
+            blocos = resp.iter_content(TAMANHO_BLOCO)
+            primeiro = next(blocos, b"")
+            leitor = cls(itertools.chain((primeiro,), blocos))
+        else:
+            primeiro = resp.content
+            leitor = cls(corpo=primeiro)
+        leitor.inicio = resumo_corpo(primeiro)
+        return leitor
+
+    def _ler(self, minimo: int) -> None:
+        """Acrescenta ao buffer ao menos `minimo` caracteres (ou o que restar da resposta)."""
+        partes: List[str] = []
+        lidos = 0
+        for bloco in self._blocos:
+            self.bytes_lidos += len(bloco)
+            texto = self._utf8.decode(bloco) if isinstance(bloco, bytes) else bloco
+            partes.append(texto)
+            lidos += len(texto)
+            if lidos >= minimo:
+                break
+        else:
+            self._fim = True
+            partes.append(self._utf8.decode(b"", final=True))
+        # Descarta o trecho já consumido
+        self._buf = self._buf[self._pos :] + "".join(partes)
+        self._pos = 0
+
+    def _proximo(self) -> str:
+        """Pula espaços e devolve o próximo caractere ("" no fim da resposta)."""
+        while True:
+            self._pos = _ESPACOS.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if self._fim:
+                return ""
+            self._ler(TAMANHO_BLOCO)
+
+    def _ler_mais(self) -> None:
+        # Dobra o trecho pendente a cada tentativa: custo linear mesmo com itens grandes
+        self._ler(max(TAMANHO_BLOCO, len(self._buf) - self._pos))
+
+    def _casar(self, padrao: "re.Pattern[str]") -> Optional["re.Match[str]"]:
+        """Casa `padrao` na posição atual, lendo mais blocos enquanto o trecho puder estar incompleto."""
+        while True:
+            casamento = padrao.match(self._buf, self._pos)
+            if self._fim or (casamento is not None and casamento.end() < len(self._buf)):
+                return casamento
+            self._ler_mais()
+
+    def _valor(self) -> Any:
+        """Decodifica o valor JSON na posição atual, lendo mais blocos se ele estiver incompleto."""
+        while True:
+            try:
+                valor, fim = _SCANNER(self._buf, self._pos)
+            except (StopIteration, json.JSONDecodeError) as e:
+                if self._fim:
+                    raise ValueError(f"JSON inválido na página (posição {self._pos}): {e!r}") from None
+            else:
+                # Um número colado no fim do buffer pode continuar no próximo bloco
+                if fim < len(self._buf) or self._fim:
+                    self._pos = fim
+                    return valor
+            self._ler_mais()
+
+    def _esperar(self, caractere: str) -> None:
+        encontrado = self._proximo()
+        if encontrado != caractere:
+            trecho = self._buf[self._pos : self._pos + 200]
+            raise ValueError(f"JSON inesperado na página: esperado {caractere!r}, encontrado {trecho!r}")
+        self._pos += 1
+
+    def _separar(self, chave: str, valor: Any) -> bool:
+        """True para itens; valores escalares e de paginação vão para `metadados`."""
+        if isinstance(valor, dict) and chave not in CHAVES_PAGINACAO:
+            return True
+        self.metadados[chave] = valor
+        return False
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        if self._corpo is not None:
+            dados = carregar(self._corpo)
+            if not isinstance(dados, dict):
+                raise ValueError(f"JSON inesperado na página: {self.inicio[:200]!r}")
+            for chave, valor in dados.items():
+                if self._separar(chave, valor):
+                    yield chave, valor
+            return
+
+        self._esperar("{")
+        padrao = _PRIMEIRA_CHAVE
+        while True:
+            casamento = self._casar(padrao)
+            if casamento is None:
+                self._esperar("}")
+                return
+            chave = casamento.group(1)
+            if "\\" in chave:
+                chave = json.loads(f'"{chave}"')
+            self._pos = casamento.end()
+            valor = self._valor()
+            if self._separar(chave, valor):
+                yield chave, valor
+            padrao = _PROXIMA_CHAVE
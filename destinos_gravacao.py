@@ -0,0 +1,229 @@
+"""
+Destinos de gravação dos importadores: para onde vão as linhas normalizadas.
+
+- `DestinoSupabase`: upsert via PostgREST (`supabase.table(...).upsert`), o caminho original.
+- `DestinoPostgres`: conexão direta ao Postgres. Cada lote é carregado com `COPY` em uma
+  tabela de preparo sem WAL e mesclado na tabela final com um único
+  `INSERT ... ON CONFLICT DO UPDATE`. Evita JSON, HTTP e o parse do PostgREST por linha.
+
+`atualizar` muda colunas de linhas existentes (`UPDATE ... WHERE coluna IN (...)`), sem
+inserir; é o que a reconciliação de exclusões usa para marcar `excluido_em`.
+
+O destino é escolhido por `DESTINO_GRAVACAO` (`supabase` ou `postgres`); o Postgres usa
+`DATABASE_URL` e requer `pip install "psycopg[binary]"`.
+
+    destino = criar_destino(conectar_supabase)
+    with METRICAS.cronometrar(destino.estagio, tabela="imovel_local"):
+        gravadas = destino.gravar("imovel_local", linhas, ["codigo"])
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+Linha = Dict[str, Any]
+
+
+class DestinoGravacao:
+    """Interface de um destino: grava lotes de linhas com upsert pelas colunas `chaves`."""
+
+    estagio = "gravar_lote"  # nome do estágio nas métricas de duração
+
+    def gravar(self, tabela: str, linhas: List[Linha], chaves: Sequence[str]) -> int:
+        """Faz upsert de `linhas` em `tabela` e retorna quantas o banco confirmou. Erros levantam exceção."""
+        raise NotImplementedError
+
+    def atualizar(self, tabela: str, coluna: str, codigos: Sequence[Any], valores: Linha) -> int:
+        """
+        `UPDATE tabela SET valores WHERE coluna IN codigos`; retorna quantas linhas mudaram.
+
+        Diferente de `gravar`, nunca insere: um código ausente da tabela não vira linha parcial.
+        """
+        raise NotImplementedError
+
+    def fechar(self) -> None:
+        pass
+
+
+class DestinoSupabase(DestinoGravacao):
+    """Upsert pelo PostgREST do Supabase."""
+
+    estagio = "supabase_upsert"
+
+    def __init__(self, supabase: Any) -> None:
+        self.supabase = supabase
+
+    def gravar(self, tabela: str, linhas: List[Linha], chaves: Sequence[str]) -> int:
+        res = self.supabase.table(tabela).upsert(linhas, on_conflict=",".join(chaves)).execute()
+        payload = res.model_dump()
+        if payload.get("data") is None:
+            raise RuntimeError(f"resposta inesperada do Supabase: {str(payload)[:500]}")
+        return len(payload["data"])
+
+    def atualizar(self, tabela: str, coluna: str, codigos: Sequence[Any], valores: Linha) -> int:
+        if not codigos:
+            return 0
+        res = self.supabase.table(tabela).update(valores).in_(coluna, list(codigos)).execute()
+        payload = res.model_dump()
+        if payload.get("data") is None:
+            raise RuntimeError(f"resposta inesperada do Supabase: {str(payload)[:500]}")
+        return len(payload["data"])
+
+
+class DestinoPostgres(DestinoGravacao):
+    """
+    Carga direta no Postgres: `COPY` para uma tabela de preparo e merge com `ON CONFLICT`.
+
+    A tabela de preparo é temporária (mesmos tipos das colunas carregadas, sem restrições),
+    logo sem WAL e privada da sessão, o que permite lotes simultâneos sem colisão; é esvaziada
+    a cada commit. Cada thread usa a própria conexão. Linhas repetidas no mesmo lote ficam com
+    a última ocorrência.
+    """
+
+    estagio = "postgres_copy"
+
+    def __init__(self, dsn: str) -> None:
+        try:
+            import psycopg  # noqa: F401
+        except ImportError as exc:  # dependência opcional
+            raise RuntimeError('DESTINO_GRAVACAO=postgres requer: pip install "psycopg[binary]"') from exc
+        self.dsn = dsn
+        self._local = threading.local()
+        self._conexoes: List[Any] = []
+        self._lock = threading.Lock()
+
+    def _conexao(self) -> Any:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            import psycopg
+
+            conn = psycopg.connect(self.dsn)
+            self._local.conn = conn
+            self._local.preparo = {}
+            with self._lock:
+                self._conexoes.append(conn)
+        return conn
+
+    def _tabela_preparo(self, cur: Any, tabela: str, colunas: List[str]) -> str:
+        from psycopg import sql
+
+        chave = (tabela, tuple(colunas))
+        preparo = self._local.preparo.get(chave)
+        if preparo is None:
+            preparo = f"_carga_{tabela}_{zlib.crc32('|'.join(colunas).encode()):08x}"
+            cur.execute(
+                sql.SQL(
+                    "CREATE TEMP TABLE IF NOT EXISTS {} ON COMMIT DELETE ROWS AS SELECT {} FROM {} WITH NO DATA"
+                ).format(
+                    sql.Identifier(preparo),
+                    sql.SQL(", ").join(sql.Identifier(c) for c in colunas),
+                    sql.Identifier(tabela),
+                )
+            )
+            cur.execute(
+                sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS _ordem bigserial").format(sql.Identifier(preparo))
+            )
+            self._local.preparo[chave] = preparo
+        return preparo
+
+    def gravar(self, tabela: str, linhas: List[Linha], chaves: Sequence[str]) -> int:
+        if not linhas:
+            return 0
+        from psycopg import sql
+
+        colunas = list(linhas[0].keys())
+        ident_colunas = sql.SQL(", ").join(sql.Identifier(c) for c in colunas)
+        ident_chaves = sql.SQL(", ").join(sql.Identifier(c) for c in chaves)
+        atualizar = [c for c in colunas if c not in chaves]
+
+        conn = self._conexao()
+        try:
+            with conn.cursor() as cur:
+                preparo = sql.Identifier(self._tabela_preparo(cur, tabela, colunas))
+                with cur.copy(sql.SQL("COPY {} ({}) FROM STDIN").format(preparo, ident_colunas)) as copy:
+                    for linha in linhas:
+                        copy.write_row([linha.get(c) for c in colunas])
+
+                conflito = (
+                    sql.SQL("DO UPDATE SET {}").format(
+                        sql.SQL(", ").join(
+                            sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(c), sql.Identifier(c))
+                            for c in atualizar
+                        )
+                    )
+                    if atualizar
+                    else sql.SQL("DO NOTHING")
+                )
+                cur.execute(
+                    sql.SQL(
+                        "INSERT INTO {tabela} ({colunas}) "
+                        "SELECT DISTINCT ON ({chaves}) {colunas} FROM {preparo} ORDER BY {chaves}, _ordem DESC "
+                        "ON CONFLICT ({chaves}) {conflito}"
+                    ).format(
+                        tabela=sql.Identifier(tabela),
+                        colunas=ident_colunas,
+                        chaves=ident_chaves,
+                        preparo=preparo,
+                        conflito=conflito,
+                    )
+                )
+                gravadas = cur.rowcount
+            conn.commit()
+            return gravadas
+        except Exception:
+            conn.rollback()
+            self._local.preparo.clear()  # um CREATE desfeito pelo rollback precisa ser refeito
+            raise
+
+    def atualizar(self, tabela: str, coluna: str, codigos: Sequence[Any], valores: Linha) -> int:
+        if not codigos:
+            return 0
+        from psycopg import sql
+
+        conn = self._conexao()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    sql.SQL("UPDATE {} SET {} WHERE {} = ANY(%s)").format(
+                        sql.Identifier(tabela),
+                        sql.SQL(", ").join(sql.SQL("{} = %s").format(sql.Identifier(c)) for c in valores),
+                        sql.Identifier(coluna),
+                    ),
+                    [*valores.values(), list(codigos)],
+                )
+                atualizadas = cur.rowcount
+            conn.commit()
+            return atualizadas
+        except Exception:
+            conn.rollback()
+            raise
+
+    def fechar(self) -> None:
+        with self._lock:
+            for conn in self._conexoes:
+                conn.close()
+            self._conexoes.clear()
+
+
+def tipo_destino() -> str:
+    return os.getenv("DESTINO_GRAVACAO", "supabase").strip().lower()
+
+
+def criar_destino(conectar_supabase: Callable[[], Any], tipo: Optional[str] = None) -> DestinoGravacao:
+    """
+    Cria o destino configurado em `DESTINO_GRAVACAO` (ou `tipo`).
+
+    `conectar_supabase` só é chamado quando o destino é o Supabase.
+    """
+    tipo = tipo or tipo_destino()
+    if tipo == "postgres":
+        dsn = os.getenv("DATABASE_URL")
+        if not dsn:
+            raise EnvironmentError("DESTINO_GRAVACAO=postgres requer DATABASE_URL no .env")
+        return DestinoPostgres(dsn)
+    if tipo == "supabase":
+        return DestinoSupabase(conectar_supabase())
+    raise ValueError(f"DESTINO_GRAVACAO desconhecido: {tipo!r} (use 'supabase' ou 'postgres')")
@@ -0,0 +1,294 @@
+"""
+Espelho local (SQLite) do catálogo de imóveis, para responder a action `buscarImoveis` do GPT
+(`gpt/schema.json`) sem consultar a API Vista.
+
+`ImportVistaSupabase.py` grava no espelho cada imóvel que coleta (`listar_imoveis` e a
+sincronização): o JSON do imóvel fica inteiro em `dados` e os campos filtráveis da action
+(`Categoria`, `Bairro`, `Cidade`, `Status` e as datas) ficam também em colunas indexadas.
+
+`pesquisar` aceita o mesmo payload `pesquisa` da API (`fields`, `filter`, `order`,
+`paginacao`) e devolve a resposta no mesmo formato (dict de imóveis por código +
+`total`/`paginas`/`pagina`/`quantidade`). Filtros, como na API Vista:
+
+- `"Bairro": "Centro"`: igualdade;
+- `"Bairro": ["Centro", "Batel"]`: qualquer um dos valores;
+- `"DataAtualizacao": ["2025-01-01", "2025-06-30"]`: intervalo, em datas e campos numéricos;
+- `"ValorVenda": ["<=", 500000]` (`=`, `!=`, `<`, `<=`, `>`, `>=`, `like`): comparação.
+
+Campos fora das colunas indexadas são lidos de `dados` (`json_extract`), então só existem no
+espelho os campos que o importador pede à API (ver `ESPELHO_CAMPOS`).
+
+O importador lista com `showInternal=1`, então o espelho também guarda os imóveis internos
+(`ExibirNoSite` = "Nao"), marcados na coluna `interno`. Como na API, `pesquisar` só os devolve
+com `mostrar_internos=True` (`showInternal=1` na consulta).
+
+    espelho = EspelhoCatalogo(".vista_espelho.sqlite")
+    espelho.gravar(imoveis)
+    espelho.pesquisar({"fields": ["Codigo", "Bairro"], "filter": {"Bairro": ["Centro"]}})
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from decodificacao_json import carregar
+from mapeamento_campos import para_booleano, para_data
+
+QUANTIDADE_MAX = 50  # como a API Vista
+
+# Campo da API -> coluna indexada
+COLUNAS = {
+    "Codigo": "codigo",
+    "Categoria": "categoria",
+    "Bairro": "bairro",
+    "Cidade": "cidade",
+    "Status": "status",
+    "DataCadastro": "datacadastro",
+    "DataAtualizacao": "dataatualizacao",
+    "DataHoraAtualizacao": "datahoraatualizacao",
+    "DataDeAtivacao": "datadeativacao",
+}
+# Índices: um por campo filtrável (já na ordem de chegada, sem ordenar o resultado) e as
+# combinações mais comuns da action, para que filtros combinados não leiam as linhas inteiras.
+# Todos terminam em `interno`, que entra em toda pesquisa sem `showInternal`: a contagem do
+# total fica só no índice. Um índice só de `interno` tomaria o lugar dos filtros por intervalo
+_INDICES_FILTRO = [
+    *((coluna,) for coluna in COLUNAS.values() if coluna != "codigo"),
+    ("categoria", "bairro"),
+    ("cidade", "bairro"),
+    ("status", "categoria", "bairro"),
+]
+INDICES = [(*colunas, "interno") for colunas in _INDICES_FILTRO]
+_DATAS = {campo for campo in COLUNAS if campo.startswith("Data")}
+_NUMERICOS = {"Dormitorios", "Suites", "Vagas", "BanheiroSocialQtd"}
+_PREFIXOS_NUMERICOS = ("Valor", "Area")
+_OPERADORES = {"=": "=", "!=": "!=", "<>": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">=", "like": "LIKE"}
+_NOME_CAMPO = re.compile(r"^\w+$")
+
+
+class ErroPesquisa(ValueError):
+    """Payload `pesquisa` inválido (campo, operador ou paginação)."""
+
+
+def _numerico(campo: str) -> bool:
+    return campo in _NUMERICOS or campo.startswith(_PREFIXOS_NUMERICOS)
+
+
+def _expressao(campo: Any) -> str:
+    """Expressão SQL do campo: coluna indexada ou valor dentro de `dados`."""
+    if not isinstance(campo, str) or not _NOME_CAMPO.match(campo):
+        raise ErroPesquisa(f"Campo inválido na pesquisa: {campo!r}")
+    if campo in COLUNAS:
+        return COLUNAS[campo]
+    expressao = f"json_extract(dados, '$.\"{campo}\"')"
+    return f"CAST({expressao} AS REAL)" if _numerico(campo) else expressao
+
+
+def _interno(im: Dict[str, Any]) -> int:
+    """1 se o imóvel não é exibido no site (a API só o lista com `showInternal=1`)."""
+    return 1 if para_booleano(im.get("ExibirNoSite")) is False else 0
+
+
+# Imóveis gravados antes da coluna `interno`: mesma regra de `_interno`, sobre `dados`
+_INTERNO_SQL = "IFNULL(lower(json_extract(dados, '$.ExibirNoSite')), '') IN ('nao', 'não', 'false', '0')"
+
+
+def _texto(valor: Any) -> Optional[str]:
+    """Valor de coluna indexada como texto (a API devolve tudo como string)."""
+    return None if valor is None or valor == "" else str(valor)
+
+
+class EspelhoCatalogo:
+    """Cópia local dos imóveis coletados, consultável com o payload `pesquisa` da API."""
+
+    def __init__(
+        self,
+        caminho: str,
+        somente_leitura: bool = False,
+        commit_cada: int = 5000,
+        commit_segundos: float = 2.0,
+    ) -> None:
+        # A sincronização grava a partir das threads de normalização
+        if somente_leitura:
+            self.conn = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(caminho, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS imovel_espelho (
+                    {", ".join(f"{coluna} TEXT" for coluna in COLUNAS.values())},
+                    interno INTEGER NOT NULL DEFAULT 0,
+                    dados TEXT NOT NULL,
+                    espelhado_em TEXT NOT NULL,
+                    PRIMARY KEY (codigo)
+                )
+                """
+            )
+            if not self._tem_interno():  # espelho de uma versão anterior
+                self.conn.execute("ALTER TABLE imovel_espelho ADD COLUMN interno INTEGER NOT NULL DEFAULT 0")
+                self.conn.execute(f"UPDATE imovel_espelho SET interno = 1 WHERE {_INTERNO_SQL}")
+                for colunas in _INDICES_FILTRO:  # substituídos pelos que terminam em `interno`
+                    self.conn.execute(f"DROP INDEX IF EXISTS idx_espelho_{'_'.join(colunas)}")
+            for colunas in INDICES:
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_espelho_{'_'.join(colunas)} "
+                    f"ON imovel_espelho ({', '.join(colunas)})"
+                )
+            self.conn.commit()
+        # Espelho antigo aberto só para leitura: sem a coluna, a regra é avaliada sobre `dados`
+        self._sem_internos = "interno = 0" if self._tem_interno() else f"NOT ({_INTERNO_SQL})"
+        self.commit_cada = commit_cada
+        self.commit_segundos = commit_segundos
+        self.gravados = 0
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._ultimo_commit = time.monotonic()
+
+    def _tem_interno(self) -> bool:
+        return any(coluna == "interno" for _, coluna, *_ in self.conn.execute("PRAGMA table_info(imovel_espelho)"))
+
+    def gravar(self, imoveis: Iterable[Dict[str, Any]]) -> None:
+        """
+        Insere ou substitui os imóveis (chave `Codigo`); imóveis sem código são ignorados.
+
+        Os commits são agrupados (a cada `commit_cada` imóveis ou `commit_segundos`) e o
+        último sai em `fechar`.
+        """
+        agora = datetime.now().isoformat(timespec="seconds")
+        linhas: List[Tuple[Any, ...]] = []
+        for im in imoveis:
+            if not im.get("Codigo"):
+                continue
+            valores = [
+                para_data(im.get(campo)) if campo in _DATAS else im.get(campo) for campo in COLUNAS
+            ]
+            linhas.append((*map(_texto, valores), _interno(im), json.dumps(im, ensure_ascii=False), agora))
+        if not linhas:
+            return
+        colunas = [*COLUNAS.values(), "interno", "dados", "espelhado_em"]
+        atualizacao = ", ".join(f"{c} = excluded.{c}" for c in colunas if c != "codigo")
+        with self._lock:
+            self.conn.executemany(
+                f"""
+                INSERT INTO imovel_espelho ({", ".join(colunas)}) VALUES ({", ".join("?" * len(colunas))})
+                ON CONFLICT(codigo) DO UPDATE SET {atualizacao}
+                """,
+                linhas,
+            )
+            self.gravados += len(linhas)
+            self._pendentes += len(linhas)
+            if (
+                self._pendentes >= self.commit_cada
+                or time.monotonic() - self._ultimo_commit >= self.commit_segundos
+            ):
+                self._commit()
+
+    def remover(self, codigos: Iterable[str]) -> None:
+        """Remove os imóveis excluídos do Vista (ver `reconciliacao_exclusoes.py`)."""
+        with self._lock:
+            self.conn.executemany("DELETE FROM imovel_espelho WHERE codigo = ?", [(c,) for c in codigos])
+            self._commit()
+
+    def _commit(self) -> None:
+        self.conn.commit()
+        self._pendentes = 0
+        self._ultimo_commit = time.monotonic()
+
+    def _filtro(self, filtro: Dict[str, Any], mostrar_internos: bool = False) -> Tuple[str, List[Any]]:
+        if not isinstance(filtro, dict):
+            raise ErroPesquisa(f"Filtro inválido: {filtro!r}")
+        condicoes: List[str] = [] if mostrar_internos else [self._sem_internos]
+        parametros: List[Any] = []
+        for campo, valor in filtro.items():
+            expressao = _expressao(campo)
+            intervalo = campo in _DATAS or _numerico(campo)
+            if not isinstance(valor, list):
+                condicoes.append(f"{expressao} = ?")
+                parametros.append(valor)
+            elif valor and isinstance(valor[0], str) and valor[0].lower() in _OPERADORES and len(valor) == 2:
+                operador = _OPERADORES[valor[0].lower()]
+                alvo = valor[1]
+                if operador == "LIKE" and "%" not in str(alvo):
+                    alvo = f"%{alvo}%"
+                condicoes.append(f"{expressao} {operador} ?")
+                parametros.append(alvo)
+            elif intervalo and len(valor) == 2:
+                condicoes.append(f"{expressao} BETWEEN ? AND ?")
+                parametros.extend(valor)
+            elif valor:
+                condicoes.append(f"{expressao} IN ({', '.join('?' * len(valor))})")
+                parametros.extend(valor)
+        return (" WHERE " + " AND ".join(condicoes) if condicoes else ""), parametros
+
+    def _ordem(self, ordem: Dict[str, Any]) -> str:
+        # Sem `order`: ordem de chegada da API (rowid)
+        if not isinstance(ordem, dict):
+            raise ErroPesquisa(f"Ordem inválida: {ordem!r}")
+        termos = []
+        for campo, direcao in ordem.items():
+            sentido = "DESC" if str(direcao).lower() == "desc" else "ASC"
+            termos.append(f"{_expressao(campo)} {sentido}")
+        return " ORDER BY " + ", ".join([*termos, "rowid"])
+
+    def pesquisar(
+        self, pesquisa: Dict[str, Any], mostrar_total: bool = True, mostrar_internos: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Responde um payload `pesquisa` como a listagem da API (`ErroPesquisa` se inválido).
+
+        Imóveis internos só entram com `mostrar_internos=True`, como `showInternal=1` na API.
+        """
+        if not isinstance(pesquisa, dict):
+            raise ErroPesquisa("A pesquisa deve ser um objeto JSON.")
+        paginacao = pesquisa.get("paginacao") or {}
+        try:
+            pagina = max(1, int(paginacao.get("pagina", 1)))
+            quantidade = max(1, min(QUANTIDADE_MAX, int(paginacao.get("quantidade", QUANTIDADE_MAX))))
+        except (TypeError, ValueError):
+            raise ErroPesquisa(f"Paginação inválida: {paginacao!r}") from None
+        campos = [c for c in pesquisa.get("fields") or ["Codigo"] if isinstance(c, str)]
+        where, parametros = self._filtro(pesquisa.get("filter") or {}, mostrar_internos)
+        ordem = self._ordem(pesquisa.get("order") or {})
+
+        try:
+            with self._lock:
+                linhas = self.conn.execute(
+                    f"SELECT codigo, dados FROM imovel_espelho{where}{ordem} LIMIT ? OFFSET ?",
+                    [*parametros, quantidade, (pagina - 1) * quantidade],
+                ).fetchall()
+                total = (
+                    self.conn.execute(f"SELECT COUNT(*) FROM imovel_espelho{where}", parametros).fetchone()[0]
+                    if mostrar_total
+                    else None
+                )
+        except (sqlite3.InterfaceError, sqlite3.ProgrammingError) as e:  # valor de filtro não escalar
+            raise ErroPesquisa(f"Valor inválido no filtro: {e}") from None
+
+        resposta: Dict[str, Any] = {}
+        for codigo, dados in linhas:
+            im = carregar(dados)
+            resposta[codigo] = {c: im[c] for c in campos if c in im}
+        if total is not None:
+            resposta.update(
+                {"total": total, "paginas": max(1, -(-total // quantidade)), "pagina": pagina, "quantidade": quantidade}
+            )
+        return resposta
+
+    def contar(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM imovel_espelho").fetchone()[0]
+
+    def fechar(self) -> None:
+        with self._lock:
+            if self.gravados:
+                self._commit()
+                self.conn.execute("PRAGMA optimize")  # estatísticas dos índices para o planejador
+            self.conn.close()
@@ -0,0 +1,80 @@
+"""
+Fragmentação determinística dos códigos de imóveis entre processos e máquinas.
+
+Cada código pertence a um único fragmento `i/N` (1 <= i <= N), escolhido por um hash estável
+(BLAKE2b do código, o mesmo em qualquer processo, máquina ou versão do Python, ao contrário de
+`hash()`). N execuções com `--shard 1/N` ... `--shard N/N` cobrem todos os imóveis sem repetir
+nenhum, sem coordenação entre elas.
+
+Cada fragmento usa os próprios arquivos de estado (`Fragmento.arquivo`) e, havendo várias
+chaves da API, a sua chave (`Fragmento.chave`); a taxa por chave é dividida entre os
+fragmentos que a compartilham (`Fragmento.compartilhando`).
+
+    fragmento = Fragmento.de_texto("2/4")
+    codigos = fragmento.filtrar(iterar_codigos_imoveis(supabase))
+    checkpoint = CheckpointProntuarios(fragmento.arquivo(".vista_checkpoint_prontuarios.sqlite"))
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Sequence
+
+
+def fragmento_do_codigo(codigo: str, total: int) -> int:
+    """Fragmento (1..total) do código: hash estável, uniforme mesmo para códigos sequenciais."""
+    digest = hashlib.blake2b(str(codigo).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % total + 1
+
+
+@dataclass(frozen=True)
+class Fragmento:
+    """Fragmento `indice` de `total` (1 <= indice <= total)."""
+
+    indice: int
+    total: int
+
+    def __post_init__(self) -> None:
+        if self.total < 1 or not 1 <= self.indice <= self.total:
+            raise ValueError(f"Fragmento inválido: {self.indice}/{self.total} (use i/N com 1 <= i <= N)")
+
+    @classmethod
+    def de_texto(cls, texto: str) -> Fragmento:
+        """`"2/4"` -> Fragmento(2, 4); usado como `type` do argparse."""
+        indice, _, total = texto.partition("/")
+        try:
+            return cls(int(indice), int(total))
+        except ValueError as e:
+            raise ValueError(f"Fragmento inválido: {texto!r} (use i/N, ex.: 2/4)") from e
+
+    @classmethod
+    def todos(cls, total: int) -> List[Fragmento]:
+        return [cls(i, total) for i in range(1, total + 1)]
+
+    def __str__(self) -> str:
+        return f"{self.indice}/{self.total}"
+
+    def contem(self, codigo: str) -> bool:
+        return self.total == 1 or fragmento_do_codigo(codigo, self.total) == self.indice
+
+    def filtrar(self, codigos: Iterable[str]) -> Iterator[str]:
+        """Gera, sob demanda, só os códigos deste fragmento."""
+        return (codigo for codigo in codigos if self.contem(codigo))
+
+    def arquivo(self, caminho: str) -> str:
+        """Caminho próprio do fragmento: `.vista_hashes.sqlite` -> `.vista_hashes.2de4.sqlite`."""
+        if self.total == 1 or not caminho:
+            return caminho
+        raiz, extensao = os.path.splitext(caminho)
+        return f"{raiz}.{self.indice}de{self.total}{extensao}"
+
+    def chave(self, chaves: Sequence[str]) -> str:
+        """Chave da API do fragmento: as chaves são distribuídas em rodízio (i-1) % len(chaves)."""
+        return chaves[(self.indice - 1) % len(chaves)]
+
+    def compartilhando(self, chaves: Sequence[str]) -> int:
+        """Quantos dos `total` fragmentos usam a mesma chave que este (divide a taxa da chave)."""
+        posicao = (self.indice - 1) % len(chaves)
+        return sum(1 for i in range(self.total) if i % len(chaves) == posicao)
@@ -0,0 +1,101 @@
+"""
+Impressões digitais (hash) das linhas já gravadas no Supabase, em SQLite local.
+
+Antes de cada upsert os importadores comparam o hash da linha normalizada com o último
+hash gravado para a mesma chave (`codigo` em `imovel_local`, `codigo_imovel` +
+`codigo_prontuario` em `imovel_prontuario`) e só enviam linhas novas ou alteradas. Isso evita
+reescrever linhas idênticas (WAL, gatilhos e bloat no Postgres).
+
+O hash só é atualizado depois que o Supabase confirma o upsert (`confirmar`), então uma
+gravação que falhou é reenviada na execução seguinte.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+Linha = Dict[str, Any]
+
+
+def hash_linha(linha: Linha) -> str:
+    """Hash estável da linha normalizada (independe da ordem das chaves)."""
+    conteudo = json.dumps(linha, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.blake2b(conteudo.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class HashesLinhas:
+    """Hashes das linhas gravadas de uma tabela, chaveados pelos campos de `campos_chave`."""
+
+    def __init__(self, caminho: str, tabela: str, campos_chave: Sequence[str]) -> None:
+        # Os upserts confirmam a partir de threads do pool de gravação
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS hash_linha (
+                tabela TEXT NOT NULL,
+                chave TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (tabela, chave)
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.commit()
+        self.tabela = tabela
+        self.campos_chave = tuple(campos_chave)
+        self.pulados = 0
+        self._lock = threading.Lock()
+        self._pendentes: Dict[str, str] = {}
+
+    def _chave(self, linha: Linha) -> str:
+        return "|".join(str(linha.get(campo)) for campo in self.campos_chave)
+
+    def alterados(self, linhas: Iterable[Linha]) -> Iterator[Linha]:
+        """
+        Gera só as linhas novas ou com conteúdo diferente do último upsert confirmado.
+
+        As puladas são contadas em `pulados`. Linhas sem chave completa sempre passam.
+        """
+        for linha in linhas:
+            if any(linha.get(campo) is None for campo in self.campos_chave):
+                yield linha
+                continue
+            chave, valor = self._chave(linha), hash_linha(linha)
+            with self._lock:
+                atual = self.conn.execute(
+                    "SELECT hash FROM hash_linha WHERE tabela = ? AND chave = ?", (self.tabela, chave)
+                ).fetchone()
+                if atual is not None and atual[0] == valor:
+                    self.pulados += 1
+                    continue
+                self._pendentes[chave] = valor
+            yield linha
+
+    def confirmar(self, linhas: Iterable[Linha]) -> None:
+        """Registra os hashes das linhas cujo upsert o Supabase confirmou."""
+        with self._lock:
+            pares: List[Tuple[str, str, str]] = []
+            for linha in linhas:
+                chave = self._chave(linha)
+                valor = self._pendentes.pop(chave, None)
+                if valor is not None:
+                    pares.append((self.tabela, chave, valor))
+            if pares:
+                self.conn.executemany(
+                    """
+                    INSERT INTO hash_linha (tabela, chave, hash) VALUES (?, ?, ?)
+                    ON CONFLICT(tabela, chave) DO UPDATE SET hash = excluded.hash
+                    """,
+                    pares,
+                )
+                self.conn.commit()
+
+    def fechar(self) -> None:
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
@@ -0,0 +1,95 @@
+"""
+Índice local de alterações por imóvel (SQLite).
+
+Guarda, para cada código, o último `DataHoraAtualizacao` e `PendenteProntuario` vistos na
+listagem da API Vista. O importador de prontuários compara o estado atual da listagem com o
+índice e só consulta `/imoveis/detalhes` dos imóveis que mudaram (ou que nunca foram vistos).
+
+Os estados são marcados lote a lote, à medida que a gravação é confirmada, com commits
+agrupados como no checkpoint: uma execução interrompida não perde o que já gravou.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+# (DataHoraAtualizacao, PendenteProntuario)
+Estado = Tuple[Optional[str], Optional[str]]
+
+
+class IndiceAlteracoes:
+    """Índice persistente `codigo -> (DataHoraAtualizacao, PendenteProntuario)`."""
+
+    def __init__(self, caminho: str, commit_cada: int = 200, commit_segundos: float = 2.0) -> None:
+        self.conn = sqlite3.connect(caminho)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS imovel_estado (
+                codigo TEXT PRIMARY KEY,
+                data_hora_atualizacao TEXT,
+                pendente_prontuario TEXT,
+                visto_em TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+        self.commit_cada = commit_cada
+        self.commit_segundos = commit_segundos
+        self._pendentes = 0
+        self._ultimo_commit = time.monotonic()
+
+    def estados(self) -> Dict[str, Estado]:
+        """Carrega o índice inteiro (um par de strings curtas por imóvel)."""
+        cur = self.conn.execute(
+            "SELECT codigo, data_hora_atualizacao, pendente_prontuario FROM imovel_estado"
+        )
+        return {codigo: (dh, pend) for codigo, dh, pend in cur}
+
+    def filtrar_alterados(self, codigos: Iterable[str], atuais: Dict[str, Estado]) -> Iterator[str]:
+        """
+        Gera, na ordem recebida, os códigos cujo estado atual difere do índice.
+
+        O índice é carregado na chamada; os códigos são filtrados sob demanda (podem vir de um
+        gerador consumido em outra thread). Códigos ausentes de `atuais` (a listagem não os
+        trouxe) são mantidos por precaução.
+        """
+        salvos = self.estados()
+        return (
+            codigo
+            for codigo in codigos
+            if codigo not in atuais or salvos.get(codigo) != atuais[codigo]
+        )
+
+    def marcar(self, estados: Dict[str, Estado]) -> None:
+        """Grava os estados dos imóveis processados com sucesso (commit agrupado, ver `fechar`)."""
+        if not estados:
+            return
+        agora = datetime.now().isoformat(timespec="seconds")
+        cur = self.conn.executemany(
+            """
+            INSERT INTO imovel_estado (codigo, data_hora_atualizacao, pendente_prontuario, visto_em)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(codigo) DO UPDATE SET
+                data_hora_atualizacao = excluded.data_hora_atualizacao,
+                pendente_prontuario = excluded.pendente_prontuario,
+                visto_em = excluded.visto_em
+            """,
+            [(codigo, dh, pend, agora) for codigo, (dh, pend) in estados.items()],
+        )
+        self._pendentes += cur.rowcount
+        if self._pendentes >= self.commit_cada or time.monotonic() - self._ultimo_commit >= self.commit_segundos:
+            self._commit()
+
+    def _commit(self) -> None:
+        self.conn.commit()
+        self._pendentes = 0
+        self._ultimo_commit = time.monotonic()
+
+    def fechar(self) -> None:
+        self._commit()
+        self.conn.close()
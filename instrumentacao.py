@@ -0,0 +1,308 @@
+"""
+Instrumentação compartilhada pelos importadores: contadores e histogramas de latência por estágio.
+
+O registro é um dicionário protegido por lock (custo de microssegundos por evento), então pode
+ficar ligado em produção. Ao fim da execução as métricas são exportadas:
+
+- `METRICAS_PROM_ARQUIVO`: arquivo texto no formato Prometheus (node_exporter textfile collector).
+- `METRICAS_JSON_ARQUIVO`: resumo da execução em JSON.
+
+Execuções fragmentadas (`fragmentos.py`) rotulam as métricas com o fragmento e os resumos de
+cada uma são combinados com `juntar_resumos`.
+
+    with METRICAS.cronometrar("supabase_upsert", tabela="imovel_local"):
+        ...
+    METRICAS.contar("linhas_gravadas", n, tabela="imovel_local")
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from urllib3.util.retry import Retry
+
+PREFIXO = "vista"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+def _rotulos(labels: Dict[str, Any]) -> Rotulos:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _formatar_rotulos(rotulos: Rotulos, extra: Optional[Tuple[str, str]] = None) -> str:
+    pares = list(rotulos) + ([extra] if extra else [])
+    if not pares:
+        return ""
+    valores = ",".join(f'{k}="{v}"' for k, v in pares)
+    return "{" + valores + "}"
+
+
+class _Histograma:
+    __slots__ = ("contagens", "soma", "total")
+
+    def __init__(self) -> None:
+        self.contagens = [0] * (len(BUCKETS) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        self.contagens[bisect_left(BUCKETS, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def percentil(self, p: float) -> float:
+        """Aproximação pelo limite superior do bucket que contém o percentil (satura no último)."""
+        if not self.total:
+            return 0.0
+        alvo = p / 100.0 * self.total
+        acumulado = 0
+        for i, n in enumerate(self.contagens):
+            acumulado += n
+            if acumulado >= alvo:
+                break
+        return BUCKETS[min(i, len(BUCKETS) - 1)]
+
+
+class Metricas:
+    """Registro de métricas da execução (contadores, histogramas e valores pontuais)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.script = "vista"
+        self.rotulos: Rotulos = ()
+        self.inicio = time.time()
+        self._contadores: Dict[str, Dict[Rotulos, float]] = {}
+        self._histogramas: Dict[str, Dict[Rotulos, _Histograma]] = {}
+        self._valores: Dict[str, Dict[Rotulos, float]] = {}
+
+    def iniciar(self, script: str, **rotulos: Any) -> None:
+        """
+        Zera o registro e marca o início de uma execução do `script`; `rotulos` (ex.: o fragmento)
+        entram em todas as séries exportadas.
+        """
+        with self._lock:
+            self.script = script
+            self.rotulos = _rotulos(rotulos)
+            self.inicio = time.time()
+            self._contadores.clear()
+            self._histogramas.clear()
+            self._valores.clear()
+
+    def contar(self, nome: str, valor: float = 1, **labels: Any) -> None:
+        chave = _rotulos(labels)
+        with self._lock:
+            serie = self._contadores.setdefault(nome, {})
+            serie[chave] = serie.get(chave, 0) + valor
+
+    def observar(self, nome: str, valor: float, **labels: Any) -> None:
+        chave = _rotulos(labels)
+        with self._lock:
+            serie = self._histogramas.setdefault(nome, {})
+            hist = serie.get(chave)
+            if hist is None:
+                hist = serie[chave] = _Histograma()
+            hist.observar(valor)
+
+    def definir(self, nome: str, valor: float, **labels: Any) -> None:
+        with self._lock:
+            self._valores.setdefault(nome, {})[_rotulos(labels)] = valor
+
+    @contextmanager
+    def cronometrar(self, estagio: str, **labels: Any) -> Iterator[None]:
+        """Mede a duração do bloco em `duracao_segundos{estagio=...}` e conta erros do estágio."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.contar("erros_total", estagio=estagio, **labels)
+            raise
+        finally:
+            self.observar("duracao_segundos", time.perf_counter() - inicio, estagio=estagio, **labels)
+
+    def registrar_retry(self, status: Any, origem: str) -> None:
+        self.contar("retries_total", status=status, origem=origem)
+
+    def registrar_espera(self, segundos: float, motivo: str) -> None:
+        """Tempo gasto dormindo em backoff/rate limit."""
+        self.contar("espera_segundos_total", segundos, motivo=motivo)
+
+    # ---------------- exportação ----------------
+
+    def prometheus(self) -> str:
+        base = (("script", self.script),) + self.rotulos
+        linhas: List[str] = []
+        with self._lock:
+            for nome, serie in sorted(self._contadores.items()):
+                metrica = f"{PREFIXO}_{nome}"
+                linhas.append(f"# TYPE {metrica} counter")
+                for rotulos, valor in serie.items():
+                    linhas.append(f"{metrica}{_formatar_rotulos(base + rotulos)} {valor:g}")
+            for nome, hists in sorted(self._histogramas.items()):
+                metrica = f"{PREFIXO}_{nome}"
+                linhas.append(f"# TYPE {metrica} histogram")
+                for rotulos, hist in hists.items():
+                    acumulado = 0
+                    for limite, n in zip(list(BUCKETS) + ["+Inf"], hist.contagens):
+                        acumulado += n
+                        le = ("le", f"{limite:g}" if isinstance(limite, float) else limite)
+                        linhas.append(f"{metrica}_bucket{_formatar_rotulos(base + rotulos, le)} {acumulado}")
+                    linhas.append(f"{metrica}_sum{_formatar_rotulos(base + rotulos)} {hist.soma:.6f}")
+                    linhas.append(f"{metrica}_count{_formatar_rotulos(base + rotulos)} {hist.total}")
+            for nome, serie in sorted(self._valores.items()):
+                metrica = f"{PREFIXO}_{nome}"
+                linhas.append(f"# TYPE {metrica} gauge")
+                for rotulos, valor in serie.items():
+                    linhas.append(f"{metrica}{_formatar_rotulos(base + rotulos)} {valor:g}")
+        linhas.append(f"# TYPE {PREFIXO}_execucao_inicio_timestamp_seconds gauge")
+        linhas.append(f"{PREFIXO}_execucao_inicio_timestamp_seconds{_formatar_rotulos(base)} {self.inicio:.0f}")
+        linhas.append(f"# TYPE {PREFIXO}_execucao_duracao_segundos gauge")
+        linhas.append(
+            f"{PREFIXO}_execucao_duracao_segundos{_formatar_rotulos(base)} {time.time() - self.inicio:.3f}"
+        )
+        return "\n".join(linhas) + "\n"
+
+    def resumo(self) -> Dict[str, Any]:
+        def nome_serie(nome: str, rotulos: Rotulos) -> str:
+            return nome + _formatar_rotulos(rotulos)
+
+        with self._lock:
+            return {
+                "script": self.script,
+                "rotulos": dict(self.rotulos),
+                "inicio": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.inicio)),
+                "duracao_segundos": round(time.time() - self.inicio, 3),
+                "contadores": {
+                    nome_serie(n, r): v for n, serie in self._contadores.items() for r, v in serie.items()
+                },
+                "histogramas": {
+                    nome_serie(n, r): {
+                        "contagem": h.total,
+                        "soma": round(h.soma, 6),
+                        "media": round(h.soma / h.total, 6) if h.total else 0.0,
+                        "p50": h.percentil(50),
+                        "p95": h.percentil(95),
+                        "p99": h.percentil(99),
+                        "contagens": list(h.contagens),
+                    }
+                    for n, hists in self._histogramas.items()
+                    for r, h in hists.items()
+                },
+                "valores": {
+                    nome_serie(n, r): v for n, serie in self._valores.items() for r, v in serie.items()
+                },
+            }
+
+    def exportar(
+        self, arquivo_prom: Optional[str] = None, arquivo_json: Optional[str] = None
+    ) -> None:
+        """Grava as métricas nos arquivos configurados (escrita atômica: temporário + rename)."""
+        arquivo_prom = arquivo_prom or os.getenv("METRICAS_PROM_ARQUIVO")
+        arquivo_json = arquivo_json or os.getenv("METRICAS_JSON_ARQUIVO")
+        if arquivo_prom:
+            _gravar_atomico(arquivo_prom, self.prometheus())
+        if arquivo_json:
+            _gravar_atomico(arquivo_json, json.dumps(self.resumo(), indent=2, ensure_ascii=False))
+
+
+def juntar_resumos(resumos: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combina os resumos (`Metricas.resumo`) de execuções paralelas, ex.: os fragmentos de uma importação.
+
+    Contadores e valores são somados (a taxa final vira a soma das taxas); os histogramas somam
+    as contagens por bucket e os percentis são recalculados. O período vai do primeiro início
+    ao último fim.
+    """
+    resumos = list(resumos)
+    if not resumos:
+        raise ValueError("Nenhum resumo para juntar")
+    contadores: Dict[str, float] = {}
+    valores: Dict[str, float] = {}
+    histogramas: Dict[str, _Histograma] = {}
+    inicios, fins = [], []
+    for resumo in resumos:
+        inicio = datetime.fromisoformat(resumo["inicio"]).timestamp()
+        inicios.append(inicio)
+        fins.append(inicio + resumo.get("duracao_segundos", 0.0))
+        for nome, valor in resumo.get("contadores", {}).items():
+            contadores[nome] = contadores.get(nome, 0) + valor
+        for nome, valor in resumo.get("valores", {}).items():
+            valores[nome] = valores.get(nome, 0) + valor
+        for nome, dados in resumo.get("histogramas", {}).items():
+            hist = histogramas.setdefault(nome, _Histograma())
+            for i, n in enumerate(dados.get("contagens") or []):
+                hist.contagens[i] += n
+            hist.soma += dados.get("soma", 0.0)
+            hist.total += dados.get("contagem", 0)
+    return {
+        "script": resumos[0].get("script"),
+        "execucoes": [resumo.get("rotulos", {}) for resumo in resumos],
+        "inicio": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(min(inicios))),
+        "duracao_segundos": round(max(fins) - min(inicios), 3),
+        "contadores": contadores,
+        "histogramas": {
+            nome: {
+                "contagem": h.total,
+                "soma": round(h.soma, 6),
+                "media": round(h.soma / h.total, 6) if h.total else 0.0,
+                "p50": h.percentil(50),
+                "p95": h.percentil(95),
+                "p99": h.percentil(99),
+                "contagens": list(h.contagens),
+            }
+            for nome, h in histogramas.items()
+        },
+        "valores": valores,
+    }
+
+
+def _gravar_atomico(caminho: str, conteudo: str) -> None:
+    tmp = f"{caminho}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+    os.replace(tmp, caminho)
+
+
+METRICAS = Metricas()
+
+
+class RetryInstrumentado(Retry):
+    """`Retry` do urllib3 que registra cada nova tentativa (por status) e o tempo de backoff."""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):  # type: ignore[override]
+        status = response.status if response is not None else type(error).__name__ if error else "desconhecido"
+        METRICAS.registrar_retry(status, origem="adapter")
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+    def sleep(self, response=None):  # type: ignore[override]
+        inicio = time.perf_counter()
+        try:
+            super().sleep(response)
+        finally:
+            METRICAS.registrar_espera(time.perf_counter() - inicio, motivo="retry_adapter")
+
+
+def instrumentar_sessao(session: requests.Session) -> requests.Session:
+    """
+    Registra latência e status de cada resposta da sessão em `requisicao_segundos{endpoint=...}`.
+
+    O endpoint é o último trecho do caminho da URL (`listar`, `detalhes`...).
+    """
+
+    def ao_responder(resp: requests.Response, *args: Any, **kwargs: Any) -> None:
+        endpoint = urlparse(resp.url).path.rstrip("/").rsplit("/", 1)[-1] or "raiz"
+        METRICAS.observar("requisicao_segundos", resp.elapsed.total_seconds(), endpoint=endpoint)
+        METRICAS.contar("requisicoes_total", endpoint=endpoint, status=resp.status_code)
+
+    session.hooks["response"].append(ao_responder)
+    return session
@@ -0,0 +1,165 @@
+"""
+Limitador de taxa adaptativo (token bucket) para chamadas à API Vista.
+
+- Controla a taxa (req/s) com um balde de fichas e o número máximo de requisições em voo.
+- Aumenta a taxa gradualmente enquanto as respostas são saudáveis (aumento aditivo).
+- Reduz a taxa pela metade em 429 / "too many connections" (redução multiplicativa).
+- Respeita o cabeçalho `Retry-After`, pausando todas as threads até o horário indicado.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Iterator, Optional
+
+
+def parse_retry_after(valor: Optional[str]) -> Optional[float]:
+    """Converte `Retry-After` (segundos ou data HTTP) em segundos de espera."""
+    if not valor:
+        return None
+    valor = valor.strip()
+    if valor.isdigit():
+        return float(valor)
+    try:
+        quando = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    if quando.tzinfo is None:
+        quando = quando.replace(tzinfo=timezone.utc)
+    return max(0.0, (quando - datetime.now(timezone.utc)).total_seconds())
+
+
+class LimitadorAdaptativo:
+    """
+    Token bucket com taxa adaptativa (AIMD) e limite de requisições simultâneas.
+
+    Uso:
+        with limitador.slot():
+            resp = session.get(...)
+        limitador.registrar_sucesso()  # ou registrar_limite(retry_after)
+    """
+
+    def __init__(
+        self,
+        taxa_max: float,
+        max_em_voo: int,
+        taxa_inicial: Optional[float] = None,
+        taxa_min: float = 0.2,
+        incremento: Optional[float] = None,
+        fator_reducao: float = 0.5,
+        rajada: float = 1.0,
+    ) -> None:
+        self.taxa_max = taxa_max
+        self.taxa_min = min(taxa_min, taxa_max)
+        self.taxa = min(taxa_inicial or taxa_max, taxa_max)
+        self.max_em_voo = max(1, max_em_voo)
+        # Aumento aditivo por resposta saudável; padrão: 2% do teto (recupera em ~50 respostas)
+        self.incremento = incremento if incremento is not None else taxa_max * 0.02
+        self.fator_reducao = fator_reducao
+        self.rajada = max(1.0, rajada)
+
+        self.tempo_espera = 0.0  # segundos acumulados aguardando fichas/pausas
+        self.limites_recebidos = 0
+
+        self._lock = threading.Lock()
+        # Vagas em voo; pedidos prioritários passam à frente dos comuns que estiverem esperando
+        self._vagas = threading.Condition()
+        self._ocupadas = 0
+        self._prioritarios = 0
+        self._fichas = 1.0
+        self._ultimo = time.monotonic()
+        self._pausado_ate = 0.0
+        self._ultima_reducao = 0.0
+
+    def _adquirir_ficha(self) -> None:
+        inicio = time.monotonic()
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                if agora < self._pausado_ate:
+                    espera = self._pausado_ate - agora
+                else:
+                    self._fichas = min(self.rajada, self._fichas + (agora - self._ultimo) * self.taxa)
+                    self._ultimo = agora
+                    if self._fichas >= 1.0:
+                        self._fichas -= 1.0
+                        self.tempo_espera += agora - inicio
+                        return
+                    espera = (1.0 - self._fichas) / self.taxa
+            time.sleep(espera)
+
+    def _ocupar_vaga(self, prioritaria: bool) -> None:
+        with self._vagas:
+            if prioritaria:
+                self._prioritarios += 1
+            try:
+                while self._ocupadas >= self.max_em_voo or (not prioritaria and self._prioritarios):
+                    self._vagas.wait()
+                self._ocupadas += 1
+            finally:
+                if prioritaria:
+                    self._prioritarios -= 1
+                    self._vagas.notify_all()
+
+    def _liberar_vaga(self) -> None:
+        with self._vagas:
+            self._ocupadas -= 1
+            self._vagas.notify_all()
+
+    def reservar(self, prioritaria: bool = False) -> None:
+        """
+        Reserva uma vaga em voo e uma ficha; a vaga fica ocupada até `liberar()`.
+
+        Para requisições que terminam em outra thread (ver `politica_requisicoes.py`); nos
+        demais casos use `slot()`.
+        """
+        self._ocupar_vaga(prioritaria)
+        try:
+            self._adquirir_ficha()
+        except BaseException:
+            self._liberar_vaga()
+            raise
+
+    def liberar(self) -> None:
+        """Devolve a vaga de `reservar()`."""
+        self._liberar_vaga()
+
+    @contextmanager
+    def slot(self, prioritaria: bool = False) -> Iterator[None]:
+        """
+        Reserva uma vaga em voo e uma ficha antes de liberar a requisição.
+
+        Com `prioritaria=True` a próxima vaga livre é desta requisição, mesmo com outras
+        esperando (cópias por lentidão, que não adiantam se chegarem tarde).
+        """
+        self.reservar(prioritaria)
+        try:
+            yield
+        finally:
+            self.liberar()
+
+    def registrar_sucesso(self) -> None:
+        """Resposta saudável: aumenta a taxa aditivamente até `taxa_max`."""
+        with self._lock:
+            self.taxa = min(self.taxa_max, self.taxa + self.incremento)
+
+    def registrar_limite(self, retry_after: Optional[float] = None) -> None:
+        """
+        429 / "too many connections": reduz a taxa e, se houver `Retry-After`, pausa todos.
+
+        Várias threads costumam receber 429 ao mesmo tempo; reduções dentro de um mesmo
+        intervalo de ficha contam como uma só.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            self.limites_recebidos += 1
+            if agora - self._ultima_reducao >= 1.0 / self.taxa:
+                self.taxa = max(self.taxa_min, self.taxa * self.fator_reducao)
+                self._ultima_reducao = agora
+            self._fichas = 0.0
+            if retry_after:
+                self._pausado_ate = max(self._pausado_ate, agora + retry_after)
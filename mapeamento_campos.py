@@ -0,0 +1,231 @@
+"""
+Mapeamento declarativo dos campos da API Vista para as colunas de destino.
+
+Cada tabela/arquivo de saída é descrita uma única vez como uma lista de `Campo`
+(coluna de destino, campo de origem, conversor). `Mapeamento` compila a lista uma vez em
+funções que convertem páginas inteiras de uma só vez:
+
+- `linhas(itens)`: lista de dicts (upsert, CSV);
+- `colunas(itens)`: dict coluna -> lista de valores (Parquet/pyarrow).
+
+A compilação gera o código de um único dict literal / list comprehension por coluna
+(como `collections.namedtuple` e `dataclasses` fazem), evitando laços e `if`s por campo.
+Os conversores têm um caminho rápido para o valor mais comum (data preenchida, "Sim"/"Nao")
+(ver `benchmarks/normalizacao.py`).
+
+    MAPA_IMOVEL_LOCAL.linhas(pagina)
+    MAPA_PRONTUARIO.linhas(itens, {"codigo_imovel": "123"})
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+Conversor = Callable[[Any], Any]
+
+_ZEROS_DATA = " 0-:"
+
+
+# =========================
+# Conversores
+# =========================
+
+
+def para_data(valor: Any) -> Optional[str]:
+    """Data/data-hora da API como string; vazias e zeradas ("0000-00-00 00:00:00") viram None."""
+    # Caso comum: começa por 1-9 (ano preenchido). Datas zeradas começam por "0", " ", "-" ou ":"
+    if type(valor) is str and valor >= "1":
+        return valor
+    if not valor or not isinstance(valor, str):
+        return None
+    # Só zeros, traços, dois-pontos e espaços: data zerada
+    if not valor.strip().strip(_ZEROS_DATA):
+        return None
+    return valor
+
+
+def para_booleano(valor: Any) -> Optional[bool]:
+    """Converte valores comuns (sim/não/true/false) para booleano ou None."""
+    if valor is None:
+        return None
+    if isinstance(valor, str) and valor in _BOOLEANOS_EXATOS:  # "Sim"/"Nao" como a API devolve
+        return _BOOLEANOS_EXATOS[valor]
+    return _BOOLEANOS.get(str(valor).strip().lower())
+
+
+_BOOLEANOS = {"sim": True, "true": True, "1": True, "nao": False, "não": False, "false": False, "0": False}
+_BOOLEANOS_EXATOS = {"Sim": True, "Nao": False, "Não": False, **_BOOLEANOS}
+
+
+def para_float(valor: Any) -> Optional[float]:
+    """Valores monetários: string numérica vira float; vazios e inválidos viram None."""
+    if valor is None or valor == "":
+        return None
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def para_inteiro(valor: Any) -> Optional[int]:
+    """Só dígitos viram int (códigos); o resto vira None."""
+    texto = str(valor)
+    return int(texto) if texto.isdecimal() else None
+
+
+def para_date(valor: Any) -> Optional[date]:
+    """Data tipada (`datetime.date`) a partir dos 10 primeiros caracteres; inválidas viram None."""
+    if not para_data(valor):
+        return None
+    try:
+        return datetime.strptime(valor.strip()[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def para_datetime(valor: Any) -> Optional[datetime]:
+    """Data-hora tipada (`AAAA-MM-DD HH:MM:SS` ou só a data); inválidas viram None."""
+    if not para_data(valor):
+        return None
+    for formato in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(valor.strip(), formato)
+        except ValueError:
+            continue
+    return None
+
+
+# =========================
+# Especificação e compilação
+# =========================
+
+
+class Campo(NamedTuple):
+    """Coluna de destino, campo de origem na API e conversor opcional.
+
+    `origem=None` indica um valor fixo da página, passado em `fixos` (ex.: `codigo_imovel`).
+    """
+
+    destino: str
+    origem: Optional[str]
+    conversor: Optional[Conversor] = None
+
+
+class Mapeamento:
+    """Lista de `Campo` compilada em conversores de páginas inteiras."""
+
+    def __init__(self, campos: Iterable[Campo]) -> None:
+        self.campos = list(campos)
+        self.nomes = [c.destino for c in self.campos]
+        self.linhas = self._compilar_linhas()
+        self.colunas = self._compilar_colunas()
+
+    def _ambiente(self) -> Dict[str, Any]:
+        return {f"_c{i}": c.conversor for i, c in enumerate(self.campos) if c.conversor}
+
+    def _expressao(self, i: int, campo: Campo) -> str:
+        valor = f"fixos[{campo.destino!r}]" if campo.origem is None else f"im.get({campo.origem!r})"
+        return f"_c{i}({valor})" if campo.conversor else valor
+
+    def _compilar(self, nome: str, corpo: str) -> Callable[..., Any]:
+        codigo = f"def {nome}(itens, fixos=None):\n    {corpo}\n"
+        ambiente = self._ambiente()
+        exec(codigo, ambiente)  # noqa: S102 - código gerado só a partir da especificação acima
+        return ambiente[nome]
+
+    def _compilar_linhas(self) -> Callable[..., List[Dict[str, Any]]]:
+        pares = ", ".join(f"{c.destino!r}: {self._expressao(i, c)}" for i, c in enumerate(self.campos))
+        return self._compilar("linhas", f"return [{{{pares}}} for im in itens]")
+
+    def _compilar_colunas(self) -> Callable[..., Dict[str, List[Any]]]:
+        # As páginas chegam como geradores/iteráveis de uso único: materializa uma vez
+        listas = ", ".join(
+            f"{c.destino!r}: [{self._expressao(i, c)} for im in itens]" for i, c in enumerate(self.campos)
+        )
+        return self._compilar("colunas", f"itens = list(itens)\n    return {{{listas}}}")
+
+    def linha(self, item: Dict[str, Any], fixos: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Converte um único item (compatibilidade com as funções por linha)."""
+        return self.linhas((item,), fixos)[0]
+
+
+# =========================
+# Especificações
+# =========================
+
+# ImportVistaSupabase.py -> tabela `imovel_local`
+MAPA_IMOVEL_LOCAL = Mapeamento(
+    [
+        Campo("codigo", "Codigo"),
+        Campo("categoria", "Categoria"),
+        Campo("bairro", "Bairro"),
+        Campo("status", "Status"),
+        Campo("orulo", "Orulo"),  # útil para queries posteriores de acordo com o objetivo do serviço final
+        Campo("exibirnosite", "ExibirNoSite"),
+        Campo("dataatualizacao", "DataAtualizacao", para_data),
+        Campo("datadeativacao", "DataDeAtivacao", para_data),
+        Campo("datacadastro", "DataCadastro", para_data),
+    ]
+)
+
+# Exporta_Vista_CSV.py -> CSV
+MAPA_EXPORTACAO = Mapeamento(
+    [
+        Campo("codigoimovel", "Codigo"),
+        Campo("categoria", "Categoria"),
+        Campo("bairro", "Bairro"),
+        Campo("status", "Status"),
+        Campo("orulo", "Orulo"),
+        Campo("datahoraatualizacao", "DataHoraAtualizacao", para_data),
+        Campo("pendenteprontuario", "PendenteProntuario"),
+        Campo("datadeativacao", "DataDeAtivacao", para_data),
+        Campo("dataatualizacao", "DataAtualizacao", para_data),
+    ]
+)
+
+# Exporta_Vista_CSV.py -> Parquet (mesmas colunas, datas tipadas)
+MAPA_EXPORTACAO_TIPADA = Mapeamento(
+    [
+        Campo("codigoimovel", "Codigo"),
+        Campo("categoria", "Categoria"),
+        Campo("bairro", "Bairro"),
+        Campo("status", "Status"),
+        Campo("orulo", "Orulo"),
+        Campo("datahoraatualizacao", "DataHoraAtualizacao", para_datetime),
+        Campo("pendenteprontuario", "PendenteProntuario"),
+        Campo("datadeativacao", "DataDeAtivacao", para_date),
+        Campo("dataatualizacao", "DataAtualizacao", para_date),
+    ]
+)
+
+# ImportadorProntuarios.py -> tabela `imovel_prontuario` (`codigo_imovel` vem em `fixos`)
+MAPA_PRONTUARIO = Mapeamento(
+    [
+        Campo("codigo_imovel", None),
+        Campo("codigo_prontuario", "Codigo", para_inteiro),
+        Campo("data", "Data", para_data),
+        Campo("hora", "Hora"),
+        Campo("assunto", "Assunto"),
+        Campo("texto", "Texto"),
+        Campo("pendente", "Pendente", para_booleano),
+        Campo("bairro", "Bairro"),
+        Campo("anunciado", "Anunciado", para_booleano),
+        Campo("retranca", "Retranca"),
+        Campo("corretor", "Corretor"),
+        Campo("proposta", "PROPOSTA", para_booleano),
+        Campo("status", "Status"),
+        Campo("datainicio", "Datainicio", para_data),
+        Campo("veiculopublicado", "VeiculoPublicado"),
+        Campo("valorproposta", "ValorProposta", para_float),
+        Campo("bairroanuncio", "BairroAnuncio"),
+        Campo("statusbatecao", "StatusBatecao"),
+        Campo("valorbatido", "ValorBatido", para_float),
+        Campo("privado", "Privado", para_booleano),
+        Campo("cliente", "Cliente"),
+        Campo("tipoanuncio", "Tipoanuncio"),
+        Campo("titulado", "Titulado"),
+        Campo("statusdoimovel", "Statusdoimóvel"),
+        Campo("codigocorretor", "CodigoCorretor"),
+    ]
+)
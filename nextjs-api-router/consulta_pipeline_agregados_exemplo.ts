@@ -0,0 +1,119 @@
+/**
+
+ * Objetivo:
+ *   Mesmo endpoint de `consulta_pipeline_semana_ou_mes_exemplo.ts` (métricas de "negócios" por
+ *   etapa/status em "semana" ou "mes"), mas lendo os agregados diários gravados pelo
+ *   `AgregadorNegocios.py` na tabela `negocio_dia` do Supabase, em vez de consultar a API do
+ *   Vista dia a dia a cada chamada. Uma única consulta ao Supabase por chamada.
+ *
+ * Assinatura do endpoint (App Router):
+ *   /api/negocios/[etapa]/[status]/[periodo]
+ *
+ * Retornos (iguais ao endpoint original):
+ *   - periodo = "semana": { total, porDia: { [YYYY-MM-DD]: number } }  // últimos 7 dias (inclui hoje)
+ *   - periodo = "mes":    { total, valorTotal }                       // do mesmo dia do mês anterior até hoje
+ *
+ * Observações:
+ *   - Os dias são os de America/Sao_Paulo, como no agregador.
+ *   - O balde de hoje é tão recente quanto a última execução do agregador (agende-o, ex.: a cada 10 min).
+ *
+ * Variáveis de ambiente necessárias:
+ *   - SUPABASE_URL: URL do projeto (ex.: https://SEU_PROJETO.supabase.co)
+ *   - SUPABASE_KEY: chave com leitura na tabela `negocio_dia`
+ *
+ * Onde colocar este arquivo:
+ *   app/api/negocios/[etapa]/[status]/[periodo]/route.ts
+ * ---------------------------------------------------------------------------
+ */
+
+import { NextRequest } from 'next/server';
+
+/** Converte um Date para YYYY-MM-DD fixando timezone em America/Sao_Paulo. */
+function formatDateSP(date: Date): string {
+  const parts = new Intl.DateTimeFormat('pt-BR', {
+    timeZone: 'America/Sao_Paulo',
+    year: 'numeric',
+    month: '2-digit',
+    day: '2-digit',
+  }).formatToParts(date);
+  const map: Record<string, string> = {};
+  for (const p of parts) if (p.type !== 'literal') map[p.type] = p.value;
+  return `${map.year}-${map.month}-${map.day}`;
+}
+
+/** Retorna uma nova data somando (ou subtraindo) 'days' a partir de 'base'. */
+function addDays(base: Date, days: number): Date {
+  const d = new Date(base.getTime());
+  d.setDate(d.getDate() + days);
+  return d;
+}
+
+/** Normaliza o status: "aberto" -> "Em aberto"; demais capitalizam a 1ª letra. */
+function normalizeStatus(s: string): string {
+  const lower = s.toLowerCase();
+  if (lower === 'aberto') return 'Em aberto';
+  return lower.charAt(0).toUpperCase() + lower.slice(1);
+}
+
+/** Normaliza a etapa: apenas capitaliza a 1ª letra. */
+function normalizeEtapa(e: string): string {
+  const lower = e.toLowerCase();
+  return lower.charAt(0).toUpperCase() + lower.slice(1);
+}
+
+type Balde = { dia: string; quantidade: number; valor: number };
+
+/** Baldes diários de uma etapa/status entre `inicio` e `fim` (inclusive), via PostgREST. */
+async function buscarBaldes(etapa: string, status: string, inicio: string, fim: string): Promise<Balde[]> {
+  const base = process.env.SUPABASE_URL?.replace(/\/+$/, '') ?? '';
+  const key = process.env.SUPABASE_KEY ?? '';
+  const params = new URLSearchParams({ select: 'dia,quantidade,valor', etapa: `eq.${etapa}`, status: `eq.${status}` });
+  params.append('dia', `gte.${inicio}`);
+  params.append('dia', `lte.${fim}`);
+  const res = await fetch(`${base}/rest/v1/negocio_dia?${params}`, {
+    headers: { apikey: key, Authorization: `Bearer ${key}`, Accept: 'application/json' },
+  });
+  if (!res.ok) throw new Error(`Erro no Supabase: ${res.status}`);
+  return res.json();
+}
+
+export async function GET(
+  req: NextRequest,
+  ctx: { params: Promise<{ etapa: string; status: string; periodo: string }> }
+) {
+  const { etapa, status, periodo } = await ctx.params;
+
+  if (!etapa || !status || !periodo) {
+    return Response.json(
+      { error: 'Parâmetros inválidos. Use /:etapa/:status/:periodo' },
+      { status: 400 }
+    );
+  }
+
+  const now = new Date();
+  const hoje = formatDateSP(now);
+
+  try {
+    if (periodo.toLowerCase() === 'semana') {
+      const baldes = await buscarBaldes(normalizeEtapa(etapa), normalizeStatus(status), formatDateSP(addDays(now, -6)), hoje);
+      const porDia: Record<string, number> = {};
+      for (let i = 6; i >= 0; i--) porDia[formatDateSP(addDays(now, -i))] = 0;
+      for (const b of baldes) porDia[b.dia] = Number(b.quantidade || 0);
+      const total = Object.values(porDia).reduce((acc, n) => acc + n, 0);
+      return Response.json({ total, porDia });
+    }
+
+    if (periodo.toLowerCase() === 'mes') {
+      const inicio = new Date(now);
+      inicio.setMonth(inicio.getMonth() - 1);
+      const baldes = await buscarBaldes(normalizeEtapa(etapa), normalizeStatus(status), formatDateSP(inicio), hoje);
+      const total = baldes.reduce((acc, b) => acc + Number(b.quantidade || 0), 0);
+      const valorTotal = baldes.reduce((acc, b) => acc + Number(b.valor || 0), 0);
+      return Response.json({ total, valorTotal });
+    }
+  } catch (err: any) {
+    return Response.json({ error: err.message }, { status: 500 });
+  }
+
+  return Response.json({ error: 'Período inválido. Use "semana" ou "mes".' }, { status: 400 });
+}
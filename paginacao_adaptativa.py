@@ -0,0 +1,270 @@
+"""
+Tamanho de página adaptativo para a listagem da API Vista (`paginacao.quantidade`).
+
+`PaginacaoAdaptativa` mede a latência e o tamanho (bytes) de cada página e ajusta a
+`quantidade` entre `PAGINA_MIN` e `PAGINA_MAX`: dobra enquanto as páginas voltam bem abaixo
+do alvo (`PAGINA_ALVO_SEGUNDOS`, `PAGINA_MAX_BYTES`) e cai pela metade quando passam do alvo
+ou falham (timeout). Se a API devolver páginas menores do que o pedido, o máximo é reduzido
+ao limite dela.
+
+A coleta é planejada por posição (offset) no resultado, não por número de página: cada
+`Janela` diz quais posições `[inicio, fim)` extrair de qual página (`pagina`, `quantidade`).
+Quando o tamanho muda no meio da execução, a página que contém `inicio` no novo tamanho é
+pedida e as posições já lidas são descartadas, então nenhum imóvel é pulado ou repetido.
+Isso só vale se a pesquisa tiver ordem estável e total (`"order": {"Codigo": "asc"}`): sem
+`order`, a API não garante que a mesma posição traga o mesmo imóvel em páginas de tamanhos
+diferentes.
+
+O tamanho com a maior vazão (imóveis/s) é salvo em `ARQUIVO_PAGINACAO` por perfil
+(`imovel_local`, `exportacao`...) e usado como ponto de partida na execução seguinte.
+
+Com `CACHE_HTTP=gravar` ou `reproduzir` (ver `cache_http.py`) o tamanho fica fixo (`inicial`
+ou `PAGINA_MAX`, sem ajustes, sem ler nem gravar `ARQUIVO_PAGINACAO`): a reprodução pede
+exatamente as mesmas páginas que a gravação, em vez de seguir a latência de cada execução.
+
+    paginacao = PaginacaoAdaptativa("imovel_local")
+    for janela in paginacao.janelas(0, total):
+        itens = ler_janela(buscar, paginacao, janela)
+    paginacao.salvar()
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from cache_http import modo_cache
+from instrumentacao import METRICAS
+from politica_requisicoes import PrazoEsgotado
+
+# Padrões das variáveis de ambiente, lidas ao criar o controlador (depois do `load_dotenv`)
+PAGINA_MIN = 10
+PAGINA_MAX = 50  # a API Vista costuma limitar a 50
+PAGINA_ALVO_SEGUNDOS = 5.0  # bem abaixo do timeout de 30 s
+PAGINA_MAX_BYTES = 4 * 1024 * 1024
+ARQUIVO_PAGINACAO = ".vista_paginacao.json"
+AMOSTRAS_POR_AJUSTE = 3  # páginas medidas no tamanho atual antes de decidir crescer/encolher
+TENTATIVAS_JANELA = 3
+
+# buscar(pagina, quantidade) -> (itens, metadados da página, bytes da resposta)
+BuscarPagina = Callable[[int, int], Tuple[List[Dict[str, Any]], Dict[str, Any], int]]
+
+
+class Janela(NamedTuple):
+    """Posições `[inicio, fim)` do resultado, lidas da página `pagina` de tamanho `quantidade`."""
+
+    inicio: int
+    fim: int
+    pagina: int
+    quantidade: int
+
+    def __str__(self) -> str:
+        return f"página {self.pagina} ({self.quantidade}/pág., itens {self.inicio + 1}-{self.fim})"
+
+
+class PaginacaoAdaptativa:
+    """Controlador do tamanho de página de um perfil de consulta (thread-safe)."""
+
+    def __init__(
+        self,
+        perfil: str,
+        minimo: Optional[int] = None,
+        maximo: Optional[int] = None,
+        alvo_segundos: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        arquivo: Optional[str] = None,
+        inicial: Optional[int] = None,
+        fixa: Optional[bool] = None,
+    ) -> None:
+        self.perfil = perfil
+        self.minimo = max(1, minimo or int(os.getenv("PAGINA_MIN", PAGINA_MIN)))
+        self.maximo = max(self.minimo, maximo or int(os.getenv("PAGINA_MAX", PAGINA_MAX)))
+        self.alvo_segundos = alvo_segundos or float(os.getenv("PAGINA_ALVO_SEGUNDOS", PAGINA_ALVO_SEGUNDOS))
+        self.max_bytes = max_bytes or int(os.getenv("PAGINA_MAX_BYTES", PAGINA_MAX_BYTES))
+        self.arquivo = arquivo if arquivo is not None else os.getenv("ARQUIVO_PAGINACAO", ARQUIVO_PAGINACAO)
+        # Gravação/reprodução do cache HTTP: as mesmas páginas nas duas execuções
+        self.fixa = modo_cache() in ("gravar", "reproduzir") if fixa is None else fixa
+        self.ajustes = 0
+        self._lock = threading.Lock()
+        self._amostras: List[Tuple[float, int]] = []
+        self._medidas: Dict[int, Tuple[float, float, float]] = {}  # médias móveis por tamanho
+        self.quantidade = self._limitar(inicial or self._salvo() or self.maximo)
+
+    def _limitar(self, quantidade: int) -> int:
+        return max(self.minimo, min(self.maximo, quantidade))
+
+    def _salvo(self) -> Optional[int]:
+        """Melhor tamanho da execução anterior para este perfil (nenhum com tamanho fixo)."""
+        if self.fixa or not self.arquivo or not os.path.exists(self.arquivo):
+            return None
+        try:
+            with open(self.arquivo, encoding="utf-8") as f:
+                return int(json.load(f)[self.perfil]["quantidade"])
+        except (KeyError, TypeError, ValueError, OSError):
+            return None
+
+    def _mudar(self, quantidade: int) -> None:
+        quantidade = self._limitar(quantidade)
+        self._amostras.clear()
+        if quantidade != self.quantidade:
+            self.quantidade = quantidade
+            self.ajustes += 1
+            METRICAS.definir("pagina_quantidade", quantidade, perfil=self.perfil)
+
+    def registrar(self, quantidade: int, itens: int, segundos: float, tamanho_bytes: int) -> None:
+        """Registra uma página pedida com `quantidade` e, a cada poucas amostras, ajusta o tamanho."""
+        if self.fixa:
+            return
+        with self._lock:
+            if itens and segundos > 0:
+                # (imóveis/s, segundos, bytes) por página deste tamanho
+                nova = (itens / segundos, segundos, float(tamanho_bytes))
+                anterior = self._medidas.get(quantidade)
+                self._medidas[quantidade] = (
+                    nova if anterior is None else tuple(0.7 * a + 0.3 * n for a, n in zip(anterior, nova))
+                )
+            if quantidade != self.quantidade or itens < quantidade:
+                return  # medida de um tamanho antigo ou da última página (parcial)
+            self._amostras.append((segundos, tamanho_bytes))
+            if len(self._amostras) < AMOSTRAS_POR_AJUSTE:
+                return
+            latencia = sum(s for s, _ in self._amostras) / len(self._amostras)
+            media_bytes = sum(b for _, b in self._amostras) / len(self._amostras)
+            if latencia > self.alvo_segundos or media_bytes > self.max_bytes:
+                self._mudar(self.quantidade // 2)
+            elif latencia < self.alvo_segundos / 2 and media_bytes < self.max_bytes / 2:
+                self._mudar(self.quantidade * 2)
+            else:
+                self._amostras.clear()
+
+    def registrar_falha(self, quantidade: int) -> None:
+        """Página com timeout/erro: reduz o tamanho pela metade e o teto a 3/4 de `quantidade` nesta execução."""
+        if self.fixa:
+            return  # a página é repetida no mesmo tamanho
+        with self._lock:
+            self.maximo = max(self.minimo, min(self.maximo, quantidade * 3 // 4))
+            if quantidade >= self.quantidade:
+                self._mudar(quantidade // 2)
+
+    def limitar_maximo(self, maximo: int) -> None:
+        """A API devolveu no máximo `maximo` itens por página: não pede mais que isso."""
+        with self._lock:
+            self.maximo = max(self.minimo, min(self.maximo, maximo))
+            self._mudar(self.quantidade)
+
+    def melhor(self) -> int:
+        """Tamanho com a maior vazão dentro dos alvos de latência e bytes (ou o atual, sem medições)."""
+        with self._lock:
+            candidatos = {
+                q: vazao
+                for q, (vazao, segundos, tamanho) in self._medidas.items()
+                if self.minimo <= q <= self.maximo and segundos <= self.alvo_segundos and tamanho <= self.max_bytes
+            }
+            return max(candidatos, key=candidatos.__getitem__) if candidatos else self.quantidade
+
+    def salvar(self) -> None:
+        """Grava o melhor tamanho do perfil (arquivo temporário + rename)."""
+        if self.fixa or not self.arquivo:
+            return
+        dados: Dict[str, Any] = {}
+        if os.path.exists(self.arquivo):
+            try:
+                with open(self.arquivo, encoding="utf-8") as f:
+                    dados = json.load(f)
+            except (ValueError, OSError):
+                dados = {}
+        melhor = self.melhor()
+        dados[self.perfil] = {
+            "quantidade": melhor,
+            "imoveis_por_segundo": round(self._medidas.get(melhor, (0.0,))[0], 1),
+            "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+        }
+        tmp = f"{self.arquivo}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(dados, f, indent=2)
+        os.replace(tmp, self.arquivo)
+
+    def janelas(self, inicio: int, total: int) -> Iterator[Janela]:
+        """
+        Planeja as janelas de `inicio` até `total` com o tamanho corrente no momento de cada uma.
+
+        Depois de uma mudança de tamanho, a primeira janela vai de `inicio` ao fim da página que
+        o contém no novo tamanho; as seguintes ficam alinhadas às páginas. As posições só
+        correspondem aos mesmos itens se a pesquisa de `buscar` tiver `order` estável (por
+        exemplo `{"Codigo": "asc"}`).
+        """
+        pos = inicio
+        while pos < total:
+            quantidade = self.quantidade
+            fim = min(pos - pos % quantidade + quantidade, total)
+            yield Janela(pos, fim, pos // quantidade + 1, quantidade)
+            pos = fim
+
+
+def ler_janela(
+    buscar: BuscarPagina,
+    paginacao: PaginacaoAdaptativa,
+    janela: Janela,
+    tentativas: int = TENTATIVAS_JANELA,
+) -> List[Dict[str, Any]]:
+    """
+    Lê os itens das posições da `janela`, com medição e ajuste do tamanho de página.
+
+    Se a página falhar, o tamanho é reduzido e o restante da janela é pedido de novo (até
+    `tentativas` falhas seguidas). Se a API usar um tamanho menor que o pedido (`quantidade` na
+    resposta), as posições são recalculadas por ele. Para no fim da listagem.
+    """
+    itens: List[Dict[str, Any]] = []
+    pos, pagina, quantidade = janela.inicio, janela.pagina, janela.quantidade
+    falhas = 0
+    while True:
+        inicio = time.perf_counter()
+        try:
+            pagina_itens, meta, tamanho = buscar(pagina, quantidade)
+        except PrazoEsgotado:
+            raise  # não é falha da página: não reduz o tamanho nem tenta de novo
+        except Exception:
+            falhas += 1
+            paginacao.registrar_falha(quantidade)
+            if falhas >= tentativas:
+                raise
+        else:
+            falhas = 0
+            real = int(meta.get("quantidade") or quantidade)
+            if real < quantidade:
+                paginacao.limitar_maximo(real)
+            else:
+                paginacao.registrar(quantidade, len(pagina_itens), time.perf_counter() - inicio, tamanho)
+            base = (pagina - 1) * real
+            if base <= pos:
+                trecho = pagina_itens[pos - base : janela.fim - base]
+                itens.extend(trecho)
+                pos += len(trecho)
+            if pos >= janela.fim or (base <= pos and len(pagina_itens) < real):
+                return itens  # janela completa ou fim da listagem
+        # Restante da janela no tamanho atual
+        quantidade = paginacao.quantidade
+        pagina = pos // quantidade + 1
+
+
+def ler_primeira(buscar: BuscarPagina, paginacao: PaginacaoAdaptativa) -> Tuple[List[Dict[str, Any]], int]:
+    """Lê a primeira página e devolve seus itens e o total de itens da listagem (`total`)."""
+    metadados: List[Dict[str, Any]] = []
+
+    def buscar_guardando(pagina: int, quantidade: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any], int]:
+        resultado = buscar(pagina, quantidade)
+        metadados.append(resultado[1])
+        return resultado
+
+    quantidade = paginacao.quantidade
+    itens = ler_janela(buscar_guardando, paginacao, Janela(0, quantidade, 1, quantidade))
+    meta = metadados[-1] if metadados else {}
+    if "total" in meta:
+        total = int(meta["total"])
+    else:  # sem `showtotal`: estimativa pelo número de páginas (janelas além do fim voltam vazias)
+        total = int(meta.get("paginas", 1)) * int(meta.get("quantidade") or quantidade)
+    return itens, max(total, len(itens))
@@ -0,0 +1,174 @@
+"""
+Pipeline produtor/consumidor em estágios, com filas limitadas entre eles.
+
+Usado pelos importadores para sobrepor busca na API Vista, normalização e gravação no Supabase:
+cada estágio tem seu próprio número de threads e as filas limitadas fazem a contrapressão
+(um estágio rápido bloqueia quando o seguinte não acompanha). O tempo total fica próximo do
+estágio mais lento, e não da soma de todos.
+
+    resultado, stats = executar_pipeline(
+        fonte=range(1, total_paginas + 1),
+        estagios=[Estagio("buscar", buscar, workers=8), Estagio("normalizar", normalizar)],
+        consumidor=lambda linhas: gravar(linhas),
+    )
+
+Cada função de estágio recebe um item e retorna um iterável com zero ou mais itens para o
+próximo estágio. Exceções em um item são registradas em `stats.erros` sem derrubar o pipeline.
+O consumidor roda na thread chamadora e recebe um iterador com a saída do último estágio;
+um Ctrl-C ou erro no consumidor interrompe todas as threads de forma limpa.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+TAMANHO_FILA_PADRAO = 64
+_FIM = object()  # sentinela de fim de fluxo
+_ESPERA = 0.2  # segundos entre verificações do sinal de parada
+
+
+@dataclass
+class Estagio:
+    """Um estágio do pipeline: `funcao(item) -> iterável de itens` executada por `workers` threads."""
+
+    nome: str
+    funcao: Callable[[Any], Optional[Iterable[Any]]]
+    workers: int = 1
+
+
+@dataclass
+class ErroEstagio:
+    estagio: str
+    item: Any
+    erro: str
+
+
+@dataclass
+class EstatisticasPipeline:
+    processados: Dict[str, int] = field(default_factory=dict)
+    tempo_ocupado: Dict[str, float] = field(default_factory=dict)  # soma do tempo nas funções
+    erros: List[ErroEstagio] = field(default_factory=list)
+    duracao: float = 0.0
+
+    def resumo(self) -> str:
+        partes = [
+            f"{nome}: {self.processados.get(nome, 0)} itens, {self.tempo_ocupado.get(nome, 0.0):.1f}s ocupado"
+            for nome in self.processados
+        ]
+        return f"Pipeline em {self.duracao:.1f}s | " + " | ".join(partes) + f" | erros: {len(self.erros)}"
+
+
+def executar_pipeline(
+    fonte: Iterable[Any],
+    estagios: List[Estagio],
+    consumidor: Optional[Callable[[Iterator[Any]], Any]] = None,
+    tamanho_fila: int = TAMANHO_FILA_PADRAO,
+) -> Tuple[Any, EstatisticasPipeline]:
+    """
+    Executa `fonte -> estagios[0] -> ... -> estagios[-1] -> consumidor`.
+
+    Retorna o valor do consumidor (ou a lista de saídas do último estágio, se não houver
+    consumidor) e as estatísticas por estágio.
+    """
+    if not estagios:
+        raise ValueError("O pipeline precisa de ao menos um estágio.")
+
+    parar = threading.Event()
+    lock = threading.Lock()
+    filas: List[queue.Queue] = [queue.Queue(maxsize=tamanho_fila) for _ in range(len(estagios) + 1)]
+    restantes = [max(1, e.workers) for e in estagios]
+    stats = EstatisticasPipeline(
+        processados={e.nome: 0 for e in estagios}, tempo_ocupado={e.nome: 0.0 for e in estagios}
+    )
+
+    def colocar(fila: queue.Queue, item: Any) -> bool:
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=_ESPERA)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produtor() -> None:
+        try:
+            for item in fonte:
+                if not colocar(filas[0], item):
+                    return
+        except Exception as e:
+            with lock:
+                stats.erros.append(ErroEstagio("fonte", None, f"{type(e).__name__}: {e}"))
+        finally:
+            for _ in range(restantes[0]):
+                colocar(filas[0], _FIM)
+
+    def trabalhador(indice: int) -> None:
+        estagio = estagios[indice]
+        entrada, saida = filas[indice], filas[indice + 1]
+        try:
+            while not parar.is_set():
+                try:
+                    item = entrada.get(timeout=_ESPERA)
+                except queue.Empty:
+                    continue
+                if item is _FIM:
+                    break
+
+                inicio = time.perf_counter()
+                try:
+                    saidas = list(estagio.funcao(item) or ())
+                except Exception as e:
+                    saidas = []
+                    with lock:
+                        stats.erros.append(ErroEstagio(estagio.nome, item, f"{type(e).__name__}: {e}"))
+                with lock:
+                    stats.processados[estagio.nome] += 1
+                    stats.tempo_ocupado[estagio.nome] += time.perf_counter() - inicio
+
+                for s in saidas:
+                    if not colocar(saida, s):
+                        return
+        finally:
+            with lock:
+                restantes[indice] -= 1
+                ultimo = restantes[indice] == 0
+            if ultimo:
+                proximos = restantes[indice + 1] if indice + 1 < len(estagios) else 1
+                for _ in range(proximos):
+                    colocar(saida, _FIM)
+
+    def drenar() -> Iterator[Any]:
+        while True:
+            try:
+                item = filas[-1].get(timeout=_ESPERA)
+            except queue.Empty:
+                if parar.is_set():
+                    return
+                continue
+            if item is _FIM:
+                return
+            yield item
+
+    threads = [threading.Thread(target=produtor, name="pipeline-fonte", daemon=True)]
+    for i, estagio in enumerate(estagios):
+        threads.extend(
+            threading.Thread(target=trabalhador, args=(i,), name=f"pipeline-{estagio.nome}-{n}", daemon=True)
+            for n in range(restantes[i])
+        )
+
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    try:
+        resultado = consumidor(drenar()) if consumidor else list(drenar())
+    finally:
+        # Fim normal: todas as threads já terminaram. Erro/Ctrl-C: sinaliza e aguarda.
+        parar.set()
+        for t in threads:
+            t.join()
+        stats.duracao = time.perf_counter() - inicio
+    return resultado, stats
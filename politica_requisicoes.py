@@ -0,0 +1,296 @@
+"""
+Política das requisições à API Vista: requisições de reserva (hedging) e prazo da execução.
+
+Algumas páginas e detalhes demoram perto do timeout inteiro, e os retries só começam depois
+dessa espera. A política acompanha a latência recente de cada endpoint e, quando uma
+requisição passa do p95 dele, dispara uma cópia do mesmo GET; vale a resposta que chegar
+primeiro (a outra é fechada ao terminar). As cópias:
+
+- só existem com um limitador de taxa (sem ele não há como garantir a taxa) e passam por ele
+  como qualquer requisição (vaga em voo e ficha), então nunca passam da taxa nem das conexões
+  simultâneas permitidas; ficam com a próxima vaga livre (`slot(prioritaria=True)`) e, se a
+  original responder antes, são canceladas sem ir à API;
+- não liberam vagas antes da hora: cada requisição, original ou cópia, ocupa a sua vaga até
+  terminar de fato, mesmo depois de perder a corrida (ou de ser abandonada no prazo);
+- são limitadas a `max_fracao_hedge` das requisições (orçamento), para que uma API lenta por
+  inteiro não receba o dobro das chamadas;
+- só começam depois de `min_amostras` respostas do endpoint (antes disso não há p95 confiável).
+
+Com `prazo` (segundos), a execução inteira tem um orçamento: o timeout de cada requisição é
+limitado ao tempo restante, `ate_o_prazo` para de entregar trabalho novo quando ele acaba e
+as requisições em andamento (ou novas) levantam `PrazoEsgotado` no fim do prazo.
+
+    politica = politica_do_ambiente()
+    resp = politica.get(session, url, "detalhes", limitador, params=params, timeout=25)  # sem `slot()` em volta
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import nullcontext
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Optional, Set, TypeVar
+
+import requests
+
+from instrumentacao import METRICAS
+from limitador_taxa import LimitadorAdaptativo
+
+T = TypeVar("T")
+
+JANELA_LATENCIAS = 200  # respostas recentes por endpoint usadas no p95
+MIN_AMOSTRAS = 20
+MAX_FRACAO_HEDGE = 0.1  # no máximo 10% de requisições extras
+ATRASO_MIN = 0.05  # segundos: não duplica requisições mais rápidas que isso
+
+
+class PrazoEsgotado(RuntimeError):
+    """O orçamento de tempo da execução (`PRAZO_EXECUCAO_SEGUNDOS`) acabou."""
+
+
+class PoliticaRequisicoes:
+    """Latência por endpoint, requisições de reserva acima do p95 e prazo da execução."""
+
+    def __init__(
+        self,
+        hedge: bool = True,
+        prazo: Optional[float] = None,
+        janela: int = JANELA_LATENCIAS,
+        min_amostras: int = MIN_AMOSTRAS,
+        max_fracao_hedge: float = MAX_FRACAO_HEDGE,
+        atraso_min: float = ATRASO_MIN,
+    ) -> None:
+        self.hedge = hedge
+        self.fim = time.monotonic() + prazo if prazo else None
+        self.janela = janela
+        self.min_amostras = min_amostras
+        self.max_fracao_hedge = max_fracao_hedge
+        self.atraso_min = atraso_min
+        self.requisicoes = 0
+        self.hedges = 0
+        self.hedges_vencedores = 0
+        self.interrompida = False  # `ate_o_prazo` deixou itens sem entregar
+        self._latencias: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    # ---------------- prazo ----------------
+
+    def restante(self) -> Optional[float]:
+        """Segundos até o fim do prazo (None sem prazo)."""
+        return None if self.fim is None else self.fim - time.monotonic()
+
+    def esgotado(self) -> bool:
+        restante = self.restante()
+        return restante is not None and restante <= 0
+
+    def verificar(self) -> None:
+        """Levanta `PrazoEsgotado` se o prazo acabou (ex.: antes de aguardar vaga no limitador)."""
+        if self.esgotado():
+            raise PrazoEsgotado("Prazo da execução esgotado antes da requisição")
+
+    def ate_o_prazo(self, itens: Iterable[T]) -> Iterator[T]:
+        """Entrega os itens enquanto houver prazo; os não entregues ficam para a próxima execução."""
+        for item in itens:
+            if self.esgotado():
+                self.interrompida = True
+                METRICAS.contar("prazo_esgotado_total")
+                print("[AVISO] Prazo da execução esgotado: nenhum trabalho novo será iniciado.")
+                return
+            yield item
+
+    def _timeout(self, timeout: Optional[float]) -> Optional[float]:
+        self.verificar()
+        return self._ate_o_prazo(timeout)
+
+    # ---------------- latência ----------------
+
+    def registrar(self, endpoint: str, segundos: float) -> None:
+        with self._lock:
+            amostras = self._latencias.get(endpoint)
+            if amostras is None:
+                amostras = self._latencias[endpoint] = deque(maxlen=self.janela)
+            amostras.append(segundos)
+
+    def percentil(self, endpoint: str, p: float = 95) -> Optional[float]:
+        """Percentil `p` das latências recentes do endpoint (None com menos de `min_amostras`)."""
+        with self._lock:
+            amostras = sorted(self._latencias.get(endpoint, ()))
+        if len(amostras) < self.min_amostras:
+            return None
+        return amostras[min(len(amostras) - 1, int(len(amostras) * p / 100))]
+
+    def _pode_duplicar(self, endpoint: str) -> bool:
+        """Reserva o orçamento de uma cópia; False se as cópias já somam `max_fracao_hedge`."""
+        with self._lock:
+            if self.hedges + 1 > max(1.0, self.max_fracao_hedge * self.requisicoes):
+                METRICAS.contar("hedges_negados_total", endpoint=endpoint)
+                return False
+            self.hedges += 1
+        return True
+
+    # ---------------- requisições ----------------
+
+    def get(
+        self,
+        session: requests.Session,
+        url: str,
+        endpoint: str,
+        limitador: Optional[LimitadorAdaptativo] = None,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """
+        `session.get(url, ...)` com o timeout limitado ao prazo e, passando do p95 do `endpoint`,
+        uma cópia da requisição; devolve a primeira resposta (ou o erro, se as duas falharem).
+
+        Com `limitador`, a vaga (e a ficha) de cada requisição é reservada aqui, sem `slot()` em
+        volta: a vaga da original só é devolvida quando ela termina, mesmo que a cópia vença ou o
+        prazo acabe antes. Sem `limitador` não há cópias. Com prazo, a espera termina nele mesmo
+        que a requisição ainda esteja em retries do urllib3 (`PrazoEsgotado`; a resposta tardia
+        é descartada).
+        """
+        self.verificar()
+        hedge = self.hedge and limitador is not None
+        if not hedge and self.fim is None:
+            with self._lock:
+                self.requisicoes += 1
+            inicio = time.monotonic()
+            with limitador.slot() if limitador else nullcontext():
+                resp = session.get(url, timeout=timeout, **kwargs)
+            self._registrar_resposta(endpoint, resp, time.monotonic() - inicio)
+            return resp
+
+        if limitador:
+            limitador.reservar()
+        try:
+            timeout = self._timeout(timeout)
+        except PrazoEsgotado:
+            if limitador:
+                limitador.liberar()
+            raise
+        with self._lock:
+            self.requisicoes += 1
+        inicio = time.monotonic()
+        # Em thread própria: a espera pode terminar antes (cópia mais rápida ou fim do prazo)
+        original = _em_segundo_plano(session.get, url, timeout=timeout, **kwargs)
+        if limitador:
+            original.add_done_callback(lambda _: limitador.liberar())
+        pendentes = {original}
+        cancelada = threading.Event()
+        atraso = self.percentil(endpoint) if hedge else None
+        if atraso is not None:
+            feitos, _ = wait(pendentes, timeout=self._ate_o_prazo(max(atraso, self.atraso_min)))
+            if not feitos and not self.esgotado() and self._pode_duplicar(endpoint):
+                METRICAS.contar("hedges_total", endpoint=endpoint)
+                pendentes.add(_em_segundo_plano(self._copia, session, url, limitador, cancelada, timeout, kwargs))
+
+        vencedor = self._primeira(pendentes, cancelada)
+        if vencedor is not original:
+            with self._lock:
+                self.hedges_vencedores += 1
+            METRICAS.contar("hedges_vencedores_total", endpoint=endpoint)
+        resp = vencedor.result()
+        self._registrar_resposta(endpoint, resp, time.monotonic() - inicio)
+        return resp
+
+    def _ate_o_prazo(self, segundos: Optional[float]) -> Optional[float]:
+        restante = self.restante()
+        if restante is None:
+            return segundos
+        return max(0.0, restante if segundos is None else min(segundos, restante))
+
+    def _primeira(self, pendentes: Set[Future], cancelada: threading.Event) -> Future:
+        """Primeira requisição concluída com resposta; as outras são descartadas ao terminar."""
+        erro: Optional[BaseException] = None
+        while pendentes:
+            feitos, pendentes = wait(pendentes, timeout=self._ate_o_prazo(None), return_when=FIRST_COMPLETED)
+            if not feitos:
+                erro = PrazoEsgotado("Prazo da execução esgotado durante a requisição")
+                break
+            for futuro in feitos:
+                if futuro.exception() is None:
+                    pendentes.update(f for f in feitos if f is not futuro)
+                    _descartar(pendentes, cancelada)
+                    return futuro
+                erro = futuro.exception()
+        _descartar(pendentes, cancelada)
+        assert erro is not None
+        if self.esgotado() and not isinstance(erro, PrazoEsgotado):
+            # Timeout limitado pelo prazo: não é falha da API, e repetir não adianta
+            raise PrazoEsgotado("Prazo da execução esgotado durante a requisição") from erro
+        raise erro
+
+    @staticmethod
+    def _copia(
+        session: requests.Session,
+        url: str,
+        limitador: Optional[LimitadorAdaptativo],
+        cancelada: threading.Event,
+        timeout: Optional[float],
+        kwargs: Dict[str, Any],
+    ) -> Optional[requests.Response]:
+        with limitador.slot(prioritaria=True) if limitador else nullcontext():
+            if cancelada.is_set():
+                return None  # a original respondeu enquanto a cópia aguardava a vaga
+            return session.get(url, timeout=timeout, **kwargs)
+
+    def _registrar_resposta(self, endpoint: str, resp: requests.Response, segundos: float) -> None:
+        # Só respostas saudáveis entram no p95: 429/5xx rápidos baixariam o limiar das cópias
+        if resp.status_code < 500 and resp.status_code != 429:
+            self.registrar(endpoint, segundos)
+
+    def resumo(self) -> str:
+        p95 = {e: self.percentil(e) for e in sorted(self._latencias)}
+        for endpoint, valor in p95.items():
+            if valor is not None:
+                METRICAS.definir("latencia_p95_segundos", valor, endpoint=endpoint)
+        textos = ", ".join(f"{e} p95={v:.2f}s" for e, v in p95.items() if v is not None)
+        return (
+            f"{self.requisicoes} requisições, {self.hedges} cópias por lentidão "
+            f"({self.hedges_vencedores} chegaram primeiro){'; ' + textos if textos else ''}"
+        )
+
+
+def _em_segundo_plano(funcao: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+    """
+    Roda `funcao` em uma thread daemon e devolve o Future do resultado.
+
+    Daemon (e não um pool): uma requisição abandonada no prazo, ainda em retries do urllib3,
+    não segura o fim do processo.
+    """
+    futuro: Future = Future()
+
+    def rodar() -> None:
+        futuro.set_running_or_notify_cancel()
+        try:
+            futuro.set_result(funcao(*args, **kwargs))
+        except BaseException as e:
+            futuro.set_exception(e)
+
+    threading.Thread(target=rodar, name="requisicao", daemon=True).start()
+    return futuro
+
+
+def _descartar(pendentes: Iterable[Future], cancelada: threading.Event) -> None:
+    """Cancela as cópias que ainda aguardam vaga e fecha as respostas que chegarem depois."""
+    cancelada.set()
+    for futuro in pendentes:
+        futuro.add_done_callback(_fechar_resposta)
+
+
+def _fechar_resposta(futuro: Future) -> None:
+    if not futuro.cancelled() and futuro.exception() is None and futuro.result() is not None:
+        futuro.result().close()
+
+
+def politica_do_ambiente() -> PoliticaRequisicoes:
+    """Política configurada por `HEDGE_REQUISICOES` (padrão 1) e `PRAZO_EXECUCAO_SEGUNDOS` (vazio = sem prazo)."""
+    prazo = os.getenv("PRAZO_EXECUCAO_SEGUNDOS", "").strip()
+    return PoliticaRequisicoes(
+        hedge=os.getenv("HEDGE_REQUISICOES", "1") != "0",
+        prazo=float(prazo) if prazo else None,
+        max_fracao_hedge=float(os.getenv("HEDGE_MAX_FRACAO", str(MAX_FRACAO_HEDGE))),
+    )
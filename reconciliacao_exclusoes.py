@@ -0,0 +1,208 @@
+"""
+Reconciliação de exclusões entre a API Vista e as tabelas de imóveis (`imovel_local`, `imoveis`).
+
+Os importadores só fazem upsert: imóveis removidos do Vista ficariam para sempre nas tabelas e
+o importador de prontuários gastaria uma consulta de detalhes com cada um a cada execução.
+
+A reconciliação compara os dois conjuntos de códigos sem montar listas de dicts:
+
+- os códigos do Vista ficam em um `set` de strings (só o código de cada imóvel da listagem);
+- os códigos de cada tabela são lidos em fluxo, por paginação por chave, junto com a coluna de
+  exclusão (`excluido_em`), e comparados um a um com o conjunto do Vista.
+
+Códigos da tabela ausentes do Vista recebem `excluido_em` (exclusão lógica) e códigos marcados
+que voltaram ao Vista têm a marca removida, em lotes de `LOTE_EXCLUSAO`, com o `UPDATE` do destino
+de gravação (`destinos_gravacao.py`). A coluna no banco é a fonte da verdade: o importador de
+prontuários lê só `excluido_em is null`. As marcas também ficam em um arquivo local
+(`Exclusoes`), que é só um cache.
+
+Se a fração de códigos a excluir passar de `max_fracao`, nada é gravado: uma listagem incompleta
+da API não pode apagar o catálogo.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from instrumentacao import METRICAS
+from paginacao_adaptativa import BuscarPagina, PaginacaoAdaptativa, ler_janela, ler_primeira
+
+LOTE_EXCLUSAO = 500
+MAX_FRACAO = 0.2  # no máximo 20% da tabela excluída por execução
+COLUNA_EXCLUIDO = "excluido_em"
+LIMITE_LEITURA = 1000  # linhas por página na leitura por chave
+
+Linha = Dict[str, Any]
+
+
+class Exclusoes:
+    """Códigos excluídos logicamente (arquivo local, SQLite)."""
+
+    def __init__(self, caminho: str) -> None:
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS imovel_excluido (
+                codigo TEXT PRIMARY KEY,
+                excluido_em TEXT NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self.pulados = 0
+
+    def codigos(self) -> Set[str]:
+        with self._lock:
+            return {codigo for (codigo,) in self.conn.execute("SELECT codigo FROM imovel_excluido")}
+
+    def filtrar(self, codigos: Iterable[str]) -> Iterator[str]:
+        """Gera, sob demanda, só os códigos não excluídos; os pulados são contados em `pulados`."""
+        excluidos = self.codigos()
+        for codigo in codigos:
+            if codigo in excluidos:
+                self.pulados += 1
+            else:
+                yield codigo
+
+    def marcar(self, codigos: Iterable[str], quando: Optional[str] = None) -> None:
+        quando = quando or datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO imovel_excluido (codigo, excluido_em) VALUES (?, ?)",
+                [(codigo, quando) for codigo in codigos],
+            )
+            self.conn.commit()
+
+    def desmarcar(self, codigos: Iterable[str]) -> None:
+        with self._lock:
+            self.conn.executemany("DELETE FROM imovel_excluido WHERE codigo = ?", [(c,) for c in codigos])
+            self.conn.commit()
+
+    def fechar(self) -> None:
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+@dataclass
+class ResultadoReconciliacao:
+    """Resumo da reconciliação de uma tabela."""
+
+    tabela: str
+    lidos: int = 0
+    excluidos: List[str] = field(default_factory=list)
+    restaurados: List[str] = field(default_factory=list)
+    abortado: Optional[str] = None
+
+    def resumo(self) -> str:
+        if self.abortado:
+            return f"{self.tabela}: reconciliação abortada ({self.abortado})"
+        return (
+            f"{self.tabela}: {self.lidos} códigos lidos, {len(self.excluidos)} excluídos, "
+            f"{len(self.restaurados)} restaurados"
+        )
+
+
+def codigos_vista(buscar: BuscarPagina, paginacao: PaginacaoAdaptativa) -> Set[str]:
+    """
+    Conjunto dos códigos da listagem inteira (`buscar` deve pedir só o campo `Codigo`).
+
+    Só o código de cada imóvel é guardado. Falhas levantam exceção: um conjunto incompleto
+    faria imóveis existentes parecerem excluídos.
+    """
+    itens, total = ler_primeira(buscar, paginacao)
+    codigos = {str(im["Codigo"]) for im in itens if im.get("Codigo")}
+    for janela in paginacao.janelas(len(itens), total):
+        codigos.update(str(im["Codigo"]) for im in ler_janela(buscar, paginacao, janela) if im.get("Codigo"))
+    return codigos
+
+
+def iterar_por_chave(
+    supabase: Any, tabela: str, coluna: str, extras: Iterable[str] = (), limite: int = LIMITE_LEITURA
+) -> Iterator[Linha]:
+    """
+    Gera as linhas (`coluna` + `extras`) de `tabela` em ordem de `coluna`, por paginação por chave.
+
+    A próxima página é buscada em segundo plano enquanto a atual é consumida.
+    """
+    selecao = ",".join([coluna, *extras])
+
+    def pagina_apos(cursor: Optional[str]) -> List[Linha]:
+        consulta = supabase.table(tabela).select(selecao).order(coluna).limit(limite)
+        if cursor is not None:
+            consulta = consulta.gt(coluna, cursor)
+        with METRICAS.cronometrar("supabase_select", tabela=tabela):
+            return consulta.execute().model_dump().get("data", [])
+
+    with ThreadPoolExecutor(max_workers=1) as prefetch:
+        futuro: Optional[Future] = prefetch.submit(pagina_apos, None)
+        while futuro is not None:
+            linhas = futuro.result()
+            futuro = None
+            if len(linhas) == limite:
+                futuro = prefetch.submit(pagina_apos, linhas[-1].get(coluna))
+            yield from linhas
+
+
+def reconciliar_tabela(
+    vista: Set[str],
+    linhas: Iterable[Linha],
+    tabela: str,
+    coluna: str,
+    atualizar: Callable[[str, str, List[str], Linha], int],
+    coluna_excluido: str = COLUNA_EXCLUIDO,
+    max_fracao: float = MAX_FRACAO,
+    lote: int = LOTE_EXCLUSAO,
+) -> ResultadoReconciliacao:
+    """
+    Compara os códigos de `linhas` (lidos em fluxo) com `vista` e grava as diferenças em lotes.
+
+    Só os códigos a alterar são guardados. `atualizar(tabela, coluna, codigos, valores)` é o
+    `UPDATE ... WHERE coluna IN (...)` do destino: só `coluna_excluido` muda, e um código removido
+    da tabela entre a leitura e a gravação não volta como linha parcial.
+    """
+    resultado = ResultadoReconciliacao(tabela)
+    for linha in linhas:
+        codigo = linha.get(coluna)
+        if codigo is None:
+            continue
+        codigo = str(codigo)
+        resultado.lidos += 1
+        excluido = linha.get(coluna_excluido) is not None
+        if codigo not in vista and not excluido:
+            resultado.excluidos.append(codigo)
+        elif codigo in vista and excluido:
+            resultado.restaurados.append(codigo)
+
+    if resultado.lidos and len(resultado.excluidos) > max_fracao * resultado.lidos:
+        resultado.abortado = (
+            f"{len(resultado.excluidos)} de {resultado.lidos} códigos sumiram do Vista, acima do limite de "
+            f"{max_fracao:.0%}; confira a listagem ou use --forcar"
+        )
+        return resultado
+
+    agora = datetime.now().isoformat(timespec="seconds")
+    for codigos, valor in ((resultado.excluidos, agora), (resultado.restaurados, None)):
+        for i in range(0, len(codigos), lote):
+            atualizar(tabela, coluna, codigos[i : i + lote], {coluna_excluido: valor})
+    METRICAS.contar("imoveis_excluidos_total", len(resultado.excluidos), tabela=tabela)
+    METRICAS.contar("imoveis_restaurados_total", len(resultado.restaurados), tabela=tabela)
+    return resultado
+
+
+def tabelas_configuradas(especificacao: str) -> List[Tuple[str, str]]:
+    """`"imovel_local:codigo,imoveis"` -> [("imovel_local", "codigo"), ("imoveis", "codigo")]."""
+    tabelas: List[Tuple[str, str]] = []
+    for item in especificacao.split(","):
+        tabela, _, coluna = item.strip().partition(":")
+        if tabela:
+            tabelas.append((tabela, coluna or "codigo"))
+    return tabelas